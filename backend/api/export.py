@@ -0,0 +1,71 @@
+"""数据导出API
+
+导出包含所有用户的健康档案和推送历史，接口需携带管理员令牌；未配置 export.admin_token 时接口关闭，
+只能通过命令行导出。
+"""
+import hmac
+from datetime import datetime
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from backend.config.config import settings
+from backend.core.container import get_data_exporter
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def require_admin(x_admin_token: str = Header(None, description="管理员令牌")):
+    """校验管理员令牌"""
+    if not settings.EXPORT_ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="导出接口未启用，请使用命令行导出")
+    if not x_admin_token or not hmac.compare_digest(x_admin_token.encode(), settings.EXPORT_ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="管理员令牌无效")
+
+
+router = APIRouter(dependencies=[Depends(require_admin)])
+
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv; charset=utf-8"}
+
+
+def _export_response(data_exporter, dataset: str, export_format: str, compress: bool, **filters):
+    if export_format not in MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail="format必须是ndjson/csv之一")
+    
+    filename = f"{dataset}_{datetime.now():%Y%m%d%H%M%S}.{export_format}" + (".gz" if compress else "")
+    logger.info(f"导出{dataset}：{filters}，格式{export_format}")
+    return StreamingResponse(
+        data_exporter.stream(dataset, export_format, compress, **filters),
+        # 压缩后作为 .gz 文件下载，不设置 Content-Encoding，避免客户端自动解压
+        media_type="application/gzip" if compress else MEDIA_TYPES[export_format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+
+@router.get("/export/push-history", summary="导出推送历史")
+async def export_push_history(
+    user_id: str = Query(None, description="只导出该用户"),
+    start: datetime = Query(None, description="推送时间起点（含）"),
+    end: datetime = Query(None, description="推送时间终点（不含）"),
+    export_format: str = Query("ndjson", alias="format", description="导出格式：ndjson/csv"),
+    compress: bool = Query(False, alias="gzip", description="是否gzip压缩"),
+    data_exporter=Depends(get_data_exporter)
+):
+    """按用户或推送时间范围流式导出推送历史"""
+    return _export_response(
+        data_exporter, "push_history", export_format, compress, user_id=user_id, start=start, end=end
+    )
+
+
+@router.get("/export/profiles", summary="导出健康档案")
+async def export_profiles(
+    user_id: str = Query(None, description="只导出该用户"),
+    start: datetime = Query(None, description="档案创建时间起点（含）"),
+    end: datetime = Query(None, description="档案创建时间终点（不含）"),
+    export_format: str = Query("ndjson", alias="format", description="导出格式：ndjson/csv"),
+    compress: bool = Query(False, alias="gzip", description="是否gzip压缩"),
+    data_exporter=Depends(get_data_exporter)
+):
+    """按用户或档案创建时间范围流式导出健康档案"""
+    return _export_response(
+        data_exporter, "profiles", export_format, compress, user_id=user_id, start=start, end=end
+    )
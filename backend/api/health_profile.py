@@ -1,11 +1,13 @@
 """健康档案管理API"""
-from fastapi import APIRouter, HTTPException, Body
+from fastapi import APIRouter, Depends, HTTPException, Body, Header, Query, Request, Response
 from datetime import datetime
+from pymongo.errors import DuplicateKeyError
 from backend.models.health_profile import (
     HealthProfile, HealthProfileCreate, HealthProfileUpdate
 )
-from backend.core.mongodb import get_mongodb
-from backend.config.config import settings
+from backend.core.container import get_profile_repository, get_profile_cache, get_profile_importer
+from backend.core.responses import FastJSONResponse, etag_matches
+from backend.services.profile_cache import profile_etag
 import logging
 
 logger = logging.getLogger(__name__)
@@ -13,17 +15,15 @@ router = APIRouter()
 
 
 @router.post("/health-profile", summary="创建健康档案")
-async def create_health_profile(profile: HealthProfileCreate):
+async def create_health_profile(
+    profile: HealthProfileCreate,
+    profile_repository=Depends(get_profile_repository),
+    profile_cache=Depends(get_profile_cache)
+):
     """创建用户健康档案"""
+    from backend.scheduler.schedule import schedule_fields
+    
     try:
-        db = get_mongodb()
-        collection = db.get_collection(settings.COLLECTION_HEALTH_PROFILE)
-        
-        # 检查用户是否已有档案
-        existing = collection.find_one({"user_id": profile.user_id})
-        if existing:
-            raise HTTPException(status_code=400, detail="该用户已存在健康档案")
-        
         # 创建档案
         profile_dict = {
             "user_id": profile.user_id,
@@ -33,14 +33,20 @@ async def create_health_profile(profile: HealthProfileCreate):
             "persona_style": None,
             "location": None,
             "created_at": datetime.now(),
-            "updated_at": datetime.now()
+            "updated_at": datetime.now(),
+            **schedule_fields(profile.user_id)
         }
         
-        result = collection.insert_one(profile_dict)
-        profile_dict["_id"] = str(result.inserted_id)
+        # user_id 有唯一索引，重复创建时由数据库拒绝
+        try:
+            inserted_id = await profile_repository.create(profile_dict)
+        except DuplicateKeyError:
+            raise HTTPException(status_code=400, detail="该用户已存在健康档案")
+        profile_cache.invalidate(profile.user_id)
+        profile_dict["_id"] = inserted_id
         
         logger.info(f"创建健康档案成功：用户{profile.user_id}")
-        return {"status": "success", "message": "健康档案创建成功", "data": profile_dict}
+        return FastJSONResponse({"status": "success", "message": "健康档案创建成功", "data": profile_dict})
         
     except HTTPException:
         raise
@@ -49,19 +55,49 @@ async def create_health_profile(profile: HealthProfileCreate):
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.get("/health-profile/{user_id}", summary="获取健康档案")
-async def get_health_profile(user_id: str):
-    """获取用户健康档案"""
+@router.post("/health-profile/import", summary="批量导入健康档案")
+async def import_health_profiles(
+    request: Request,
+    import_format: str = Query("ndjson", alias="format", description="请求体格式：ndjson/csv"),
+    mode: str = Query("upsert", description="upsert：更新已存在的档案；insert：只新建，已存在的跳过"),
+    profile_importer=Depends(get_profile_importer)
+):
+    """
+    以 NDJSON 或 CSV 请求体批量导入健康档案
+    
+    请求体边接收边解析，逐行校验后分批写入，返回导入报告及失败行的原因。
+    """
+    from backend.services.profile_import import IMPORT_FORMATS, parse_rows
+    
+    if import_format not in IMPORT_FORMATS:
+        raise HTTPException(status_code=400, detail="format必须是ndjson/csv之一")
+    if mode not in ("upsert", "insert"):
+        raise HTTPException(status_code=400, detail="mode必须是upsert/insert之一")
     try:
-        db = get_mongodb()
-        collection = db.get_collection(settings.COLLECTION_HEALTH_PROFILE)
+        report = await profile_importer.run(parse_rows(import_format, request.stream()), mode == "upsert")
+        return {"status": "success", "data": report}
         
-        profile = collection.find_one({"user_id": user_id})
+    except Exception as e:
+        logger.error(f"批量导入健康档案失败: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/health-profile/{user_id}", summary="获取健康档案")
+async def get_health_profile(
+    user_id: str,
+    if_none_match: str = Header(None),
+    profile_cache=Depends(get_profile_cache)
+):
+    """获取用户健康档案，带 If-None-Match 请求且档案未修改时返回304"""
+    try:
+        profile = await profile_cache.get(user_id)
         if not profile:
             raise HTTPException(status_code=404, detail="健康档案不存在")
         
-        profile["_id"] = str(profile["_id"])
-        return {"status": "success", "data": profile}
+        etag = profile_etag(profile)
+        if etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers={"ETag": etag})
+        return FastJSONResponse({"status": "success", "data": profile}, headers={"ETag": etag})
         
     except HTTPException:
         raise
@@ -71,12 +107,14 @@ async def get_health_profile(user_id: str):
 
 
 @router.put("/health-profile/{user_id}", summary="更新健康档案")
-async def update_health_profile(user_id: str, update_data: HealthProfileUpdate):
+async def update_health_profile(
+    user_id: str,
+    update_data: HealthProfileUpdate,
+    profile_repository=Depends(get_profile_repository),
+    profile_cache=Depends(get_profile_cache)
+):
     """更新用户健康档案"""
     try:
-        db = get_mongodb()
-        collection = db.get_collection(settings.COLLECTION_HEALTH_PROFILE)
-        
         # 构建更新数据
         update_dict = {}
         if update_data.basic_info:
@@ -92,12 +130,9 @@ async def update_health_profile(user_id: str, update_data: HealthProfileUpdate):
         
         update_dict["updated_at"] = datetime.now()
         
-        result = collection.update_one(
-            {"user_id": user_id},
-            {"$set": update_dict}
-        )
-        
-        if result.matched_count == 0:
+        updated = await profile_repository.update(user_id, update_dict)
+        profile_cache.invalidate(user_id)
+        if not updated:
             raise HTTPException(status_code=404, detail="健康档案不存在")
         
         logger.info(f"更新健康档案成功：用户{user_id}")
@@ -111,15 +146,16 @@ async def update_health_profile(user_id: str, update_data: HealthProfileUpdate):
 
 
 @router.delete("/health-profile/{user_id}", summary="删除健康档案")
-async def delete_health_profile(user_id: str):
+async def delete_health_profile(
+    user_id: str,
+    profile_repository=Depends(get_profile_repository),
+    profile_cache=Depends(get_profile_cache)
+):
     """删除用户健康档案"""
     try:
-        db = get_mongodb()
-        collection = db.get_collection(settings.COLLECTION_HEALTH_PROFILE)
-        
-        result = collection.delete_one({"user_id": user_id})
-        
-        if result.deleted_count == 0:
+        deleted = await profile_repository.delete(user_id)
+        profile_cache.invalidate(user_id)
+        if not deleted:
             raise HTTPException(status_code=404, detail="健康档案不存在")
         
         logger.info(f"删除健康档案成功：用户{user_id}")
@@ -135,19 +171,19 @@ async def delete_health_profile(user_id: str):
 @router.post("/health-profile/{user_id}/location", summary="设置用户地区")
 async def set_user_location(
     user_id: str,
-    location: dict = Body(..., examples=[{"province": "浙江", "city": "杭州"}])
+    location: dict = Body(..., examples=[{"province": "浙江", "city": "杭州"}]),
+    profile_repository=Depends(get_profile_repository),
+    profile_cache=Depends(get_profile_cache)
 ):
     """设置用户所在地区（用于天气推送）"""
     try:
-        db = get_mongodb()
-        collection = db.get_collection(settings.COLLECTION_HEALTH_PROFILE)
-        
-        result = collection.update_one(
-            {"user_id": user_id},
-            {"$set": {"location": location, "updated_at": datetime.now()}}
+        updated = await profile_repository.update(
+            user_id,
+            {"location": location, "updated_at": datetime.now()}
         )
+        profile_cache.invalidate(user_id)
         
-        if result.matched_count == 0:
+        if not updated:
             raise HTTPException(status_code=404, detail="健康档案不存在")
         
         logger.info(f"设置用户地区成功：用户{user_id}")
@@ -160,6 +196,79 @@ async def set_user_location(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/health-profile/{user_id}/push-times", summary="获取推送时间")
+async def get_push_times(
+    user_id: str,
+    profile_repository=Depends(get_profile_repository)
+):
+    """获取各推送时段的默认时间、用户设置的时间及分散投递时的实际推送时间"""
+    from backend.scheduler.schedule import SLOTS, build_schedule, format_minute
+    
+    try:
+        profile = await profile_repository.get(user_id, {"push_times": 1})
+        if not profile:
+            raise HTTPException(status_code=404, detail="健康档案不存在")
+        
+        push_times = profile.get("push_times") or {}
+        schedule = {entry["slot"]: entry["minute"] for entry in build_schedule(user_id, push_times)}
+        data = [
+            {
+                "slot": slot_id,
+                "name": spec["name"],
+                "default_time": spec["time"],
+                "time": push_times.get(slot_id),
+                "dispatch_time": format_minute(schedule[slot_id])
+            }
+            for slot_id, spec in SLOTS.items()
+        ]
+        return {"status": "success", "data": data}
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"获取推送时间失败: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
 
 
-
+@router.post("/health-profile/{user_id}/push-times", summary="设置推送时间")
+async def set_push_times(
+    user_id: str,
+    push_times: dict = Body(..., examples=[{"rest_morning": "06:30", "meal_dinner": None}]),
+    profile_repository=Depends(get_profile_repository),
+    profile_cache=Depends(get_profile_cache)
+):
+    """
+    设置用户各推送时段的时间（HH:MM），只修改请求中的时段，值为null时恢复默认时间
+    
+    开启分散投递（scheduler.dispatch）后按该时间推送，未开启时各时段仍按配置时间统一推送。
+    """
+    from backend.scheduler.schedule import schedule_fields, validate_push_times
+    
+    try:
+        try:
+            validate_push_times(push_times)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        
+        profile = await profile_repository.get(user_id, {"push_times": 1})
+        if not profile:
+            raise HTTPException(status_code=404, detail="健康档案不存在")
+        
+        merged = {**(profile.get("push_times") or {}), **push_times}
+        merged = {slot_id: time_str for slot_id, time_str in merged.items() if time_str is not None}
+        updated = await profile_repository.update(
+            user_id,
+            {"push_times": merged, **schedule_fields(user_id, merged), "updated_at": datetime.now()}
+        )
+        profile_cache.invalidate(user_id)
+        if not updated:
+            raise HTTPException(status_code=404, detail="健康档案不存在")
+        
+        logger.info(f"设置推送时间成功：用户{user_id} {push_times}")
+        return {"status": "success", "message": "推送时间设置成功", "data": merged}
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"设置推送时间失败: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
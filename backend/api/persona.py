@@ -1,70 +1,61 @@
 """人物风格API"""
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Header
 from backend.utils.persona_styles import get_all_persona_styles, PERSONA_STYLES
-from backend.core.mongodb import get_mongodb
-from backend.config.config import settings
+from backend.core.container import get_profile_repository, get_profile_cache
+from backend.core.responses import StaticJSON
 from datetime import datetime
 import logging
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
+# 人物风格为固定内容，启动时编码一次
+PERSONA_STYLES_PAYLOAD = StaticJSON({"status": "success", "data": get_all_persona_styles()})
+PERSONA_STYLE_PAYLOADS = {
+    style_name: StaticJSON({"status": "success", "data": {"style_name": style_name, **style_info}})
+    for style_name, style_info in PERSONA_STYLES.items()
+}
+NO_PERSONA_STYLE_PAYLOAD = StaticJSON({"status": "success", "data": None, "message": "用户尚未选择人物风格"})
+
 
 @router.get("/persona-styles", summary="获取所有人物风格")
-async def get_persona_styles():
+async def get_persona_styles(if_none_match: str = Header(None)):
     """获取所有可用的人物风格"""
-    try:
-        styles = get_all_persona_styles()
-        return {"status": "success", "data": styles}
-    except Exception as e:
-        logger.error(f"获取人物风格失败: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+    return PERSONA_STYLES_PAYLOAD.response(if_none_match)
 
 
 @router.get("/persona-styles/{style_name}", summary="获取指定人物风格详情")
-async def get_persona_style_detail(style_name: str):
+async def get_persona_style_detail(style_name: str, if_none_match: str = Header(None)):
     """获取指定人物风格的详细信息"""
-    try:
-        style_info = PERSONA_STYLES.get(style_name)
-        if not style_info:
-            raise HTTPException(status_code=404, detail="人物风格不存在")
-        
-        return {
-            "status": "success",
-            "data": {
-                "style_name": style_name,
-                **style_info
-            }
-        }
-    except HTTPException:
-        raise
-    except Exception as e:
-        logger.error(f"获取人物风格详情失败: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+    payload = PERSONA_STYLE_PAYLOADS.get(style_name)
+    if not payload:
+        raise HTTPException(status_code=404, detail="人物风格不存在")
+    return payload.response(if_none_match)
 
 
 @router.post("/persona-styles/{user_id}/select", summary="选择人物风格")
-async def select_persona_style(user_id: str, style_name: str):
+async def select_persona_style(
+    user_id: str,
+    style_name: str,
+    profile_repository=Depends(get_profile_repository),
+    profile_cache=Depends(get_profile_cache)
+):
     """用户选择人物风格"""
     try:
         # 检查风格是否存在
         if style_name not in PERSONA_STYLES:
             raise HTTPException(status_code=400, detail="不支持的人物风格")
         
-        # 检查用户是否已填写档案
-        db = get_mongodb()
-        collection = db.get_collection(settings.COLLECTION_HEALTH_PROFILE)
-        profile = collection.find_one({"user_id": user_id})
+        # 更新人物风格，档案不存在时提示先填写档案
+        updated = await profile_repository.update(
+            user_id,
+            {"persona_style": style_name, "updated_at": datetime.now()}
+        )
+        profile_cache.invalidate(user_id)
         
-        if not profile:
+        if not updated:
             raise HTTPException(status_code=400, detail="请先完成健康档案填写")
         
-        # 更新人物风格
-        result = collection.update_one(
-            {"user_id": user_id},
-            {"$set": {"persona_style": style_name, "updated_at": datetime.now()}}
-        )
-        
         logger.info(f"用户{user_id}选择人物风格：{style_name}")
         return {
             "status": "success",
@@ -79,42 +70,29 @@ async def select_persona_style(user_id: str, style_name: str):
 
 
 @router.get("/persona-styles/{user_id}/current", summary="获取用户当前人物风格")
-async def get_current_persona_style(user_id: str):
-    """获取用户当前选择的人物风格"""
+async def get_current_persona_style(
+    user_id: str,
+    if_none_match: str = Header(None),
+    profile_cache=Depends(get_profile_cache)
+):
+    """获取用户当前选择的人物风格，ETag与所选风格的内容对应，未变化时返回304"""
     try:
-        db = get_mongodb()
-        collection = db.get_collection(settings.COLLECTION_HEALTH_PROFILE)
-        profile = collection.find_one({"user_id": user_id})
+        profile = await profile_cache.get(user_id)
         
         if not profile:
             raise HTTPException(status_code=404, detail="用户档案不存在")
         
         style_name = profile.get("persona_style")
         if not style_name:
-            return {
-                "status": "success",
-                "data": None,
-                "message": "用户尚未选择人物风格"
-            }
+            return NO_PERSONA_STYLE_PAYLOAD.response(if_none_match)
         
-        style_info = PERSONA_STYLES.get(style_name, {})
-        return {
-            "status": "success",
-            "data": {
-                "style_name": style_name,
-                **style_info
-            }
-        }
+        payload = PERSONA_STYLE_PAYLOADS.get(style_name) or StaticJSON(
+            {"status": "success", "data": {"style_name": style_name}}
+        )
+        return payload.response(if_none_match)
         
     except HTTPException:
         raise
     except Exception as e:
         logger.error(f"获取当前人物风格失败: {e}")
         raise HTTPException(status_code=500, detail=str(e))
-
-
-
-
-
-
-
@@ -1,6 +1,9 @@
 """健康推送API"""
-from fastapi import APIRouter, HTTPException, Query
-from backend.services.push_service import push_service
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
+from backend.core.container import get_push_service
+from backend.core.responses import FastJSONResponse, dumps
+from backend.models.push import MarkReadRequest
 import logging
 
 logger = logging.getLogger(__name__)
@@ -10,14 +13,15 @@ router = APIRouter()
 @router.post("/push/rest/{user_id}", summary="推送作息提醒")
 async def push_rest_reminder(
     user_id: str,
-    time_type: str = Query(..., description="时间类型：morning/noon/night")
+    time_type: str = Query(..., description="时间类型：morning/noon/night"),
+    push_service=Depends(get_push_service)
 ):
     """手动触发作息提醒推送"""
     try:
         if time_type not in ["morning", "noon", "night"]:
             raise HTTPException(status_code=400, detail="time_type必须是morning/noon/night之一")
         
-        result = push_service.push_rest_reminder(user_id, time_type)
+        result = await push_service.push_rest_reminder(user_id, time_type)
         
         if result["status"] == "error":
             raise HTTPException(status_code=400, detail=result["message"])
@@ -34,14 +38,15 @@ async def push_rest_reminder(
 @router.post("/push/meal/{user_id}", summary="推送饮食提醒")
 async def push_meal_reminder(
     user_id: str,
-    meal_type: str = Query(..., description="餐次类型：breakfast/lunch/dinner")
+    meal_type: str = Query(..., description="餐次类型：breakfast/lunch/dinner"),
+    push_service=Depends(get_push_service)
 ):
     """手动触发饮食提醒推送"""
     try:
         if meal_type not in ["breakfast", "lunch", "dinner"]:
             raise HTTPException(status_code=400, detail="meal_type必须是breakfast/lunch/dinner之一")
         
-        result = push_service.push_meal_reminder(user_id, meal_type)
+        result = await push_service.push_meal_reminder(user_id, meal_type)
         
         if result["status"] == "error":
             raise HTTPException(status_code=400, detail=result["message"])
@@ -56,10 +61,10 @@ async def push_meal_reminder(
 
 
 @router.post("/push/weather/{user_id}", summary="推送天气提醒")
-async def push_weather_reminder(user_id: str):
+async def push_weather_reminder(user_id: str, push_service=Depends(get_push_service)):
     """手动触发天气提醒推送"""
     try:
-        result = push_service.push_weather_reminder(user_id)
+        result = await push_service.push_weather_reminder(user_id)
         
         if result["status"] == "error":
             raise HTTPException(status_code=400, detail=result["message"])
@@ -74,10 +79,10 @@ async def push_weather_reminder(user_id: str):
 
 
 @router.post("/push/health-tip/{user_id}", summary="推送养生妙招")
-async def push_health_tip(user_id: str):
+async def push_health_tip(user_id: str, push_service=Depends(get_push_service)):
     """手动触发养生妙招推送"""
     try:
-        result = push_service.push_health_tip(user_id)
+        result = await push_service.push_health_tip(user_id)
         
         if result["status"] == "error":
             raise HTTPException(status_code=400, detail=result["message"])
@@ -91,31 +96,122 @@ async def push_health_tip(user_id: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+# 流式推送路径中的推送类型
+STREAM_PUSH_TYPES = {"rest": "rest", "meal": "meal", "weather": "weather", "health-tip": "health_tip"}
+
+
+@router.post("/push/{push_type}/{user_id}/stream", summary="流式推送")
+async def stream_push(
+    push_type: str,
+    user_id: str,
+    time_type: str = Query(None, description="作息提醒的时间类型：morning/noon/night"),
+    meal_type: str = Query(None, description="饮食提醒的餐次类型：breakfast/lunch/dinner"),
+    push_service=Depends(get_push_service)
+):
+    """
+    以SSE流式返回推送内容，生成完成后保存推送历史
+    
+    事件：delta 为新生成的一段内容，done 为完整结果，error 为失败原因
+    """
+    if push_type not in STREAM_PUSH_TYPES:
+        raise HTTPException(status_code=404, detail="推送类型不存在")
+    push_type = STREAM_PUSH_TYPES[push_type]
+    
+    params = {}
+    if push_type == "rest":
+        if time_type not in ["morning", "noon", "night"]:
+            raise HTTPException(status_code=400, detail="time_type必须是morning/noon/night之一")
+        params["time_type"] = time_type
+    elif push_type == "meal":
+        if meal_type not in ["breakfast", "lunch", "dinner"]:
+            raise HTTPException(status_code=400, detail="meal_type必须是breakfast/lunch/dinner之一")
+        params["meal_type"] = meal_type
+    
+    async def events():
+        try:
+            async for event, data in push_service.stream_push(push_type, user_id, **params):
+                payload = {"content": data} if event == "delta" else data
+                yield f"event: {event}\ndata: {dumps(payload).decode()}\n\n"
+        except Exception as e:
+            logger.error(f"流式推送失败: {e}")
+            yield f"event: error\ndata: {dumps({'status': 'error', 'message': str(e)}).decode()}\n\n"
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @router.get("/push/history/{user_id}", summary="获取推送历史")
 async def get_push_history(
     user_id: str,
     push_type: str = Query(None, description="推送类型：rest/meal/weather/health_tip，不指定则获取所有"),
-    limit: int = Query(20, ge=1, le=100, description="返回数量限制")
+    limit: int = Query(20, ge=1, le=100, description="返回数量限制"),
+    cursor: str = Query(None, description="上一页返回的next_cursor，获取更早的记录"),
+    since: str = Query(None, description="上次返回的sync_cursor，只获取之后新增的记录"),
+    push_service=Depends(get_push_service)
 ):
-    """获取用户的推送历史记录"""
+    """
+    获取用户的推送历史记录
+    
+    按推送时间倒序分页；指定 since 时只返回新增记录，没有新增时返回304且无响应体。
+    """
+    if cursor and since:
+        raise HTTPException(status_code=400, detail="cursor和since不能同时指定")
     try:
-        history = push_service.get_push_history(user_id, push_type, limit)
-        return {
+        history = await push_service.get_push_history(user_id, push_type, limit, cursor=cursor, since=since)
+        if since and not history["data"]:
+            return Response(status_code=304)
+        return FastJSONResponse({
             "status": "success",
-            "data": history,
-            "count": len(history)
-        }
-        
+            "data": history["data"],
+            "count": len(history["data"]),
+            "next_cursor": history["next_cursor"],
+            "sync_cursor": history["sync_cursor"],
+            "has_more": history["has_more"]
+        })
+        
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"获取推送历史失败: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/push/unread/{user_id}", summary="获取未读推送数")
+async def get_unread_summary(user_id: str, push_service=Depends(get_push_service)):
+    """获取用户各推送类型的未读数，用于角标显示"""
+    try:
+        summary = await push_service.get_unread_summary(user_id)
+        return {"status": "success", "data": summary}
+        
+    except Exception as e:
+        logger.error(f"获取未读数失败: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/push/history/{user_id}/mark-read", summary="批量标记推送为已读")
+async def mark_pushes_as_read(user_id: str, request: MarkReadRequest, push_service=Depends(get_push_service)):
+    """按推送ID列表、推送类型或时间批量标记已读，条件都不指定时标记全部"""
+    try:
+        count = await push_service.mark_many_as_read(
+            user_id, request.push_ids, request.push_type, request.before
+        )
+        return {"status": "success", "message": "标记已读成功", "count": count}
+        
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"批量标记已读失败: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.put("/push/history/{push_id}/read", summary="标记推送为已读")
-async def mark_push_as_read(push_id: str, user_id: str = Query(...)):
+async def mark_push_as_read(push_id: str, user_id: str = Query(...), push_service=Depends(get_push_service)):
     """标记某条推送为已读"""
     try:
-        success = push_service.mark_as_read(user_id, push_id)
+        success = await push_service.mark_as_read(user_id, push_id)
         
         if not success:
             raise HTTPException(status_code=404, detail="推送记录不存在或已读")
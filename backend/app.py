@@ -11,11 +11,11 @@ sys.path.append(str(ROOT_DIR))
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from backend.config.config import settings
-from backend.core.mongodb import get_mongodb
-from backend.scheduler.tasks import health_scheduler
+from backend.core.container import container
+from backend.core.responses import FastJSONResponse
 
 # 导入路由
-from backend.api import health_profile, persona, push
+from backend.api import health_profile, persona, push, export
 
 # 配置日志
 logging.basicConfig(
@@ -27,43 +27,76 @@ logger = logging.getLogger(__name__)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    """应用生命周期管理"""
+    """应用生命周期管理，服务模块在此按需加载"""
     # 启动事件
     logger.info("健康档案助手应用启动中...")
     
-    # 连接MongoDB
-    try:
-        db = get_mongodb()
-        logger.info("MongoDB连接成功")
-    except Exception as e:
-        logger.error(f"MongoDB连接失败: {e}")
+    with container.phase("startup"):
+        # 连接MongoDB，启用预热时同时建立大模型连接池
+        if settings.WARM_UP:
+            await container.warm_up()
+        else:
+            try:
+                await container.get("async_mongodb").ping()
+            except Exception as e:
+                logger.error(f"MongoDB连接失败: {e}")
+        
+        # 创建索引
+        try:
+            with container.phase("ensure_indexes"):
+                from backend.core.indexes import ensure_indexes
+                await ensure_indexes()
+        except Exception as e:
+            logger.error(f"创建索引失败: {e}")
+        
+        # 启动定时任务调度器
+        try:
+            with container.phase("scheduler"):
+                await container.get("health_scheduler").start()
+            logger.info("定时任务调度器启动成功")
+        except Exception as e:
+            logger.error(f"定时任务调度器启动失败: {e}")
     
-    # 启动定时任务调度器
-    try:
-        health_scheduler.start()
-        logger.info("定时任务调度器启动成功")
-    except Exception as e:
-        logger.error(f"定时任务调度器启动失败: {e}")
+    logger.info(f"启动耗时(ms): {container.timings}")
     
     yield
     
-    # 关闭事件
+    # 关闭事件，只关闭已加载的服务
     logger.info("健康档案助手应用关闭中...")
     
-    # 关闭MongoDB连接
+    # 关闭定时任务调度器
+    if container.loaded("health_scheduler"):
+        try:
+            await container.get("health_scheduler").shutdown()
+            logger.info("定时任务调度器已关闭")
+        except Exception as e:
+            logger.error(f"关闭定时任务调度器失败: {e}")
+    
+    # 写入缓冲中剩余的推送历史（调度器未启动时也需执行）
+    if container.loaded("push_service") or container.loaded("health_scheduler"):
+        try:
+            result = await container.get("push_history_writer").close()
+            logger.info(f"推送历史缓冲已写入: {result}")
+        except Exception as e:
+            logger.error(f"写入推送历史缓冲失败: {e}")
+    
+    # 关闭大模型及天气爬虫连接池
     try:
-        db = get_mongodb()
-        db.close()
-        logger.info("MongoDB连接已关闭")
+        for name in ("llm_service", "weather_crawler"):
+            if container.loaded(name):
+                await container.get(name).aclose()
+        logger.info("HTTP连接池已关闭")
     except Exception as e:
-        logger.error(f"关闭MongoDB连接失败: {e}")
+        logger.error(f"关闭HTTP连接池失败: {e}")
     
-    # 关闭定时任务调度器
+    # 关闭MongoDB连接
     try:
-        health_scheduler.shutdown()
-        logger.info("定时任务调度器已关闭")
+        for name in ("async_mongodb", "mongodb"):
+            if container.loaded(name):
+                container.get(name).close()
+        logger.info("MongoDB连接已关闭")
     except Exception as e:
-        logger.error(f"关闭定时任务调度器失败: {e}")
+        logger.error(f"关闭MongoDB连接失败: {e}")
 
 
 # 创建FastAPI应用
@@ -71,7 +104,8 @@ app = FastAPI(
     title="健康档案助手API",
     description="个性化健康资讯推送系统",
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse
 )
 
 # 配置CORS
@@ -88,6 +122,7 @@ app.add_middleware(
 app.include_router(health_profile.router, prefix="/api", tags=["健康档案"])
 app.include_router(persona.router, prefix="/api", tags=["人物风格"])
 app.include_router(push.router, prefix="/api", tags=["健康推送"])
+app.include_router(export.router, prefix="/api", tags=["数据导出"])
 
 
 @app.get("/")
@@ -105,7 +140,16 @@ async def health_check():
     """健康检查接口"""
     return {
         "status": "ok",
-        "message": "服务运行正常"
+        "message": "服务运行正常",
+        "llm_cache": container.get("llm_cache").stats(),
+        "profile_cache": container.get("profile_cache").stats(),
+        "llm_rate": container.get("rate_governor").stats(),
+        "llm_circuit": {
+            **container.get("llm_circuit_breaker").stats(),
+            "fallback_served": container.get("fallback_library").served
+        },
+        "retention": container.get("push_retention").last_run,
+        "startup": container.timings
     }
 
 
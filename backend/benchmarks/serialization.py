@@ -0,0 +1,119 @@
+"""推送历史响应序列化性能对比
+
+构造与 get_push_history 相同结构的响应（默认100条记录），对比单次请求的序列化耗时：
+    原方式    逐条 str(_id)，返回dict，经 jsonable_encoder 后由标准库json编码
+    标准库    FastJSONResponse，未安装orjson时的编码路径
+    orjson   FastJSONResponse，直接编码 ObjectId、datetime
+并校验各方式输出的内容一致。
+
+用法:
+    python -m backend.benchmarks.serialization
+    python -m backend.benchmarks.serialization --items 100 --repeat 2000
+"""
+import argparse
+import json
+import time
+from datetime import datetime, timedelta
+from bson.objectid import ObjectId
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from backend.core import responses
+from backend.core.responses import FastJSONResponse
+
+CONTENTS = {
+    "rest": "夜深了，该放下手机准备睡觉了。早睡早起，充足的睡眠能帮助身体修复，明天才能精神饱满地开始新的一天。",
+    "meal": "午餐时间到了。荤素搭配、细嚼慢咽，七八分饱最合适，饭后可以散步十几分钟帮助消化。",
+    "weather": "【杭州天气】多云转小雨 18~24℃ 东南风 3级\n\n今天午后有雨，出门记得带伞，早晚温差较大注意添衣。",
+    "health_tip": "久坐一小时记得起身活动五分钟，伸展肩颈和腰背，也可以顺便接杯温水，少量多次地补充水分。",
+}
+
+
+def build_history(items: int) -> list:
+    """按数据库返回的结构构造推送记录"""
+    push_time = datetime(2026, 1, 1, 7, 0, 0, 123000)
+    push_types = list(CONTENTS)
+    history = []
+    for index in range(items):
+        push_type = push_types[index % len(push_types)]
+        history.append({
+            "_id": ObjectId(),
+            "user_id": "benchmark_user",
+            "push_type": push_type,
+            "content": CONTENTS[push_type],
+            "push_time": push_time - timedelta(hours=index),
+            "is_read": index % 3 == 0,
+        })
+    return history
+
+
+def _payload(history: list) -> dict:
+    return {
+        "status": "success",
+        "data": history,
+        "count": len(history),
+        "next_cursor": "MjAyNi0wMS0wMVQwNzowMDowMC4xMjMwMDB8NjZhYmNkZWY",
+        "sync_cursor": None,
+        "has_more": True,
+    }
+
+
+def render_before(history: list) -> bytes:
+    records = [dict(record) for record in history]
+    for record in records:
+        record["_id"] = str(record["_id"])
+    return JSONResponse(jsonable_encoder(_payload(records))).body
+
+
+def render_stdlib(history: list) -> bytes:
+    orjson, responses.orjson = responses.orjson, None
+    try:
+        return FastJSONResponse(_payload(history)).body
+    finally:
+        responses.orjson = orjson
+
+
+def render_fast(history: list) -> bytes:
+    return FastJSONResponse(_payload(history)).body
+
+
+RENDERERS = {
+    "原方式(jsonable_encoder+json)": render_before,
+    "FastJSONResponse(标准库)": render_stdlib,
+    "FastJSONResponse(orjson)": render_fast,
+}
+
+
+def measure(render, history: list, repeat: int) -> float:
+    """平均每次请求的序列化耗时（微秒）"""
+    render(history)  # 预热
+    started = time.perf_counter()
+    for _ in range(repeat):
+        render(history)
+    return (time.perf_counter() - started) / repeat * 1_000_000
+
+
+def main(args) -> int:
+    history = build_history(args.items)
+    renderers = dict(RENDERERS)
+    if responses.orjson is None:
+        print("未安装orjson，跳过orjson编码路径")
+        renderers.pop("FastJSONResponse(orjson)")
+
+    expected = json.loads(render_before(history))
+    ok = all(json.loads(render(history)) == expected for render in renderers.values())
+    print(f"推送历史响应：{args.items}条记录，输出{'一致' if ok else '不一致'}")
+
+    baseline = None
+    print(f"  {'方式':<32}{'us/请求':>10}{'字节':>10}{'加速':>8}")
+    for name, render in renderers.items():
+        cost = measure(render, history, args.repeat)
+        baseline = baseline or cost
+        print(f"  {name:<32}{cost:>10.1f}{len(render(history)):>10}{baseline / cost:>7.1f}x")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="推送历史响应序列化性能对比")
+    parser.add_argument("--items", type=int, default=100, help="每个响应的记录数")
+    parser.add_argument("--repeat", type=int, default=1000, help="计时重复次数")
+    raise SystemExit(main(parser.parse_args()))
@@ -0,0 +1,100 @@
+"""天气页面解析性能对比
+
+用 fixtures 目录下保存的天气页面，对比原有的整页BeautifulSoup解析与只解析天气列表片段的lxml解析，
+输出每页耗时和内存分配，并校验两者结果一致。
+
+用法:
+    python -m backend.benchmarks.weather_parser                   # 使用已保存的页面
+    python -m backend.benchmarks.weather_parser --repeat 200
+    python -m backend.benchmarks.weather_parser --save 101210101  # 下载并保存指定城市代码的页面
+"""
+import argparse
+import time
+import tracemalloc
+from pathlib import Path
+import requests
+from backend.utils.weather_crawler import weather_crawler
+from backend.utils.weather_parser import parse_forecast, parse_forecast_soup
+
+FIXTURES_DIR = Path(__file__).parent / "fixtures"
+
+PARSERS = {
+    "bs4(html.parser)": parse_forecast_soup,
+    "lxml(片段)": parse_forecast,
+}
+
+
+def load_fixtures() -> dict:
+    return {path.name: path.read_text(encoding="utf-8") for path in sorted(FIXTURES_DIR.glob("*.html"))}
+
+
+def save_fixture(city_code: str) -> Path:
+    """下载中国天气网页面并保存为 fixture"""
+    response = requests.get(weather_crawler._build_url(city_code), headers=weather_crawler.headers, timeout=10)
+    response.raise_for_status()
+    response.encoding = "utf-8"
+    path = FIXTURES_DIR / f"weather_{city_code}.html"
+    path.write_text(response.text, encoding="utf-8")
+    return path
+
+
+def measure(parser, html: str, repeat: int) -> dict:
+    """
+    Returns:
+        ms_per_page 平均每页耗时；alloc_kb 单次解析累计分配；peak_kb 单次解析峰值内存；blocks 单次解析分配块数
+    """
+    parser(html)  # 预热
+    started = time.perf_counter()
+    for _ in range(repeat):
+        parser(html)
+    elapsed = time.perf_counter() - started
+
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    result = parser(html)
+    after = tracemalloc.take_snapshot()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    diff = [stat for stat in after.compare_to(before, "filename") if stat.size_diff > 0]
+    del result
+
+    return {
+        "ms_per_page": elapsed / repeat * 1000,
+        "alloc_kb": sum(stat.size_diff for stat in diff) / 1024,
+        "peak_kb": peak / 1024,
+        "blocks": sum(stat.count_diff for stat in diff if stat.count_diff > 0),
+    }
+
+
+def main(args) -> int:
+    if args.save:
+        print(f"已保存: {save_fixture(args.save)}")
+        return 0
+
+    fixtures = load_fixtures()
+    if not fixtures:
+        print(f"{FIXTURES_DIR} 中没有页面，可使用 --save 城市代码 下载")
+        return 1
+
+    ok = True
+    for name, html in fixtures.items():
+        expected = parse_forecast_soup(html)
+        actual = parse_forecast(html)
+        same = expected == actual
+        ok = ok and same
+        print(f"\n{name}（{len(html) / 1024:.1f} KB，{len(actual)}天，结果{'一致' if same else '不一致'}）")
+        print(f"  {'解析器':<18}{'ms/页':>10}{'累计分配KB':>14}{'峰值KB':>10}{'分配块数':>10}")
+        for parser_name, parser in PARSERS.items():
+            report = measure(parser, html, args.repeat)
+            print(
+                f"  {parser_name:<18}{report['ms_per_page']:>10.3f}{report['alloc_kb']:>14.1f}"
+                f"{report['peak_kb']:>10.1f}{report['blocks']:>10}"
+            )
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="天气页面解析性能对比")
+    parser.add_argument("--repeat", type=int, default=50, help="每个页面的计时重复次数")
+    parser.add_argument("--save", metavar="CITY_CODE", help="下载并保存指定城市代码的页面后退出")
+    raise SystemExit(main(parser.parse_args()))
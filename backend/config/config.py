@@ -2,7 +2,7 @@ import os
 import yaml
 from pathlib import Path
 from pydantic_settings import BaseSettings
-from typing import List
+from typing import Dict, List
 
 # 获取项目根目录
 ROOT_DIR = Path(__file__).parent.parent.parent.absolute()
@@ -23,11 +23,35 @@ class Settings(BaseSettings):
     HOST: str = yaml_config["server"]["host"]
     PORT: int = yaml_config["server"]["port"]
     DEBUG: bool = yaml_config["server"]["debug"]
+    WARM_UP: bool = yaml_config["server"]["warm_up"]
     
     # 阿里云百炼配置
     DASHSCOPE_URL: str = yaml_config["dashscope"]["url"]
     DASHSCOPE_API_KEY: str = yaml_config["dashscope"]["api_key"]
     DASHSCOPE_MODEL: str = yaml_config["dashscope"]["model"]
+    DASHSCOPE_TIMEOUT: float = yaml_config["dashscope"]["timeout"]
+    DASHSCOPE_POOL_SIZE: int = yaml_config["dashscope"]["pool_size"]
+    DASHSCOPE_KEEPALIVE_EXPIRY: float = yaml_config["dashscope"]["keepalive_expiry"]
+    DASHSCOPE_HTTP2: bool = yaml_config["dashscope"]["http2"]
+    DASHSCOPE_MAX_RETRIES: int = yaml_config["dashscope"]["max_retries"]
+    DASHSCOPE_RETRY_BACKOFF: float = yaml_config["dashscope"]["retry_backoff"]
+    DASHSCOPE_RETRY_BACKOFF_MAX: float = yaml_config["dashscope"]["retry_backoff_max"]
+    DASHSCOPE_RATE_LIMIT_ENABLED: bool = yaml_config["dashscope"]["rate_limit"]["enabled"]
+    DASHSCOPE_REQUESTS_PER_SECOND: float = yaml_config["dashscope"]["rate_limit"]["requests_per_second"]
+    DASHSCOPE_TOKENS_PER_MINUTE: float = yaml_config["dashscope"]["rate_limit"]["tokens_per_minute"]
+    DASHSCOPE_CONCURRENCY_INITIAL: int = yaml_config["dashscope"]["rate_limit"]["initial_concurrency"]
+    DASHSCOPE_CONCURRENCY_MIN: int = yaml_config["dashscope"]["rate_limit"]["min_concurrency"]
+    DASHSCOPE_CONCURRENCY_MAX: int = yaml_config["dashscope"]["rate_limit"]["max_concurrency"]
+    DASHSCOPE_CONCURRENCY_DECREASE_FACTOR: float = yaml_config["dashscope"]["rate_limit"]["decrease_factor"]
+    DASHSCOPE_LATENCY_THRESHOLD: float = yaml_config["dashscope"]["rate_limit"]["latency_threshold"]
+    DASHSCOPE_CONCURRENCY_COOLDOWN: float = yaml_config["dashscope"]["rate_limit"]["cooldown"]
+    DASHSCOPE_BREAKER_ENABLED: bool = yaml_config["dashscope"]["circuit_breaker"]["enabled"]
+    DASHSCOPE_BREAKER_WINDOW: float = yaml_config["dashscope"]["circuit_breaker"]["window"]
+    DASHSCOPE_BREAKER_MIN_CALLS: int = yaml_config["dashscope"]["circuit_breaker"]["min_calls"]
+    DASHSCOPE_BREAKER_FAILURE_RATE: float = yaml_config["dashscope"]["circuit_breaker"]["failure_rate"]
+    DASHSCOPE_BREAKER_OPEN_SECONDS: float = yaml_config["dashscope"]["circuit_breaker"]["open_seconds"]
+    DASHSCOPE_BREAKER_HALF_OPEN_PROBES: int = yaml_config["dashscope"]["circuit_breaker"]["half_open_probes"]
+    DASHSCOPE_BREAKER_PROBE_TIMEOUT: float = yaml_config["dashscope"]["circuit_breaker"]["probe_timeout"]
     
     # MongoDB配置
     MONGODB_URI: str = yaml_config["mongodb"]["uri"]
@@ -35,6 +59,56 @@ class Settings(BaseSettings):
     COLLECTION_HEALTH_PROFILE: str = yaml_config["mongodb"]["collection_health_profile"]
     COLLECTION_PUSH_HISTORY: str = yaml_config["mongodb"]["collection_push_history"]
     COLLECTION_PERSONA_STYLES: str = yaml_config["mongodb"]["collection_persona_styles"]
+    COLLECTION_PUSH_STAGING: str = yaml_config["mongodb"]["collection_push_staging"]
+    COLLECTION_LLM_CACHE: str = yaml_config["mongodb"]["collection_llm_cache"]
+    COLLECTION_PUSH_CLAIMS: str = yaml_config["mongodb"]["collection_push_claims"]
+    COLLECTION_SCHEDULER_NODES: str = yaml_config["mongodb"]["collection_scheduler_nodes"]
+    COLLECTION_SCHEDULER_LEASES: str = yaml_config["mongodb"]["collection_scheduler_leases"]
+    COLLECTION_PUSH_JOBS: str = yaml_config["mongodb"]["collection_push_jobs"]
+    COLLECTION_PUSH_UNREAD: str = yaml_config["mongodb"]["collection_push_unread"]
+    COLLECTION_PUSH_ARCHIVE: str = yaml_config["mongodb"]["collection_push_archive"]
+    MONGODB_MAX_POOL_SIZE: int = yaml_config["mongodb"]["max_pool_size"]
+    MONGODB_MIN_POOL_SIZE: int = yaml_config["mongodb"]["min_pool_size"]
+    MONGODB_MAX_IDLE_TIME_MS: int = yaml_config["mongodb"]["max_idle_time_ms"]
+    MONGODB_WAIT_QUEUE_TIMEOUT_MS: int = yaml_config["mongodb"]["wait_queue_timeout_ms"]
+    
+    # 天气爬虫配置
+    WEATHER_TIMEOUT: float = yaml_config["weather"]["timeout"]
+    WEATHER_POOL_SIZE: int = yaml_config["weather"]["pool_size"]
+    WEATHER_MAX_PER_HOST: int = yaml_config["weather"]["max_per_host"]
+    
+    # 大模型响应缓存配置
+    LLM_CACHE_ENABLED: bool = yaml_config["llm_cache"]["enabled"]
+    LLM_CACHE_MAX_ENTRIES: int = yaml_config["llm_cache"]["max_entries"]
+    LLM_CACHE_SHARED: bool = yaml_config["llm_cache"]["shared"]
+    LLM_CACHE_TTL: Dict[str, int] = yaml_config["llm_cache"]["ttl"]
+    
+    # 健康档案读缓存配置
+    PROFILE_CACHE_ENABLED: bool = yaml_config["profile_cache"]["enabled"]
+    PROFILE_CACHE_MAX_ENTRIES: int = yaml_config["profile_cache"]["max_entries"]
+    PROFILE_CACHE_TTL: int = yaml_config["profile_cache"]["ttl"]
+    PROFILE_CACHE_SHARED: bool = yaml_config["profile_cache"]["shared"]
+    PROFILE_CACHE_VERIFY_INTERVAL: float = yaml_config["profile_cache"]["verify_interval"]
+    
+    # 健康档案批量导入配置
+    PROFILE_IMPORT_BATCH_SIZE: int = yaml_config["profile_import"]["batch_size"]
+    PROFILE_IMPORT_MAX_ERRORS: int = yaml_config["profile_import"]["max_errors"]
+    
+    # 数据导出配置
+    EXPORT_BATCH_SIZE: int = yaml_config["export"]["batch_size"]
+    EXPORT_ADMIN_TOKEN: str = yaml_config["export"]["admin_token"]
+    
+    # 推送历史保留与归档配置
+    RETENTION_ENABLED: bool = yaml_config["retention"]["enabled"]
+    RETENTION_HOT_DAYS: int = yaml_config["retention"]["hot_days"]
+    RETENTION_ARCHIVE_TTL_DAYS: int = yaml_config["retention"]["archive_ttl_days"]
+    RETENTION_BATCH_SIZE: int = yaml_config["retention"]["batch_size"]
+    RETENTION_RUN_TIME: str = yaml_config["retention"]["run_time"]
+    
+    # 推送历史批量写入配置
+    HISTORY_WRITER_BATCH_SIZE: int = yaml_config["history_writer"]["batch_size"]
+    HISTORY_WRITER_FLUSH_INTERVAL: float = yaml_config["history_writer"]["flush_interval"]
+    HISTORY_WRITER_MAX_RETRIES: int = yaml_config["history_writer"]["max_retries"]
     
     # 定时任务配置
     SCHEDULER_TIMEZONE: str = yaml_config["scheduler"]["timezone"]
@@ -42,6 +116,37 @@ class Settings(BaseSettings):
     MEAL_TIMES: List[str] = yaml_config["scheduler"]["meal_times"]
     WEATHER_TIME: str = yaml_config["scheduler"]["weather_time"]
     HEALTH_TIP_TIME: str = yaml_config["scheduler"]["health_tip_time"]
+    SCHEDULER_GLOBAL_CONCURRENCY: int = yaml_config["scheduler"]["concurrency"]["global"]
+    SCHEDULER_TASK_CONCURRENCY: Dict[str, int] = {
+        task_type: limit
+        for task_type, limit in yaml_config["scheduler"]["concurrency"].items()
+        if task_type != "global"
+    }
+    SCHEDULER_USER_TIMEOUT: float = yaml_config["scheduler"]["user_timeout"]
+    SCHEDULER_CURSOR_BATCH_SIZE: int = yaml_config["scheduler"]["cursor_batch_size"]
+    IDEMPOTENCY_CLAIM_TIMEOUT: float = yaml_config["scheduler"]["idempotency"]["claim_timeout"]
+    IDEMPOTENCY_TTL: int = yaml_config["scheduler"]["idempotency"]["ttl"]
+    SHARDING_ENABLED: bool = yaml_config["scheduler"]["sharding"]["enabled"]
+    SHARDING_BUCKETS: int = yaml_config["scheduler"]["sharding"]["buckets"]
+    SHARDING_LEASE_SECONDS: float = yaml_config["scheduler"]["sharding"]["lease_seconds"]
+    SHARDING_HEARTBEAT_INTERVAL: float = yaml_config["scheduler"]["sharding"]["heartbeat_interval"]
+    SHARDING_RUN_TTL: int = yaml_config["scheduler"]["sharding"]["run_ttl"]
+    QUEUE_ENABLED: bool = yaml_config["scheduler"]["queue"]["enabled"]
+    QUEUE_CONSUMERS: int = yaml_config["scheduler"]["queue"]["consumers"]
+    QUEUE_VISIBILITY_TIMEOUT: float = yaml_config["scheduler"]["queue"]["visibility_timeout"]
+    QUEUE_MAX_ATTEMPTS: int = yaml_config["scheduler"]["queue"]["max_attempts"]
+    QUEUE_RETRY_DELAY: float = yaml_config["scheduler"]["queue"]["retry_delay"]
+    QUEUE_POLL_INTERVAL: float = yaml_config["scheduler"]["queue"]["poll_interval"]
+    QUEUE_ENQUEUE_BATCH_SIZE: int = yaml_config["scheduler"]["queue"]["enqueue_batch_size"]
+    QUEUE_CATCHUP_MINUTES: int = yaml_config["scheduler"]["queue"]["catchup_minutes"]
+    QUEUE_TTL: int = yaml_config["scheduler"]["queue"]["ttl"]
+    DISPATCH_ENABLED: bool = yaml_config["scheduler"]["dispatch"]["enabled"]
+    DISPATCH_CATCHUP_MINUTES: int = yaml_config["scheduler"]["dispatch"]["catchup_minutes"]
+    DISPATCH_JITTER: Dict[str, int] = yaml_config["scheduler"]["dispatch"]["jitter"]
+    PREGENERATE_ENABLED: bool = yaml_config["scheduler"]["pregenerate"]["enabled"]
+    PREGENERATE_LEAD_MINUTES: int = yaml_config["scheduler"]["pregenerate"]["lead_minutes"]
+    PREGENERATE_BATCH_SIZE: int = yaml_config["scheduler"]["pregenerate"]["batch_size"]
+    PREGENERATE_STAGING_TTL: int = yaml_config["scheduler"]["pregenerate"]["staging_ttl"]
     
     # JWT配置（用于用户认证）
     SECRET_KEY: str = "your-secret-key-change-in-production"
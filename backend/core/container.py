@@ -0,0 +1,99 @@
+"""服务容器：按需导入并获取全局服务实例
+
+各服务仍是所在模块的全局实例，容器只记录其位置，首次使用时才导入对应模块。
+导入 backend.app 时不会加载调度器、大模型、爬虫等模块，由 lifespan 或首个请求触发。档案路由依赖的
+仓库模块会随之导入MongoDB驱动，但不会建立连接，连接在 lifespan 中或首次访问集合时建立。
+"""
+import asyncio
+import importlib
+import logging
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict
+
+logger = logging.getLogger(__name__)
+
+# 服务名 -> "模块路径:实例名"
+SERVICES = {
+    "async_mongodb": "backend.core.mongodb:async_mongodb",
+    "mongodb": "backend.core.mongodb:mongodb",
+    "profile_repository": "backend.repositories.profile_repository:profile_repository",
+    "profile_cache": "backend.services.profile_cache:profile_cache",
+    "profile_importer": "backend.services.profile_import:profile_importer",
+    "data_exporter": "backend.services.data_export:data_exporter",
+    "push_service": "backend.services.push_service:push_service",
+    "llm_service": "backend.services.llm_service:llm_service",
+    "llm_cache": "backend.services.llm_cache:llm_cache",
+    "rate_governor": "backend.services.rate_governor:rate_governor",
+    "llm_circuit_breaker": "backend.services.circuit_breaker:llm_circuit_breaker",
+    "fallback_library": "backend.services.fallback_content:fallback_library",
+    "push_history_writer": "backend.services.history_writer:push_history_writer",
+    "push_retention": "backend.services.retention:push_retention",
+    "weather_crawler": "backend.utils.weather_crawler:weather_crawler",
+    "health_scheduler": "backend.scheduler.tasks:health_scheduler",
+}
+
+
+class ServiceContainer:
+    """服务的延迟获取，并记录导入及各启动阶段耗时"""
+
+    def __init__(self, services: Dict[str, str]):
+        self._services = services
+        self._instances = {}
+        # 阶段名 -> 耗时（毫秒）
+        self.timings: Dict[str, float] = {}
+
+    @contextmanager
+    def phase(self, name: str):
+        """记录一个启动阶段的耗时"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = round((time.perf_counter() - started) * 1000, 2)
+
+    def get(self, name: str):
+        """获取服务实例，首次获取时导入所在模块"""
+        if name not in self._instances:
+            module_path, attribute = self._services[name].split(":")
+            with self.phase(f"load:{name}"):
+                self._instances[name] = getattr(importlib.import_module(module_path), attribute)
+        return self._instances[name]
+
+    def loaded(self, name: str) -> bool:
+        return name in self._instances
+
+    def dependency(self, name: str) -> Callable:
+        """生成FastAPI依赖函数，路由通过 Depends 获取服务"""
+        def provide():
+            return self.get(name)
+        provide.__name__ = f"get_{name}"
+        return provide
+
+    async def warm_up(self):
+        """预先建立MongoDB和大模型连接池，各项并行执行，失败只记录日志"""
+        async def timed(name: str, coroutine):
+            started = time.perf_counter()
+            try:
+                await coroutine
+            except Exception as e:
+                logger.warning(f"预热{name}失败: {e}")
+            finally:
+                self.timings[f"warm_up:{name}"] = round((time.perf_counter() - started) * 1000, 2)
+
+        with self.phase("warm_up"):
+            await asyncio.gather(
+                timed("mongodb", self.get("async_mongodb").ping()),
+                timed("llm", self.get("llm_service").warm_up()),
+            )
+
+
+# 全局服务容器实例
+container = ServiceContainer(SERVICES)
+
+# 路由使用的依赖
+get_profile_repository = container.dependency("profile_repository")
+get_profile_cache = container.dependency("profile_cache")
+get_profile_importer = container.dependency("profile_importer")
+get_data_exporter = container.dependency("data_exporter")
+get_push_service = container.dependency("push_service")
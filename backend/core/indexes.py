@@ -0,0 +1,280 @@
+"""MongoDB索引管理与查询计划检查
+
+用法:
+    python -m backend.core.indexes            # 创建索引
+    python -m backend.core.indexes --explain  # 检查已知查询的执行计划
+"""
+import argparse
+import asyncio
+import logging
+from datetime import datetime
+from bson.objectid import ObjectId
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from backend.core.mongodb import get_async_mongodb
+from backend.config.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def index_specs() -> dict:
+    """各集合需要的索引，键为集合名"""
+    archive_indexes = [
+        # 翻页越过热数据窗口后读取归档
+        IndexModel(
+            [("u", ASCENDING), ("t", ASCENDING), ("p", DESCENDING), ("_id", DESCENDING)],
+            name="user_type_time_id"
+        ),
+        IndexModel([("u", ASCENDING), ("p", DESCENDING), ("_id", DESCENDING)], name="user_time_id"),
+        # 按时间范围导出
+        IndexModel([("p", ASCENDING), ("_id", ASCENDING)], name="push_time_id"),
+    ]
+    if settings.RETENTION_ARCHIVE_TTL_DAYS > 0:
+        # 推送时间超过保留期的归档记录自动删除
+        archive_indexes.append(IndexModel(
+            [("p", ASCENDING)],
+            expireAfterSeconds=settings.RETENTION_ARCHIVE_TTL_DAYS * 86400,
+            name="push_time_ttl"
+        ))
+    
+    return {
+        settings.COLLECTION_HEALTH_PROFILE: [
+            IndexModel([("user_id", ASCENDING)], unique=True, name="user_id_unique"),
+            # 档案缓存校验版本号，查询只读索引
+            IndexModel([("user_id", ASCENDING), ("version", ASCENDING)], name="user_id_version"),
+            # 多实例分片按哈希区间读取档案
+            IndexModel([("shard_hash", ASCENDING)], name="shard_hash"),
+            # 分散投递按分钟查询到期的用户
+            IndexModel([("push_schedule.minute", ASCENDING)], name="push_schedule_minute"),
+        ],
+        settings.COLLECTION_PUSH_HISTORY: [
+            # 按类型分页查询历史，_id 用于同一时间的记录排序
+            IndexModel(
+                [("user_id", ASCENDING), ("push_type", ASCENDING), ("push_time", DESCENDING), ("_id", DESCENDING)],
+                name="user_type_time_id"
+            ),
+            # 不指定类型分页查询历史
+            IndexModel(
+                [("user_id", ASCENDING), ("push_time", DESCENDING), ("_id", DESCENDING)],
+                name="user_time_id"
+            ),
+            # 按时间范围导出，按推送时间归档
+            IndexModel([("push_time", ASCENDING), ("_id", ASCENDING)], name="push_time_id"),
+            # 定时推送的幂等键，手动推送没有该字段
+            IndexModel(
+                [("idempotency_key", ASCENDING)],
+                unique=True,
+                partialFilterExpression={"idempotency_key": {"$exists": True}},
+                name="idempotency_key_unique"
+            ),
+        ],
+        settings.COLLECTION_PUSH_ARCHIVE: archive_indexes,
+        settings.COLLECTION_PUSH_CLAIMS: [
+            IndexModel(
+                [("claimed_at", ASCENDING)],
+                expireAfterSeconds=settings.IDEMPOTENCY_TTL,
+                name="claimed_at_ttl"
+            ),
+        ],
+        settings.COLLECTION_PUSH_STAGING: [
+            IndexModel(
+                [("user_id", ASCENDING), ("push_type", ASCENDING), ("slot", ASCENDING)],
+                unique=True,
+                name="user_type_slot_unique"
+            ),
+            # 按时段投递
+            IndexModel([("push_type", ASCENDING), ("slot", ASCENDING)], name="type_slot"),
+            # 过期未投递的暂存内容自动清理
+            IndexModel(
+                [("created_at", ASCENDING)],
+                expireAfterSeconds=settings.PREGENERATE_STAGING_TTL,
+                name="created_at_ttl"
+            ),
+        ],
+        settings.COLLECTION_PUSH_JOBS: [
+            # 领取待执行任务及超时任务
+            IndexModel([("status", ASCENDING), ("available_at", ASCENDING)], name="status_available"),
+            IndexModel([("status", ASCENDING), ("lease_until", ASCENDING)], name="status_lease"),
+            IndexModel(
+                [("created_at", ASCENDING)],
+                expireAfterSeconds=settings.QUEUE_TTL,
+                name="created_at_ttl"
+            ),
+        ],
+        settings.COLLECTION_SCHEDULER_LEASES: [
+            IndexModel([("run_id", ASCENDING), ("bucket", ASCENDING)], name="run_bucket"),
+            IndexModel(
+                [("created_at", ASCENDING)],
+                expireAfterSeconds=settings.SHARDING_RUN_TTL,
+                name="created_at_ttl"
+            ),
+        ],
+        settings.COLLECTION_SCHEDULER_NODES: [
+            IndexModel(
+                [("heartbeat", ASCENDING)],
+                expireAfterSeconds=settings.SHARDING_RUN_TTL,
+                name="heartbeat_ttl"
+            ),
+        ],
+        settings.COLLECTION_LLM_CACHE: [
+            # 到期的缓存自动删除
+            IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0, name="expires_at_ttl"),
+        ],
+    }
+
+
+# 已被替代的索引，创建索引时删除
+OBSOLETE_INDEXES = {
+    settings.COLLECTION_PUSH_HISTORY: ["user_type_time", "user_time", "read_batch"],
+}
+
+
+def query_shapes() -> list:
+    """代码中使用的查询形态，用于执行计划检查"""
+    return [
+        {
+            "name": "获取健康档案",
+            "collection": settings.COLLECTION_HEALTH_PROFILE,
+            "filter": {"user_id": "__explain__"},
+        },
+        {
+            "name": "按类型获取推送历史",
+            "collection": settings.COLLECTION_PUSH_HISTORY,
+            "filter": {"user_id": "__explain__", "push_type": "rest"},
+            "sort": [("push_time", DESCENDING), ("_id", DESCENDING)],
+        },
+        {
+            "name": "获取全部推送历史",
+            "collection": settings.COLLECTION_PUSH_HISTORY,
+            "filter": {"user_id": "__explain__"},
+            "sort": [("push_time", DESCENDING), ("_id", DESCENDING)],
+        },
+        {
+            "name": "推送历史翻页",
+            "collection": settings.COLLECTION_PUSH_HISTORY,
+            "filter": {
+                "user_id": "__explain__",
+                "$or": [
+                    {"push_time": {"$lt": datetime(2000, 1, 1)}},
+                    {"push_time": datetime(2000, 1, 1), "_id": {"$lt": ObjectId("0" * 24)}},
+                ],
+            },
+            "sort": [("push_time", DESCENDING), ("_id", DESCENDING)],
+        },
+        {
+            "name": "推送历史增量获取",
+            "collection": settings.COLLECTION_PUSH_HISTORY,
+            "filter": {
+                "user_id": "__explain__",
+                "push_type": "rest",
+                "$or": [
+                    {"push_time": {"$gt": datetime(2000, 1, 1)}},
+                    {"push_time": datetime(2000, 1, 1), "_id": {"$gt": ObjectId("0" * 24)}},
+                ],
+            },
+            "sort": [("push_time", ASCENDING), ("_id", ASCENDING)],
+        },
+        {
+            "name": "按分钟读取到期推送的档案",
+            "collection": settings.COLLECTION_HEALTH_PROFILE,
+            "filter": {"push_schedule.minute": 420},
+        },
+        {
+            "name": "读取待归档推送历史",
+            "collection": settings.COLLECTION_PUSH_HISTORY,
+            "filter": {"push_time": {"$lt": datetime(2000, 1, 1)}},
+            "sort": [("push_time", ASCENDING), ("_id", ASCENDING)],
+        },
+        {
+            "name": "归档推送历史翻页",
+            "collection": settings.COLLECTION_PUSH_ARCHIVE,
+            "filter": {
+                "u": "__explain__",
+                "$or": [
+                    {"p": {"$lt": datetime(2000, 1, 1)}},
+                    {"p": datetime(2000, 1, 1), "_id": {"$lt": ObjectId("0" * 24)}},
+                ],
+            },
+            "sort": [("p", DESCENDING), ("_id", DESCENDING)],
+        },
+        {
+            "name": "按哈希区间读取档案",
+            "collection": settings.COLLECTION_HEALTH_PROFILE,
+            "filter": {"shard_hash": {"$gte": 0, "$lt": 1024}},
+        },
+        {
+            "name": "投递暂存推送",
+            "collection": settings.COLLECTION_PUSH_STAGING,
+            "filter": {"push_type": "rest", "slot": "__explain__"},
+        },
+    ]
+
+
+async def ensure_indexes():
+    """创建所有索引，已存在的索引不会重复创建"""
+    db = get_async_mongodb()
+    for collection_name, models in index_specs().items():
+        try:
+            names = await db.get_collection(collection_name).create_indexes(models)
+            logger.info(f"集合{collection_name}索引已就绪: {', '.join(names)}")
+        except Exception as e:
+            logger.error(f"集合{collection_name}创建索引失败: {e}")
+    
+    for collection_name, names in OBSOLETE_INDEXES.items():
+        collection = db.get_collection(collection_name)
+        existing = await collection.index_information()
+        for name in names:
+            if name in existing:
+                await collection.drop_index(name)
+                logger.info(f"集合{collection_name}已删除被替代的索引: {name}")
+
+
+def _plan_stages(plan: dict) -> list:
+    """展开执行计划树中的所有阶段名"""
+    stages = [plan.get("stage")]
+    for child_key in ("inputStage", "queryPlan"):
+        if child_key in plan:
+            stages.extend(_plan_stages(plan[child_key]))
+    for child in plan.get("inputStages", []):
+        stages.extend(_plan_stages(child))
+    return stages
+
+
+async def explain_queries() -> list:
+    """
+    对每个已知查询执行 explain，标记未使用索引扫描的计划
+
+    Returns:
+        每个查询的检查结果：name、stages、ok
+    """
+    db = get_async_mongodb()
+    reports = []
+    for shape in query_shapes():
+        cursor = db.get_collection(shape["collection"]).find(shape["filter"])
+        if shape.get("sort"):
+            cursor = cursor.sort(shape["sort"])
+        explain = await cursor.explain()
+        stages = _plan_stages(explain["queryPlanner"]["winningPlan"])
+        # 全表扫描或内存排序都说明缺少合适的索引
+        ok = "COLLSCAN" not in stages and "SORT" not in stages
+        reports.append({"name": shape["name"], "stages": stages, "ok": ok})
+    return reports
+
+
+async def _main(args):
+    if args.explain:
+        all_ok = True
+        for report in await explain_queries():
+            flag = "OK  " if report["ok"] else "WARN"
+            print(f"[{flag}] {report['name']}: {' -> '.join(report['stages'])}")
+            all_ok = all_ok and report["ok"]
+        return 0 if all_ok else 1
+
+    await ensure_indexes()
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="MongoDB索引管理")
+    parser.add_argument("--explain", action="store_true", help="检查已知查询的执行计划，而不是创建索引")
+    raise SystemExit(asyncio.run(_main(parser.parse_args())))
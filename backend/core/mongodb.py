@@ -1,12 +1,23 @@
 """MongoDB数据库连接管理"""
 from pymongo import MongoClient
 from pymongo.database import Database
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
 from backend.config.config import settings
 import logging
 
 logger = logging.getLogger(__name__)
 
 
+def pool_options() -> dict:
+    """连接池配置，同步与异步客户端共用"""
+    return {
+        "maxPoolSize": settings.MONGODB_MAX_POOL_SIZE,
+        "minPoolSize": settings.MONGODB_MIN_POOL_SIZE,
+        "maxIdleTimeMS": settings.MONGODB_MAX_IDLE_TIME_MS,
+        "waitQueueTimeoutMS": settings.MONGODB_WAIT_QUEUE_TIMEOUT_MS,
+    }
+
+
 class MongoDB:
     """MongoDB连接管理类"""
     
@@ -17,7 +28,7 @@ class MongoDB:
     def connect(self):
         """连接到MongoDB数据库"""
         try:
-            self.client = MongoClient(settings.MONGODB_URI)
+            self.client = MongoClient(settings.MONGODB_URI, **pool_options())
             self.db = self.client[settings.MONGODB_DATABASE]
             # 测试连接
             self.client.admin.command('ping')
@@ -49,3 +60,48 @@ def get_mongodb() -> MongoDB:
         mongodb.connect()
     return mongodb
 
+
+
+class AsyncMongoDB:
+    """MongoDB异步连接管理类，供异步接口和定时任务使用，不阻塞事件循环"""
+    
+    def __init__(self):
+        self.client: AsyncIOMotorClient = None
+        self.db: AsyncIOMotorDatabase = None
+    
+    def connect(self):
+        """创建异步客户端，实际连接在首次操作时建立"""
+        self.client = AsyncIOMotorClient(settings.MONGODB_URI, **pool_options())
+        self.db = self.client[settings.MONGODB_DATABASE]
+    
+    async def ping(self):
+        """测试连接，未创建客户端时先创建"""
+        if self.client is None:
+            self.connect()
+        await self.client.admin.command('ping')
+        logger.info("MongoDB异步连接成功")
+    
+    def close(self):
+        """关闭异步连接"""
+        if self.client is not None:
+            self.client.close()
+            self.client = None
+            self.db = None
+            logger.info("MongoDB异步连接已关闭")
+    
+    def get_collection(self, collection_name: str):
+        """获取指定集合"""
+        if self.db is None:
+            self.connect()
+        return self.db[collection_name]
+
+
+# 全局MongoDB异步实例
+async_mongodb = AsyncMongoDB()
+
+
+def get_async_mongodb() -> AsyncMongoDB:
+    """获取MongoDB异步实例"""
+    if async_mongodb.client is None:
+        async_mongodb.connect()
+    return async_mongodb
@@ -0,0 +1,70 @@
+"""JSON响应序列化
+
+所有路由的默认响应类为 FastJSONResponse：安装了orjson时用orjson编码，否则退回标准库json，
+ObjectId 编码为字符串，datetime 编码为ISO格式。
+
+返回普通dict时FastAPI仍会先经过 jsonable_encoder；返回数据库文档的路由直接返回 FastJSONResponse，
+文档中的 ObjectId、datetime 无需逐个转换。内容固定的响应用 StaticJSON 启动时编码一次。
+"""
+import hashlib
+import importlib.util
+import json
+from datetime import date, datetime
+from bson.objectid import ObjectId
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, Response
+
+orjson = importlib.import_module("orjson") if importlib.util.find_spec("orjson") else None
+
+
+def _default(value):
+    """编码器不支持的类型：ObjectId 转为字符串，其余交给 jsonable_encoder"""
+    if isinstance(value, ObjectId):
+        return str(value)
+    return jsonable_encoder(value)
+
+
+def _default_stdlib(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return _default(value)
+
+
+def dumps(content) -> bytes:
+    """将内容编码为JSON字节串"""
+    if orjson is not None:
+        return orjson.dumps(content, default=_default)
+    return json.dumps(
+        content, ensure_ascii=False, allow_nan=False, separators=(",", ":"), default=_default_stdlib
+    ).encode("utf-8")
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """判断 If-None-Match 请求头是否包含该ETag，忽略弱校验前缀"""
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    return "*" in candidates or any(
+        (candidate[2:] if candidate.startswith("W/") else candidate) == etag for candidate in candidates
+    )
+
+
+class FastJSONResponse(JSONResponse):
+    """使用 dumps 编码的JSON响应"""
+
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+
+class StaticJSON:
+    """预先编码的固定响应体，ETag由内容哈希生成"""
+
+    def __init__(self, content):
+        self.body = dumps(content)
+        self.etag = f'"{hashlib.sha256(self.body).hexdigest()[:16]}"'
+
+    def response(self, if_none_match: str = None) -> Response:
+        """生成响应，If-None-Match 与ETag一致时返回304"""
+        if etag_matches(if_none_match, self.etag):
+            return Response(status_code=304, headers={"ETag": self.etag})
+        return Response(self.body, media_type="application/json", headers={"ETag": self.etag})
@@ -0,0 +1,11 @@
+"""推送数据模型"""
+from pydantic import BaseModel, Field
+from typing import Optional, List
+from datetime import datetime
+
+
+class MarkReadRequest(BaseModel):
+    """批量标记已读条件，条件之间为“且”，都不指定时标记全部"""
+    push_ids: Optional[List[str]] = Field(None, description="推送记录ID列表")
+    push_type: Optional[str] = Field(None, description="推送类型：rest/meal/weather/health_tip")
+    before: Optional[datetime] = Field(None, description="只标记推送时间早于该时间的记录")
@@ -0,0 +1,149 @@
+"""健康档案数据访问"""
+import zlib
+from datetime import datetime
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from backend.core.mongodb import get_async_mongodb
+from backend.config.config import settings
+
+# user_id 哈希空间大小，多实例分片按该空间的区间划分用户
+SHARD_HASH_SPACE = 1 << 16
+
+
+def user_shard_hash(user_id: str) -> int:
+    """user_id 的稳定哈希，取值 [0, SHARD_HASH_SPACE)"""
+    return zlib.crc32(user_id.encode("utf-8")) % SHARD_HASH_SPACE
+
+
+class ProfileRepository:
+    """健康档案集合的异步读写"""
+    
+    @property
+    def collection(self):
+        return get_async_mongodb().get_collection(settings.COLLECTION_HEALTH_PROFILE)
+    
+    async def get(self, user_id: str, projection: dict = None) -> dict:
+        """按用户ID获取档案，不存在时返回None"""
+        return await self.collection.find_one({"user_id": user_id}, projection)
+    
+    async def create(self, profile: dict):
+        """创建档案，返回插入的文档ID"""
+        profile.setdefault("shard_hash", user_shard_hash(profile["user_id"]))
+        profile.setdefault("version", 1)
+        result = await self.collection.insert_one(profile)
+        return result.inserted_id
+    
+    async def update(self, user_id: str, fields: dict) -> bool:
+        """更新档案字段并将版本号加一，返回档案是否存在"""
+        result = await self.collection.update_one({"user_id": user_id}, {"$set": fields, "$inc": {"version": 1}})
+        return result.matched_count > 0
+    
+    async def delete(self, user_id: str) -> bool:
+        """删除档案，返回是否删除成功"""
+        result = await self.collection.delete_one({"user_id": user_id})
+        return result.deleted_count > 0
+    
+    async def upsert_many(self, profiles: list, overwrite: bool = True) -> dict:
+        """
+        以一次无序 bulk_write 按 user_id 批量写入档案
+        
+        Args:
+            profiles: 含 user_id、basic_info、health_info、other_info 的档案，
+                可附带只在新建档案时写入的 push_schedule、schedule_signature
+            overwrite: user_id 已存在时是否更新档案内容，为False时保持原档案不变
+        
+        Returns:
+            inserted 新建档案的序号；matched 已存在的档案数；errors {序号: 错误信息}
+        """
+        now = datetime.now()
+        operations = []
+        for profile in profiles:
+            content = {key: profile[key] for key in ("basic_info", "health_info", "other_info")}
+            on_insert = {
+                "user_id": profile["user_id"],
+                "shard_hash": user_shard_hash(profile["user_id"]),
+                "persona_style": None,
+                "location": None,
+                "created_at": now,
+                **{field: profile[field] for field in ("push_schedule", "schedule_signature") if field in profile},
+            }
+            if overwrite:
+                update = {"$set": {**content, "updated_at": now}, "$setOnInsert": on_insert, "$inc": {"version": 1}}
+            else:
+                update = {"$setOnInsert": {**on_insert, **content, "updated_at": now, "version": 1}}
+            operations.append(UpdateOne({"user_id": profile["user_id"]}, update, upsert=True))
+        
+        try:
+            details = (await self.collection.bulk_write(operations, ordered=False)).bulk_api_result
+        except BulkWriteError as e:
+            details = e.details
+        return {
+            "inserted": [upserted["index"] for upserted in details.get("upserted", [])],
+            "matched": details.get("nMatched", 0),
+            "errors": {error["index"]: error.get("errmsg", "") for error in details.get("writeErrors", [])},
+        }
+    
+    async def iter_profiles(self, query: dict, projection: dict, batch_size: int):
+        """通过单个分批游标流式读取档案"""
+        cursor = self.collection.find(query, projection).batch_size(batch_size)
+        async for profile in cursor:
+            yield profile
+    
+    async def iter_due_profiles(self, minute: int, projection: dict, batch_size: int, shard_range: tuple = None):
+        """按 push_schedule.minute 索引流式读取该分钟有推送到期的档案，可限定 shard_hash 区间 [lo, hi)"""
+        query = {"push_schedule.minute": minute}
+        if shard_range is not None:
+            query["shard_hash"] = {"$gte": shard_range[0], "$lt": shard_range[1]}
+        cursor = self.collection.find(query, projection).batch_size(batch_size)
+        async for profile in cursor:
+            yield profile
+    
+    async def distinct_locations(self, query: dict = None) -> list:
+        """设置了地区的用户所在的全部 {province, city}，可附加档案过滤条件"""
+        cursor = self.collection.aggregate([
+            {"$match": {**(query or {}), "location": {"$ne": None}}},
+            {"$group": {"_id": {"province": "$location.province", "city": "$location.city"}}}
+        ])
+        return [group["_id"] async for group in cursor]
+    
+    async def backfill_shard_hash(self, batch_size: int = 1000) -> int:
+        """为缺少 shard_hash 的历史档案补写哈希，返回补写条数"""
+        updated = 0
+        batch = []
+        cursor = self.collection.find({"shard_hash": {"$exists": False}}, {"user_id": 1})
+        async for profile in cursor:
+            batch.append(UpdateOne({"_id": profile["_id"]}, {"$set": {"shard_hash": user_shard_hash(profile["user_id"])}}))
+            if len(batch) >= batch_size:
+                updated += (await self.collection.bulk_write(batch, ordered=False)).modified_count
+                batch = []
+        if batch:
+            updated += (await self.collection.bulk_write(batch, ordered=False)).modified_count
+        return updated
+
+    async def backfill_push_schedule(self, signature: str, compute, batch_size: int = 1000) -> int:
+        """
+        为推送时间表缺失或签名与 signature 不一致的档案重新写入 push_schedule，返回更新条数
+        
+        Args:
+            signature: 当前推送时间表配置的签名
+            compute: 由 (user_id, push_times) 计算推送时间表相关字段的函数
+        """
+        updated = 0
+        batch = []
+        cursor = self.collection.find(
+            {"schedule_signature": {"$ne": signature}},
+            {"user_id": 1, "push_times": 1}
+        )
+        async for profile in cursor:
+            fields = compute(profile["user_id"], profile.get("push_times"))
+            batch.append(UpdateOne({"_id": profile["_id"]}, {"$set": fields}))
+            if len(batch) >= batch_size:
+                updated += (await self.collection.bulk_write(batch, ordered=False)).modified_count
+                batch = []
+        if batch:
+            updated += (await self.collection.bulk_write(batch, ordered=False)).modified_count
+        return updated
+
+
+# 全局健康档案数据访问实例
+profile_repository = ProfileRepository()
@@ -0,0 +1,592 @@
+"""推送历史与暂存数据访问"""
+import asyncio
+import base64
+import binascii
+import logging
+import zlib
+from collections import Counter
+from datetime import datetime, timedelta
+from bson.binary import Binary
+from bson.errors import InvalidId
+from bson.objectid import ObjectId
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from backend.core.mongodb import get_async_mongodb
+from backend.config.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def encode_history_cursor(record: dict) -> str:
+    """由推送记录的 (push_time, _id) 生成分页游标"""
+    raw = f"{record['push_time'].isoformat()}|{record['_id']}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_history_cursor(cursor: str) -> tuple:
+    """
+    解析分页游标
+
+    Returns:
+        (push_time, _id)
+
+    Raises:
+        ValueError: 游标格式不正确
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        push_time, record_id = raw.split("|")
+        return datetime.fromisoformat(push_time), ObjectId(record_id)
+    except (binascii.Error, UnicodeDecodeError, InvalidId, ValueError):
+        raise ValueError(f"无效的游标: {cursor}")
+
+
+def _keyset_after(after: tuple) -> list:
+    push_time, record_id = after
+    return [
+        {"push_time": {"$gt": push_time}},
+        {"push_time": push_time, "_id": {"$gt": record_id}},
+    ]
+
+
+def _keyset_before(before: tuple) -> list:
+    push_time, record_id = before
+    return [
+        {"push_time": {"$lt": push_time}},
+        {"push_time": push_time, "_id": {"$lt": record_id}},
+    ]
+
+
+class PushUnreadRepository:
+    """
+    按用户、推送类型维护的未读计数
+
+    每个用户一个文档 {_id: user_id, counts: {push_type: 未读数}, seq: 更新次数}，推送历史写入和标记已读时
+    先修改推送历史再以 $inc 更新，读取未读数只需按 _id 取一个文档。计数功能上线前的历史记录由 recount
+    按推送历史重新统计，统计后文档带 initialized 标记。
+    """
+    
+    # recount 期间计数被并发更新时重新统计的次数
+    RECOUNT_ATTEMPTS = 3
+    
+    @property
+    def collection(self):
+        return get_async_mongodb().get_collection(settings.COLLECTION_PUSH_UNREAD)
+    
+    async def add(self, deltas: dict):
+        """
+        批量调整未读数
+        
+        Args:
+            deltas: {(user_id, push_type): 增量}，标记已读时为负数
+        """
+        operations = [
+            UpdateOne({"_id": user_id}, {"$inc": {f"counts.{push_type}": delta, "seq": 1}}, upsert=True)
+            for (user_id, push_type), delta in deltas.items()
+            if delta
+        ]
+        if operations:
+            await self.collection.bulk_write(operations, ordered=False)
+    
+    async def get(self, user_id: str) -> dict:
+        """获取用户的计数文档，不存在时返回None"""
+        return await self.collection.find_one({"_id": user_id})
+    
+    async def recount(self, user_id: str) -> dict:
+        """
+        按推送历史重新统计用户的未读数并覆盖计数文档，返回 {push_type: 未读数}
+        
+        只在统计期间 seq 未变化时覆盖，否则期间的 $inc 可能未计入统计结果或被覆盖，重新统计；
+        多次重试仍有并发更新时返回统计结果，不写入计数文档。
+        """
+        history = get_async_mongodb().get_collection(settings.COLLECTION_PUSH_HISTORY)
+        for _ in range(self.RECOUNT_ATTEMPTS):
+            document = await self.get(user_id)
+            cursor = history.aggregate([
+                {"$match": {"user_id": user_id, "is_read": False}},
+                {"$group": {"_id": "$push_type", "count": {"$sum": 1}}}
+            ])
+            counts = {group["_id"]: group["count"] async for group in cursor}
+            fields = {"counts": counts, "initialized": True}
+            if document is None:
+                try:
+                    await self.collection.insert_one({"_id": user_id, **fields, "seq": 0})
+                    return counts
+                except DuplicateKeyError:
+                    continue
+            result = await self.collection.update_one({"_id": user_id, "seq": document.get("seq")}, {"$set": fields})
+            if result.matched_count:
+                return counts
+        logger.warning(f"用户{user_id}的未读计数持续变化，本次统计结果未保存")
+        return counts
+
+
+def _unread_deltas(records: list) -> Counter:
+    """统计记录中各 (user_id, push_type) 的未读条数"""
+    return Counter(
+        (record["user_id"], record["push_type"])
+        for record in records
+        if not record.get("is_read")
+    )
+
+
+class PushHistoryRepository:
+    """推送历史集合的异步读写，写入和标记已读时同步更新未读计数"""
+    
+    async def _update_unread(self, deltas: dict):
+        # 计数更新失败不影响推送历史本身，记录可通过 recount 修正
+        try:
+            await push_unread_repository.add(deltas)
+        except Exception as e:
+            logger.error(f"更新未读计数失败: {e}")
+    
+    @property
+    def collection(self):
+        return get_async_mongodb().get_collection(settings.COLLECTION_PUSH_HISTORY)
+    
+    async def insert(self, record: dict):
+        """写入一条推送记录，返回插入的文档ID"""
+        result = await self.collection.insert_one(record)
+        await self._update_unread(_unread_deltas([record]))
+        return result.inserted_id
+    
+    async def insert_many(self, records: list) -> int:
+        """无序批量写入推送记录，返回写入条数；部分失败时只为写入成功的记录计数后抛出BulkWriteError"""
+        try:
+            result = await self.collection.insert_many(records, ordered=False)
+        except BulkWriteError as e:
+            failed = {error["index"] for error in e.details.get("writeErrors", [])}
+            await self._update_unread(_unread_deltas(
+                [record for index, record in enumerate(records) if index not in failed]
+            ))
+            raise
+        await self._update_unread(_unread_deltas(records))
+        return len(result.inserted_ids)
+    
+    @staticmethod
+    def _history_query(user_id: str, push_type: str = None) -> dict:
+        query = {"user_id": user_id}
+        if push_type:
+            query["push_type"] = push_type
+        return query
+    
+    async def find_page(self, user_id: str, push_type: str = None, limit: int = 20, before: tuple = None) -> list:
+        """
+        按 (push_time, _id) 倒序获取一页推送记录
+        
+        Args:
+            before: 上一页最后一条记录的 (push_time, _id)，不指定则从最新一条开始
+        """
+        query = self._history_query(user_id, push_type)
+        if before:
+            query["$or"] = _keyset_before(before)
+        
+        cursor = self.collection.find(query).sort([("push_time", -1), ("_id", -1)]).limit(limit)
+        return await cursor.to_list(length=limit)
+    
+    async def find_since(self, user_id: str, push_type: str = None, limit: int = 20, after: tuple = None) -> list:
+        """按 (push_time, _id) 正序获取 after 之后新增的推送记录"""
+        query = self._history_query(user_id, push_type)
+        query["$or"] = _keyset_after(after)
+        
+        cursor = self.collection.find(query).sort([("push_time", 1), ("_id", 1)]).limit(limit)
+        return await cursor.to_list(length=limit)
+    
+    async def iter_records(self, query: dict, batch_size: int):
+        """通过单个分批游标按 (push_time, _id) 正序流式读取推送记录"""
+        cursor = self.collection.find(query).sort([("push_time", 1), ("_id", 1)]).batch_size(batch_size)
+        async for record in cursor:
+            yield record
+    
+    async def find_expired(self, cutoff: datetime, limit: int) -> list:
+        """按 (push_time, _id) 正序获取推送时间早于 cutoff 的记录，用于归档"""
+        cursor = self.collection.find({"push_time": {"$lt": cutoff}}).sort([("push_time", 1), ("_id", 1)]).limit(limit)
+        return await cursor.to_list(length=limit)
+    
+    async def remove_archived(self, records: list) -> int:
+        """
+        删除已写入归档的记录，返回删除条数
+        
+        归档记录不再计入未读数。未读记录按 (user_id, push_type) 分组删除，按各组实际删除的条数扣减计数：
+        上次写入归档后删除前中断时，重新执行仍会删除并扣减这些记录；读取后被标记为已读的记录已由标记已读扣减，
+        不再重复扣减。
+        """
+        deleted = (await self.collection.delete_many({
+            "_id": {"$in": [record["_id"] for record in records if record.get("is_read")]},
+            "is_read": True
+        })).deleted_count
+        groups = {}
+        for record in records:
+            if not record.get("is_read"):
+                groups.setdefault((record["user_id"], record["push_type"]), []).append(record["_id"])
+        # 删除时已被标记为已读的记录留到下一批，作为已读记录删除
+        results = await asyncio.gather(*(
+            self.collection.delete_many({"_id": {"$in": ids}, "is_read": False}) for ids in groups.values()
+        ))
+        await self._update_unread({key: -result.deleted_count for key, result in zip(groups, results)})
+        return deleted + sum(result.deleted_count for result in results)
+    
+    async def mark_read(self, user_id: str, push_id: str) -> bool:
+        """标记推送为已读，返回是否有记录被修改"""
+        record = await self.collection.find_one_and_update(
+            {"_id": ObjectId(push_id), "user_id": user_id, "is_read": False},
+            {"$set": {"is_read": True}},
+            projection={"push_type": 1}
+        )
+        if record is None:
+            return False
+        await self._update_unread({(user_id, record["push_type"]): -1})
+        return True
+    
+    async def mark_read_many(
+        self,
+        user_id: str,
+        push_ids: list = None,
+        push_type: str = None,
+        before: datetime = None
+    ) -> int:
+        """
+        批量标记已读，条件之间为“且”，都不指定时标记全部
+        
+        按推送类型分别 update_many，过滤条件只匹配未读记录，各类型修改的条数即需扣减的未读数。
+        
+        Args:
+            push_ids: 推送记录ID列表
+            push_type: 推送类型
+            before: 只标记推送时间早于该时间的记录
+        
+        Returns:
+            标记的条数
+        
+        Raises:
+            ValueError: 推送记录ID格式不正确
+        """
+        query = {"user_id": user_id, "is_read": False}
+        if push_ids is not None:
+            try:
+                query["_id"] = {"$in": [ObjectId(push_id) for push_id in push_ids]}
+            except InvalidId as e:
+                raise ValueError(str(e))
+        if push_type:
+            query["push_type"] = push_type
+        if before:
+            query["push_time"] = {"$lt": before}
+        
+        if push_type:
+            push_types = [push_type]
+        else:
+            push_types = await self.collection.distinct("push_type", query)
+        results = await asyncio.gather(*(
+            self.collection.update_many({**query, "push_type": each}, {"$set": {"is_read": True}})
+            for each in push_types
+        ))
+        await self._update_unread({
+            (user_id, each): -result.modified_count for each, result in zip(push_types, results)
+        })
+        return sum(result.modified_count for result in results)
+
+
+# 归档文档的紧凑字段名 -> 推送记录字段名
+ARCHIVE_FIELDS = {
+    "u": "user_id",
+    "t": "push_type",
+    "p": "push_time",
+    "r": "is_read",
+}
+
+
+def compact_archive_record(record: dict, archived_at: datetime) -> dict:
+    """
+    将推送记录转为归档文档
+
+    使用短字段名，不保留幂等键等只在推送时使用的字段；内容以zlib压缩，压缩后不更小时保留原文。
+    """
+    document = {short: record.get(field) for short, field in ARCHIVE_FIELDS.items()}
+    content = record.get("content") or ""
+    compressed = zlib.compress(content.encode("utf-8"), 9)
+    document["c"] = Binary(compressed) if len(compressed) < len(content.encode("utf-8")) else content
+    document["_id"] = record["_id"]
+    document["a"] = archived_at
+    return document
+
+
+def expand_archive_record(document: dict) -> dict:
+    """将归档文档还原为推送记录的结构，带 archived 标记"""
+    record = {"_id": document["_id"]}
+    record.update({field: document.get(short) for short, field in ARCHIVE_FIELDS.items()})
+    content = document.get("c")
+    record["content"] = zlib.decompress(content).decode("utf-8") if isinstance(content, bytes) else content
+    record["archived"] = True
+    return record
+
+
+class PushArchiveRepository:
+    """
+    推送历史归档集合
+
+    保存超出热数据窗口的推送记录，文档 _id 与原记录相同，重复归档同一条记录时插入失败即可忽略。
+    归档记录只读，不参与未读计数。
+    """
+    
+    @property
+    def collection(self):
+        return get_async_mongodb().get_collection(settings.COLLECTION_PUSH_ARCHIVE)
+    
+    async def insert_many(self, records: list) -> set:
+        """写入归档，返回本次新写入的记录ID；已归档的记录忽略"""
+        now = datetime.now()
+        ids = [record["_id"] for record in records]
+        try:
+            await self.collection.insert_many(
+                [compact_archive_record(record, now) for record in records],
+                ordered=False
+            )
+        except BulkWriteError as e:
+            errors = e.details.get("writeErrors", [])
+            if any(error.get("code") != 11000 for error in errors):
+                raise
+            duplicated = {error["index"] for error in errors}
+            return {record_id for index, record_id in enumerate(ids) if index not in duplicated}
+        return set(ids)
+    
+    async def iter_records(self, query: dict, batch_size: int):
+        """
+        按 (push_time, _id) 正序流式读取归档记录，还原为推送记录的结构
+        
+        Args:
+            query: 以推送记录字段名表示的条件，如 user_id、push_time
+        """
+        short_names = {field: short for short, field in ARCHIVE_FIELDS.items()}
+        archive_query = {short_names.get(field, field): condition for field, condition in query.items()}
+        cursor = self.collection.find(archive_query, {"a": 0}).sort([("p", 1), ("_id", 1)]).batch_size(batch_size)
+        async for document in cursor:
+            yield expand_archive_record(document)
+    
+    @staticmethod
+    def _archive_query(user_id: str, push_type: str = None) -> dict:
+        query = {"u": user_id}
+        if push_type:
+            query["t"] = push_type
+        return query
+    
+    @staticmethod
+    def _compact_keyset(conditions: list) -> list:
+        return [
+            {("p" if field == "push_time" else field): value for field, value in condition.items()}
+            for condition in conditions
+        ]
+    
+    async def find_page(self, user_id: str, push_type: str = None, limit: int = 20, before: tuple = None) -> list:
+        """按 (push_time, _id) 倒序获取一页归档记录，参数同 PushHistoryRepository.find_page"""
+        query = self._archive_query(user_id, push_type)
+        if before:
+            query["$or"] = self._compact_keyset(_keyset_before(before))
+        cursor = self.collection.find(query, {"a": 0}).sort([("p", -1), ("_id", -1)]).limit(limit)
+        return [expand_archive_record(document) async for document in cursor]
+    
+    async def find_since(self, user_id: str, push_type: str = None, limit: int = 20, after: tuple = None) -> list:
+        """按 (push_time, _id) 正序获取 after 之后的归档记录"""
+        query = self._archive_query(user_id, push_type)
+        query["$or"] = self._compact_keyset(_keyset_after(after))
+        cursor = self.collection.find(query, {"a": 0}).sort([("p", 1), ("_id", 1)]).limit(limit)
+        return [expand_archive_record(document) async for document in cursor]
+
+
+class PushStagingRepository:
+    """预生成推送暂存集合的异步读写"""
+    
+    @property
+    def collection(self):
+        return get_async_mongodb().get_collection(settings.COLLECTION_PUSH_STAGING)
+    
+    async def stage(self, user_id: str, push_type: str, slot: str, content: str):
+        """按 (user_id, push_type, slot) 暂存推送内容，重复生成时覆盖"""
+        await self.collection.update_one(
+            {"user_id": user_id, "push_type": push_type, "slot": slot},
+            {"$set": {"content": content, "created_at": datetime.now()}},
+            upsert=True
+        )
+    
+    async def iter_batches(self, push_type: str, slot: str, batch_size: int):
+        """分批读取指定时段的暂存内容"""
+        cursor = self.collection.find(
+            {"push_type": push_type, "slot": slot},
+            {"user_id": 1, "content": 1}
+        ).batch_size(batch_size)
+        
+        batch = []
+        async for staged in cursor:
+            batch.append(staged)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+    
+    async def delete_many(self, ids: list):
+        """删除已投递的暂存内容"""
+        await self.collection.delete_many({"_id": {"$in": ids}})
+
+
+class PushClaimRepository:
+    """
+    推送幂等键占用记录
+
+    每个定时推送在调用大模型前先占用 (user_id, push_type, slot) 对应的幂等键，
+    键即文档 _id，重复运行时插入失败即可跳过。
+    """
+    
+    @property
+    def collection(self):
+        return get_async_mongodb().get_collection(settings.COLLECTION_PUSH_CLAIMS)
+    
+    async def claim(self, key: str, user_id: str, push_type: str, slot: str, stale_after: float) -> bool:
+        """
+        占用幂等键，返回是否占用成功
+        
+        已完成的键不可再占用；处于占用中但超过 stale_after 秒未完成（如进程崩溃）的键可被接管。
+        """
+        now = datetime.now()
+        try:
+            await self.collection.insert_one({
+                "_id": key,
+                "user_id": user_id,
+                "push_type": push_type,
+                "slot": slot,
+                "status": "claimed",
+                "claimed_at": now
+            })
+            return True
+        except DuplicateKeyError:
+            result = await self.collection.update_one(
+                {"_id": key, "status": "claimed", "claimed_at": {"$lt": now - timedelta(seconds=stale_after)}},
+                {"$set": {"claimed_at": now}}
+            )
+            return result.modified_count > 0
+    
+    async def complete(self, key: str):
+        """标记幂等键对应的推送已完成"""
+        await self.collection.update_one({"_id": key}, {"$set": {"status": "done"}})
+    
+    async def complete_keys(self, keys: list):
+        """批量将已占用的幂等键标记为完成，推送历史批量写入成功后调用"""
+        if keys:
+            await self.collection.update_many({"_id": {"$in": keys}}, {"$set": {"status": "done"}})
+    
+    async def complete_many(self, claims: list):
+        """批量记录已完成的推送（如投递预生成内容时），已存在的键保持不变"""
+        now = datetime.now()
+        try:
+            await self.collection.insert_many(
+                [{**claim, "status": "done", "claimed_at": now} for claim in claims],
+                ordered=False
+            )
+        except BulkWriteError:
+            # 重复键说明已被占用，忽略即可
+            pass
+    
+    async def release(self, key: str):
+        """释放幂等键，生成失败时调用，以便后续重试"""
+        await self.collection.delete_one({"_id": key, "status": "claimed"})
+    
+    async def is_done(self, key: str) -> bool:
+        """幂等键对应的推送是否已完成"""
+        return await self.collection.count_documents({"_id": key, "status": "done"}, limit=1) > 0
+
+
+class PushJobRepository:
+    """
+    持久化推送任务队列
+    
+    每个任务对应一个用户在一个时段的一次推送，状态为 pending / leased / done / failed。
+    消费者领取任务时设置可见性超时，超时未完成（如进程崩溃）的任务可被重新领取。
+    """
+    
+    @property
+    def collection(self):
+        return get_async_mongodb().get_collection(settings.COLLECTION_PUSH_JOBS)
+    
+    async def enqueue_many(self, jobs: list) -> int:
+        """批量入队，已存在的任务（相同 _id）忽略，返回新入队条数"""
+        now = datetime.now()
+        documents = [
+            {
+                **job,
+                "status": "pending",
+                "attempts": 0,
+                "owner": None,
+                "lease_until": None,
+                "available_at": now,
+                "created_at": now,
+                "updated_at": now
+            }
+            for job in jobs
+        ]
+        try:
+            result = await self.collection.insert_many(documents, ordered=False)
+            return len(result.inserted_ids)
+        except BulkWriteError as e:
+            # 重复键说明任务已入队（如重复运行或重启后补跑），其余错误继续抛出
+            if any(error.get("code") != 11000 for error in e.details.get("writeErrors", [])):
+                raise
+            return e.details.get("nInserted", 0)
+    
+    async def lease(self, owner: str, visibility_timeout: float):
+        """领取一个可执行的任务：到期的待执行任务，或可见性超时的已领取任务"""
+        now = datetime.now()
+        return await self.collection.find_one_and_update(
+            {
+                "$or": [
+                    {"status": "pending", "available_at": {"$lte": now}},
+                    {"status": "leased", "lease_until": {"$lt": now}}
+                ]
+            },
+            {
+                "$set": {
+                    "status": "leased",
+                    "owner": owner,
+                    "lease_until": now + timedelta(seconds=visibility_timeout),
+                    "updated_at": now
+                },
+                "$inc": {"attempts": 1}
+            },
+            return_document=ReturnDocument.AFTER
+        )
+    
+    async def finish(self, job_id: str, owner: str, status: str, error: str = None):
+        """将任务标记为 done 或 failed"""
+        await self.collection.update_one(
+            {"_id": job_id, "owner": owner},
+            {"$set": {"status": status, "last_error": error, "lease_until": None, "updated_at": datetime.now()}}
+        )
+    
+    async def retry(self, job_id: str, owner: str, delay: float, error: str = None, count_attempt: bool = True):
+        """将任务放回队列，delay 秒后可再次领取"""
+        now = datetime.now()
+        update = {
+            "$set": {
+                "status": "pending",
+                "owner": None,
+                "lease_until": None,
+                "available_at": now + timedelta(seconds=delay),
+                "last_error": error,
+                "updated_at": now
+            }
+        }
+        if not count_attempt:
+            update["$inc"] = {"attempts": -1}
+        await self.collection.update_one({"_id": job_id, "owner": owner}, update)
+    
+    async def count_by_status(self) -> dict:
+        """各状态的任务数"""
+        cursor = self.collection.aggregate([{"$group": {"_id": "$status", "count": {"$sum": 1}}}])
+        return {group["_id"]: group["count"] async for group in cursor}
+
+
+# 全局推送数据访问实例
+push_unread_repository = PushUnreadRepository()
+push_history_repository = PushHistoryRepository()
+push_archive_repository = PushArchiveRepository()
+push_staging_repository = PushStagingRepository()
+push_claim_repository = PushClaimRepository()
+push_job_repository = PushJobRepository()
@@ -0,0 +1,181 @@
+"""多调度实例的推送分片协调"""
+import asyncio
+import logging
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, List, Optional, Tuple
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError
+from backend.core.mongodb import get_async_mongodb
+from backend.repositories.profile_repository import SHARD_HASH_SPACE
+from backend.config.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class ShardCoordinator:
+    """
+    基于MongoDB租约的推送分片
+
+    每次推送（推送类型 + 时段）按 user_id 哈希划分为 buckets 个区间，每个区间在租约集合中对应一个文档。
+    各实例循环抢占未完成的区间，处理期间定期续期；持有实例失联导致租约过期后，区间由其他实例接管。
+    接管时已推送的用户由推送幂等键跳过，不会重复推送。
+    """
+
+    def __init__(self):
+        self.node_id = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self.buckets = settings.SHARDING_BUCKETS
+        self.lease_seconds = settings.SHARDING_LEASE_SECONDS
+        self.heartbeat_interval = settings.SHARDING_HEARTBEAT_INTERVAL
+        self._heartbeat_task: Optional[asyncio.Task] = None
+
+    @property
+    def _leases(self):
+        return get_async_mongodb().get_collection(settings.COLLECTION_SCHEDULER_LEASES)
+
+    @property
+    def _nodes(self):
+        return get_async_mongodb().get_collection(settings.COLLECTION_SCHEDULER_NODES)
+
+    def bucket_range(self, bucket: int) -> Tuple[int, int]:
+        """区间对应的哈希范围 [lo, hi)"""
+        return (
+            bucket * SHARD_HASH_SPACE // self.buckets,
+            (bucket + 1) * SHARD_HASH_SPACE // self.buckets,
+        )
+
+    async def register(self):
+        """注册当前实例并启动心跳"""
+        now = datetime.now()
+        await self._nodes.update_one(
+            {"_id": self.node_id},
+            {"$set": {"hostname": socket.gethostname(), "pid": os.getpid(), "started_at": now, "heartbeat": now}},
+            upsert=True
+        )
+        if self._heartbeat_task is None or self._heartbeat_task.done():
+            self._heartbeat_task = asyncio.ensure_future(self._heartbeat_loop())
+        logger.info(f"调度实例已注册: {self.node_id}")
+
+    async def _heartbeat_loop(self):
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            try:
+                await self._nodes.update_one({"_id": self.node_id}, {"$set": {"heartbeat": datetime.now()}})
+            except Exception as e:
+                logger.warning(f"调度实例心跳失败: {e}")
+
+    async def unregister(self):
+        """停止心跳并注销当前实例，其持有的区间租约到期后由其他实例接管"""
+        if self._heartbeat_task is not None:
+            self._heartbeat_task.cancel()
+            self._heartbeat_task = None
+        try:
+            await self._nodes.delete_one({"_id": self.node_id})
+        except Exception as e:
+            logger.warning(f"注销调度实例失败: {e}")
+
+    async def _prepare_run(self, run_id: str):
+        """创建本次运行的全部区间文档，其他实例已创建的忽略"""
+        now = datetime.now()
+        try:
+            await self._leases.insert_many(
+                [
+                    {
+                        "_id": f"{run_id}#{bucket}",
+                        "run_id": run_id,
+                        "bucket": bucket,
+                        "status": "pending",
+                        "owner": None,
+                        "lease_until": None,
+                        "attempts": 0,
+                        "created_at": now
+                    }
+                    for bucket in range(self.buckets)
+                ],
+                ordered=False
+            )
+        except BulkWriteError:
+            pass
+
+    async def _claim_bucket(self, run_id: str) -> Optional[dict]:
+        """抢占一个无人持有或租约已过期的未完成区间"""
+        now = datetime.now()
+        return await self._leases.find_one_and_update(
+            {
+                "run_id": run_id,
+                "status": {"$ne": "done"},
+                "$or": [{"owner": None}, {"lease_until": {"$lt": now}}]
+            },
+            {
+                "$set": {
+                    "owner": self.node_id,
+                    "status": "running",
+                    "lease_until": now + timedelta(seconds=self.lease_seconds)
+                },
+                "$inc": {"attempts": 1}
+            },
+            sort=[("bucket", 1)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def _keep_alive(self, lease_id: str):
+        """处理区间期间定期续期租约"""
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            try:
+                result = await self._leases.update_one(
+                    {"_id": lease_id, "owner": self.node_id},
+                    {"$set": {"lease_until": datetime.now() + timedelta(seconds=self.lease_seconds)}}
+                )
+                if result.matched_count == 0:
+                    logger.warning(f"区间租约已被其他实例接管: {lease_id}")
+                    return
+            except Exception as e:
+                logger.warning(f"续期区间租约失败: {lease_id} {e}")
+
+    async def _finish_bucket(self, lease_id: str, done: bool):
+        """完成区间，或在处理失败时释放租约供其他实例重试"""
+        update = {"status": "done", "finished_at": datetime.now()} if done else {"status": "pending", "owner": None}
+        await self._leases.update_one({"_id": lease_id, "owner": self.node_id}, {"$set": update})
+
+    async def run(self, run_id: str, handler: Callable[[Tuple[int, int]], Awaitable[dict]]) -> List[dict]:
+        """
+        与其他实例协作完成一次推送
+
+        Args:
+            run_id: 运行标识，所有实例对同一次推送须一致，如 push:rest:2025-01-01T07:00
+            handler: 处理一个哈希区间 (lo, hi) 的协程函数
+
+        Returns:
+            当前实例处理的各区间结果
+        """
+        await self._prepare_run(run_id)
+        results = []
+        while True:
+            lease = await self._claim_bucket(run_id)
+            if lease is None:
+                remaining = await self._leases.count_documents({"run_id": run_id, "status": {"$ne": "done"}})
+                if remaining == 0:
+                    break
+                # 剩余区间由其他实例处理中，等待其完成或租约过期后接管
+                await asyncio.sleep(self.heartbeat_interval)
+                continue
+
+            keep_alive = asyncio.ensure_future(self._keep_alive(lease["_id"]))
+            try:
+                results.append(await handler(self.bucket_range(lease["bucket"])))
+            except Exception:
+                await self._finish_bucket(lease["_id"], done=False)
+                raise
+            finally:
+                keep_alive.cancel()
+            await self._finish_bucket(lease["_id"], done=True)
+
+        logger.info(f"分片运行完成：{run_id}，本实例处理{len(results)}个区间")
+        return results
+
+
+# 全局分片协调实例
+shard_coordinator = ShardCoordinator()
@@ -0,0 +1,69 @@
+"""分钟粒度的推送分发"""
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+
+class TimingWheelDispatcher:
+    """
+    分钟粒度的时间轮
+
+    一天的 1440 分钟即时间轮的各个槽位，每个槽位中的用户由档案 push_schedule.minute 索引给出，
+    分发器不在内存中保存用户。每到一个新的分钟调用一次处理函数，处理函数在后台执行，耗时较长不会推迟下一分钟；
+    事件循环阻塞或进程重启错过的分钟会按顺序补上。
+    """
+
+    def __init__(self, timezone):
+        self.timezone = timezone
+        self._handler: Optional[Callable[[datetime], Awaitable[dict]]] = None
+        self._next_tick: Optional[datetime] = None
+        self._loop_task: Optional[asyncio.Task] = None
+        self._running: Set[asyncio.Task] = set()
+        self.last_tick: Optional[dict] = None
+
+    def _now(self) -> datetime:
+        """调度时区的当前时间，去掉时区信息"""
+        return datetime.now(self.timezone).replace(tzinfo=None)
+
+    def start(self, handler: Callable[[datetime], Awaitable[dict]], catchup_minutes: int = 0):
+        """
+        启动分发，需在事件循环中调用
+
+        Args:
+            handler: 处理一分钟到期推送的协程函数，参数为该分钟的时间
+            catchup_minutes: 启动时补上之前多少分钟，已推送的用户由幂等键跳过
+        """
+        if self._loop_task is not None:
+            return
+        self._handler = handler
+        self._next_tick = self._now().replace(second=0, microsecond=0) - timedelta(minutes=catchup_minutes)
+        self._loop_task = asyncio.ensure_future(self._loop())
+        logger.info(f"推送分发已启动，从{self._next_tick:%H:%M}开始")
+
+    async def _run_tick(self, tick: datetime):
+        try:
+            self.last_tick = {"minute": f"{tick:%Y-%m-%dT%H:%M}", **(await self._handler(tick))}
+        except Exception as e:
+            logger.error(f"{tick:%H:%M} 推送分发失败: {e}")
+
+    async def _loop(self):
+        while True:
+            now = self._now()
+            while self._next_tick <= now:
+                task = asyncio.ensure_future(self._run_tick(self._next_tick))
+                self._running.add(task)
+                task.add_done_callback(self._running.discard)
+                self._next_tick += timedelta(minutes=1)
+            await asyncio.sleep(max((self._next_tick - self._now()).total_seconds(), 0) + 0.05)
+
+    async def close(self):
+        """停止分发，取消执行中的分钟"""
+        tasks = [task for task in (self._loop_task, *self._running) if task is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._loop_task = None
+        self._running.clear()
@@ -0,0 +1,148 @@
+"""定时推送并发扇出引擎"""
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class RunSummary:
+    """一次扇出运行的汇总结果"""
+    task_type: str
+    total: int = 0
+    success: int = 0
+    failed: int = 0
+    timeout: int = 0
+    skipped: int = 0
+    elapsed: float = 0.0
+    failed_users: List[str] = field(default_factory=list)
+
+    def to_dict(self) -> dict:
+        return {
+            "task_type": self.task_type,
+            "total": self.total,
+            "success": self.success,
+            "failed": self.failed,
+            "timeout": self.timeout,
+            "skipped": self.skipped,
+            "elapsed": round(self.elapsed, 3),
+            "failed_users": self.failed_users,
+        }
+
+
+class FanoutEngine:
+    """
+    按用户扇出执行推送任务
+
+    并发受两级信号量约束：每种任务类型各自的上限，以及所有任务共享的全局上限。
+    同步处理函数在线程池中执行，协程处理函数直接在事件循环中等待。
+    """
+
+    def __init__(self, global_concurrency: int, task_concurrency: Dict[str, int], user_timeout: float):
+        self.global_concurrency = global_concurrency
+        self.task_concurrency = task_concurrency
+        self.user_timeout = user_timeout
+        self._executor = ThreadPoolExecutor(
+            max_workers=global_concurrency,
+            thread_name_prefix="push-fanout"
+        )
+        # 信号量需在事件循环内创建，首次运行时初始化
+        self._global_semaphore: Optional[asyncio.Semaphore] = None
+        self._task_semaphores: Dict[str, asyncio.Semaphore] = {}
+
+    def _get_semaphores(self, task_type: str):
+        if self._global_semaphore is None:
+            self._global_semaphore = asyncio.Semaphore(self.global_concurrency)
+        if task_type not in self._task_semaphores:
+            limit = self.task_concurrency.get(task_type, self.global_concurrency)
+            self._task_semaphores[task_type] = asyncio.Semaphore(limit)
+        return self._global_semaphore, self._task_semaphores[task_type]
+
+    async def _call(self, handler: Callable, item: Any):
+        if asyncio.iscoroutinefunction(handler):
+            return await handler(item)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, handler, item)
+
+    async def run(
+        self,
+        task_type: str,
+        items,
+        handler: Callable[[Any], Any],
+        key: Callable[[Any], str] = str
+    ) -> RunSummary:
+        """
+        并发执行一次推送任务
+
+        Args:
+            task_type: 任务类型 rest/meal/weather/health_tip，用于选择并发上限
+            items: 待处理对象（同步或异步可迭代），按需逐个拉取，不会整体载入内存
+            handler: 处理单个对象的函数，返回带 status 字段的结果字典
+            key: 从对象中提取用户标识，用于日志和失败记录
+
+        Returns:
+            本次运行的汇总结果
+        """
+        summary = RunSummary(task_type=task_type)
+        global_semaphore, task_semaphore = self._get_semaphores(task_type)
+        pending = set()
+        started = time.monotonic()
+
+        async def process(item):
+            user_id = key(item)
+            try:
+                result = await asyncio.wait_for(self._call(handler, item), timeout=self.user_timeout)
+                status = (result or {}).get("status")
+                if status == "success":
+                    summary.success += 1
+                elif status == "skipped":
+                    summary.skipped += 1
+                else:
+                    summary.failed += 1
+                    summary.failed_users.append(user_id)
+                logger.debug(f"用户{user_id} {task_type} 推送结果: {status}")
+            except asyncio.TimeoutError:
+                summary.timeout += 1
+                summary.failed_users.append(user_id)
+                logger.warning(f"用户{user_id} {task_type} 推送超时（{self.user_timeout}秒）")
+            except Exception as e:
+                summary.failed += 1
+                summary.failed_users.append(user_id)
+                logger.error(f"用户{user_id} {task_type} 推送失败: {e}")
+            finally:
+                global_semaphore.release()
+                task_semaphore.release()
+
+        async def submit(item):
+            # 先占用任务类型配额再占用全局配额，避免单个任务占满全局并发
+            await task_semaphore.acquire()
+            await global_semaphore.acquire()
+            summary.total += 1
+            task = asyncio.ensure_future(process(item))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+
+        if hasattr(items, "__aiter__"):
+            async for item in items:
+                await submit(item)
+        else:
+            for item in items:
+                await submit(item)
+
+        if pending:
+            await asyncio.gather(*pending)
+
+        summary.elapsed = time.monotonic() - started
+        logger.info(
+            f"{task_type} 推送完成：共{summary.total}，成功{summary.success}，失败{summary.failed}，"
+            f"超时{summary.timeout}，跳过{summary.skipped}，耗时{summary.elapsed:.1f}秒"
+        )
+        return summary
+
+    def shutdown(self):
+        """关闭线程池"""
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,132 @@
+"""持久化推送任务队列的入队与消费"""
+import asyncio
+import logging
+import os
+import socket
+from typing import List, Optional
+from backend.config.config import settings
+from backend.repositories.push_repository import push_job_repository, push_claim_repository
+from backend.services.push_service import push_service, make_idempotency_key
+
+logger = logging.getLogger(__name__)
+
+
+class PushJobQueue:
+    """
+    基于MongoDB的推送任务队列
+
+    定时推送将每个用户的推送作为一个任务写入队列，由多个消费者领取执行。
+    任务以幂等键为 _id，重复入队会被忽略；进程崩溃时已领取的任务在可见性超时后被重新领取，
+    未开始的任务保持待执行，重启后从中断处继续。
+    """
+
+    def __init__(self):
+        self.consumers = settings.QUEUE_CONSUMERS
+        self.visibility_timeout = settings.QUEUE_VISIBILITY_TIMEOUT
+        self.max_attempts = settings.QUEUE_MAX_ATTEMPTS
+        self.retry_delay = settings.QUEUE_RETRY_DELAY
+        self.poll_interval = settings.QUEUE_POLL_INTERVAL
+        self.batch_size = settings.QUEUE_ENQUEUE_BATCH_SIZE
+        self._owner_prefix = f"{socket.gethostname()}-{os.getpid()}"
+        self._workers: List[asyncio.Task] = []
+
+    async def enqueue(self, push_type: str, slot: str, items) -> int:
+        """
+        将 (用户档案, 推送参数) 序列按批写入队列
+
+        Returns:
+            新入队的任务数
+        """
+        enqueued = 0
+        batch = []
+        async for profile, params in items:
+            batch.append({
+                "_id": make_idempotency_key(profile["user_id"], push_type, slot),
+                "user_id": profile["user_id"],
+                "push_type": push_type,
+                "slot": slot,
+                "params": params
+            })
+            if len(batch) >= self.batch_size:
+                enqueued += await push_job_repository.enqueue_many(batch)
+                batch = []
+        if batch:
+            enqueued += await push_job_repository.enqueue_many(batch)
+        logger.info(f"推送任务入队：{push_type} {slot} 新增{enqueued}个")
+        return enqueued
+
+    async def _execute(self, job: dict, owner: str):
+        """执行一个任务，并按结果更新任务状态"""
+        if job["attempts"] > self.max_attempts:
+            await push_job_repository.finish(job["_id"], owner, "failed", "超过最大执行次数")
+            return
+
+        try:
+            result = await asyncio.wait_for(
+                # 直接写入推送历史：写入成功后才将幂等键和任务标记为完成，进程崩溃时任务可被重新领取
+                push_service.push(
+                    job["push_type"], job["user_id"], buffered=False, slot=job["slot"], **job["params"]
+                ),
+                timeout=settings.SCHEDULER_USER_TIMEOUT
+            )
+        except asyncio.TimeoutError:
+            result = {"status": "error", "message": "推送超时"}
+        except Exception as e:
+            result = {"status": "error", "message": str(e)}
+
+        if result["status"] == "success":
+            await push_job_repository.finish(job["_id"], owner, "done")
+        elif result["status"] == "skipped":
+            if await push_claim_repository.is_done(job["_id"]):
+                await push_job_repository.finish(job["_id"], owner, "done")
+            else:
+                # 幂等键被占用但尚未完成（占用方可能已崩溃），等待占用失效后再执行，不计入执行次数
+                await push_job_repository.retry(
+                    job["_id"], owner, settings.IDEMPOTENCY_CLAIM_TIMEOUT, result.get("message"), count_attempt=False
+                )
+        elif job["attempts"] >= self.max_attempts:
+            logger.warning(f"推送任务失败：{job['_id']} {result.get('message')}")
+            await push_job_repository.finish(job["_id"], owner, "failed", result.get("message"))
+        else:
+            await push_job_repository.retry(job["_id"], owner, self.retry_delay, result.get("message"))
+
+    async def _consume(self, index: int):
+        owner = f"{self._owner_prefix}-{index}"
+        while True:
+            job: Optional[dict] = None
+            try:
+                job = await push_job_repository.lease(owner, self.visibility_timeout)
+                if job is None:
+                    await asyncio.sleep(self.poll_interval)
+                    continue
+                await self._execute(job, owner)
+            except asyncio.CancelledError:
+                # 关闭时将执行中的任务放回队列，重启后立即可被领取
+                if job is not None:
+                    await push_job_repository.retry(job["_id"], owner, 0, count_attempt=False)
+                raise
+            except Exception as e:
+                logger.error(f"推送任务消费失败: {e}")
+                await asyncio.sleep(self.poll_interval)
+
+    def start(self):
+        """启动消费者，需在事件循环中调用"""
+        if self._workers:
+            return
+        self._workers = [asyncio.ensure_future(self._consume(index)) for index in range(self.consumers)]
+        logger.info(f"推送任务队列已启动{self.consumers}个消费者")
+
+    async def close(self):
+        """停止所有消费者"""
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    async def stats(self) -> dict:
+        """队列中各状态的任务数"""
+        return await push_job_repository.count_by_status()
+
+
+# 全局推送任务队列实例
+push_job_queue = PushJobQueue()
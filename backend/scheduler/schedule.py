@@ -0,0 +1,154 @@
+"""用户推送时间表
+
+每个定时推送时段有一个 slot_id（如 rest_morning、meal_lunch、weather），用户可在档案的 push_times 中
+为任意时段设置自己的时间，未设置的时段使用配置中的时间。分散投递时再按 user_id 哈希在该时段的抖动窗口内
+取一个固定偏移，使同一时段的用户均匀分布到窗口内的各分钟。
+
+计算结果保存在档案的 push_schedule 中：[{slot: slot_id, minute: 一天中的第几分钟}]，
+分发器每分钟按 push_schedule.minute 索引查询到期的用户。时段时间或抖动配置变化后 SCHEDULE_SIGNATURE 随之变化，
+启动时为签名不一致的档案重新计算。
+"""
+import hashlib
+import json
+import re
+import zlib
+from backend.config.config import settings
+
+MINUTES_PER_DAY = 24 * 60
+
+_TIME_PATTERN = re.compile(r"^([01]\d|2[0-3]):([0-5]\d)$")
+
+
+def slot_specs() -> list:
+    """所有定时推送时段：时段ID、推送类型、时间、任务参数"""
+    specs = []
+
+    # 作息提醒任务
+    time_type_map = {"07:00": "morning", "13:00": "noon", "23:00": "night"}
+    for time_str in settings.REST_TIMES:
+        specs.append({
+            "slot_id": f"rest_{time_type_map.get(time_str, time_str.replace(':', ''))}",
+            "job_id": f"rest_reminder_{time_str}",
+            "name": f"作息提醒-{time_str}",
+            "time": time_str,
+            "push_type": "rest",
+            "params": {"time_type": time_type_map.get(time_str, "morning")}
+        })
+
+    # 饮食提醒任务
+    meal_time_map = {
+        "07:30": "breakfast",
+        "12:00": "lunch",
+        "18:00": "dinner"
+    }
+    for time_str in settings.MEAL_TIMES:
+        specs.append({
+            "slot_id": f"meal_{meal_time_map.get(time_str, time_str.replace(':', ''))}",
+            "job_id": f"meal_reminder_{time_str}",
+            "name": f"饮食提醒-{time_str}",
+            "time": time_str,
+            "push_type": "meal",
+            "params": {"meal_type": meal_time_map.get(time_str, "lunch")}
+        })
+
+    # 天气提醒任务
+    specs.append({
+        "slot_id": "weather",
+        "job_id": "weather_reminder",
+        "name": "天气提醒",
+        "time": settings.WEATHER_TIME,
+        "push_type": "weather",
+        "params": {}
+    })
+
+    # 养生妙招任务
+    specs.append({
+        "slot_id": "health_tip",
+        "job_id": "health_tip",
+        "name": "养生妙招",
+        "time": settings.HEALTH_TIP_TIME,
+        "push_type": "health_tip",
+        "params": {}
+    })
+    return specs
+
+
+# 时段ID -> 时段
+SLOTS = {spec["slot_id"]: spec for spec in slot_specs()}
+
+
+def parse_minute(time_str: str) -> int:
+    """
+    将 HH:MM 转为一天中的第几分钟
+
+    Raises:
+        ValueError: 时间格式不正确
+    """
+    match = _TIME_PATTERN.match(time_str or "")
+    if not match:
+        raise ValueError(f"时间格式应为HH:MM: {time_str}")
+    return int(match.group(1)) * 60 + int(match.group(2))
+
+
+def format_minute(minute: int) -> str:
+    return f"{minute // 60:02d}:{minute % 60:02d}"
+
+
+def jitter_window(slot_id: str) -> int:
+    """时段的抖动窗口（分钟），可按时段ID或推送类型配置"""
+    jitter = settings.DISPATCH_JITTER
+    return max(int(jitter.get(slot_id, jitter.get(SLOTS[slot_id]["push_type"], 0))), 0)
+
+
+def jitter_offset(user_id: str, slot_id: str) -> int:
+    """用户在时段抖动窗口内的固定偏移，按 user_id 哈希均匀分布"""
+    window = jitter_window(slot_id)
+    if window <= 1:
+        return 0
+    return zlib.crc32(f"{user_id}:{slot_id}".encode("utf-8")) % window
+
+
+def validate_push_times(push_times: dict) -> dict:
+    """
+    校验用户设置的推送时间，值为None表示恢复默认时间
+
+    Raises:
+        ValueError: 时段ID不存在或时间格式不正确
+    """
+    for slot_id, time_str in push_times.items():
+        if slot_id not in SLOTS:
+            raise ValueError(f"未知的推送时段: {slot_id}，可选: {', '.join(SLOTS)}")
+        if time_str is not None:
+            parse_minute(time_str)
+    return push_times
+
+
+def build_schedule(user_id: str, push_times: dict = None) -> list:
+    """计算用户各时段实际推送的分钟：用户设置的时间或默认时间，加上抖动偏移"""
+    push_times = push_times or {}
+    schedule = []
+    for slot_id, spec in SLOTS.items():
+        time_str = push_times.get(slot_id) or spec["time"]
+        try:
+            minute = parse_minute(time_str)
+        except ValueError:
+            minute = parse_minute(spec["time"])
+        schedule.append({"slot": slot_id, "minute": (minute + jitter_offset(user_id, slot_id)) % MINUTES_PER_DAY})
+    return schedule
+
+
+def _signature() -> str:
+    config = {slot_id: (spec["time"], jitter_window(slot_id)) for slot_id, spec in SLOTS.items()}
+    return hashlib.sha256(json.dumps(config, sort_keys=True).encode()).hexdigest()[:16]
+
+
+# 当前时段及抖动配置的签名，档案中的签名不一致时需重新计算 push_schedule
+SCHEDULE_SIGNATURE = _signature()
+
+
+def schedule_fields(user_id: str, push_times: dict = None) -> dict:
+    """档案中与推送时间表相关的字段"""
+    return {
+        "push_schedule": build_schedule(user_id, push_times),
+        "schedule_signature": SCHEDULE_SIGNATURE,
+    }
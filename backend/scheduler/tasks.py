@@ -1,10 +1,23 @@
 """定时任务"""
+import asyncio
 import logging
+import time
+from datetime import datetime, timedelta
+from functools import partial
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
 from backend.config.config import settings
 from backend.services.push_service import push_service
-from backend.core.mongodb import get_mongodb
+from backend.services.llm_service import PROMPT_PROFILE_FIELDS
+from backend.services.history_writer import push_history_writer
+from backend.services.retention import push_retention
+from backend.repositories.profile_repository import profile_repository
+from backend.scheduler.fanout import FanoutEngine
+from backend.scheduler.coordinator import shard_coordinator
+from backend.scheduler.dispatcher import TimingWheelDispatcher
+from backend.scheduler.schedule import SCHEDULE_SIGNATURE, SLOTS, jitter_offset, schedule_fields, slot_specs
+from backend.scheduler.job_queue import push_job_queue
+from backend.utils.weather_crawler import weather_crawler
 
 logger = logging.getLogger(__name__)
 
@@ -14,136 +27,442 @@ class HealthScheduler:
     
     def __init__(self):
         self.scheduler = AsyncIOScheduler(timezone=settings.SCHEDULER_TIMEZONE)
-        self.db = get_mongodb()
+        self.fanout = FanoutEngine(
+            global_concurrency=settings.SCHEDULER_GLOBAL_CONCURRENCY,
+            task_concurrency=settings.SCHEDULER_TASK_CONCURRENCY,
+            user_timeout=settings.SCHEDULER_USER_TIMEOUT
+        )
+        self.dispatcher = TimingWheelDispatcher(self.scheduler.timezone)
+        # 分散投递时天气推送的用户分布在多个分钟，同一时段内已爬取的城市天气 {时段: {城市: 天气}}
+        self._dispatch_weather = {}
+    
+    def _profile_projection(self, push_type: str) -> dict:
+        """只读取推送流程和提示词实际用到的档案字段"""
+        projection = {"_id": 0, "user_id": 1, "persona_style": 1}
+        if push_type == "weather":
+            projection["location"] = 1
+        projection.update({field: 1 for field in PROMPT_PROFILE_FIELDS[push_type]})
+        return projection
+    
+    @staticmethod
+    def _shard_query(shard_range: tuple = None) -> dict:
+        """哈希区间 [lo, hi) 对应的档案过滤条件"""
+        if shard_range is None:
+            return {}
+        lo, hi = shard_range
+        return {"shard_hash": {"$gte": lo, "$lt": hi}}
     
-    def _get_all_users(self) -> list:
-        """获取所有用户ID"""
+    async def _iter_profiles(self, push_type: str, exclude: set = None, shard_range: tuple = None):
+        """通过单个分批游标流式读取用户档案，内存占用不随用户数增长"""
+        exclude = exclude or set()
+        query = self._shard_query(shard_range)
+        if push_type == "weather":
+            query["location"] = {"$ne": None}
         try:
-            collection = self.db.get_collection(settings.COLLECTION_HEALTH_PROFILE)
-            users = collection.find({}, {"user_id": 1})
-            return [user["user_id"] for user in users]
+            profiles = profile_repository.iter_profiles(
+                query,
+                self._profile_projection(push_type),
+                settings.SCHEDULER_CURSOR_BATCH_SIZE
+            )
+            async for profile in profiles:
+                if profile["user_id"] not in exclude:
+                    yield profile
         except Exception as e:
-            logger.error(f"获取用户列表失败: {e}")
+            logger.error(f"读取用户档案失败: {e}")
+    
+    async def _get_user_cities(self, shard_range: tuple = None) -> list:
+        """获取设置了地区的用户所在的全部城市 [(省份, 城市), ...]"""
+        try:
+            locations = await profile_repository.distinct_locations(self._shard_query(shard_range))
+            return [self._city_key(location) for location in locations]
+        except Exception as e:
+            logger.error(f"获取用户地区失败: {e}")
             return []
     
-    def rest_reminder_task(self, time_type: str):
-        """作息提醒任务"""
-        logger.info(f"开始执行作息提醒任务：{time_type}")
-        users = self._get_all_users()
+    @staticmethod
+    def _city_key(location: dict) -> tuple:
+        return (location.get("province") or "浙江", location.get("city") or "杭州")
+    
+    def _slot_key(self, time_str: str, upcoming: bool) -> str:
+        """
+        计算推送时段标识，如 2025-01-01T07:00
         
-        for user_id in users:
-            try:
-                result = push_service.push_rest_reminder(user_id, time_type)
-                logger.info(f"用户{user_id}作息提醒推送结果: {result.get('status')}")
-            except Exception as e:
-                logger.error(f"用户{user_id}作息提醒推送失败: {e}")
+        Args:
+            time_str: 推送时间 HH:MM
+            upcoming: True取当前时间之后最近的一次，False取当前时间之前最近的一次
+        """
+        now = datetime.now(self.scheduler.timezone)
+        hour, minute = time_str.split(":")
+        slot = now.replace(hour=int(hour), minute=int(minute), second=0, microsecond=0)
+        if upcoming and slot < now:
+            slot += timedelta(days=1)
+        elif not upcoming and slot > now:
+            slot -= timedelta(days=1)
+        return f"{slot.strftime('%Y-%m-%d')}T{time_str}"
     
-    def meal_reminder_task(self, meal_type: str):
-        """饮食提醒任务"""
-        logger.info(f"开始执行饮食提醒任务：{meal_type}")
-        users = self._get_all_users()
+    async def _collect_push_items(
+        self,
+        push_type: str,
+        params: dict,
+        exclude: set = None,
+        shard_range: tuple = None,
+        weather_cache: dict = None
+    ):
+        """
+        生成本次推送的 (用户档案, 推送参数) 序列
         
-        for user_id in users:
-            try:
-                result = push_service.push_meal_reminder(user_id, meal_type)
-                logger.info(f"用户{user_id}饮食提醒推送结果: {result.get('status')}")
-            except Exception as e:
-                logger.error(f"用户{user_id}饮食提醒推送失败: {e}")
+        天气推送先汇总所有城市，每个城市只爬取一次天气，再随档案分发给该城市的用户。
+        分片运行时各区间共用 weather_cache，已爬取过的城市不再重复爬取。
+        """
+        profiles = self._iter_profiles(push_type, exclude, shard_range)
+        if push_type != "weather":
+            return ((profile, params) async for profile in profiles)
+        
+        weather_by_city = weather_cache if weather_cache is not None else {}
+        cities = [city for city in await self._get_user_cities(shard_range) if city not in weather_by_city]
+        weather_by_city.update(await weather_crawler.crawl_cities(cities))
+        logger.info(f"已爬取{len(cities)}个城市的天气")
+        
+        return (
+            (profile, {**params, "weather_info": weather_by_city.get(self._city_key(profile["location"]))})
+            async for profile in profiles
+            if profile.get("location")
+        )
+    
+    @staticmethod
+    def _item_user_id(item: tuple) -> str:
+        return item[0]["user_id"]
     
-    def weather_reminder_task(self):
-        """天气提醒任务"""
-        logger.info("开始执行天气提醒任务")
-        users = self._get_all_users()
+    async def _push_item(self, push_type: str, slot: str, item: tuple) -> dict:
+        profile, params = item
+        return await push_service.push(push_type, profile["user_id"], profile, buffered=True, slot=slot, **params)
+    
+    async def _stage_item(self, push_type: str, slot: str, item: tuple) -> dict:
+        profile, params = item
+        return await push_service.stage_push(push_type, slot, profile["user_id"], profile, **params)
+    
+    async def run_push_task(
+        self,
+        push_type: str,
+        params: dict,
+        exclude: set = None,
+        slot: str = None,
+        shard_range: tuple = None,
+        weather_cache: dict = None
+    ) -> dict:
+        """
+        实时生成并推送
         
-        for user_id in users:
-            try:
-                # 只为设置了地区的用户推送
-                collection = self.db.get_collection(settings.COLLECTION_HEALTH_PROFILE)
-                profile = collection.find_one({"user_id": user_id})
-                
-                if profile and profile.get("location"):
-                    result = push_service.push_weather_reminder(user_id)
-                    logger.info(f"用户{user_id}天气提醒推送结果: {result.get('status')}")
-                else:
-                    logger.info(f"用户{user_id}未设置地区，跳过天气推送")
-            except Exception as e:
-                logger.error(f"用户{user_id}天气提醒推送失败: {e}")
+        Args:
+            push_type: 推送类型 rest/meal/weather/health_tip
+            params: 推送参数
+            exclude: 需要跳过的用户ID（如已通过预生成投递的用户）
+            slot: 推送时段，用于生成幂等键；不传则不做重复检查
+            shard_range: 只处理 shard_hash 落在 [lo, hi) 的用户，分片运行时使用
+            weather_cache: 分片运行时各区间共用的城市天气
+        """
+        logger.info(f"开始执行推送任务：{push_type} {params} {shard_range or ''}")
+        items = await self._collect_push_items(push_type, params, exclude, shard_range, weather_cache)
+        summary = await self.fanout.run(
+            push_type,
+            items,
+            partial(self._push_item, push_type, slot),
+            key=self._item_user_id
+        )
+        return summary.to_dict()
+    
+    async def enqueue_push_task(self, push_type: str, params: dict, slot: str, exclude: set = None) -> dict:
+        """将本时段每个用户的推送写入持久化队列，由队列消费者执行"""
+        items = await self._collect_push_items(push_type, params, exclude)
+        enqueued = await push_job_queue.enqueue(push_type, slot, items)
+        return {"task_type": push_type, "slot": slot, "enqueued": enqueued}
+    
+    async def _run_sharded(self, run_id: str, task, *args, **kwargs) -> dict:
+        """
+        与其他调度实例按哈希区间分摊一次任务，并汇总本实例处理的结果
+        
+        Args:
+            run_id: 运行标识，所有实例对同一次任务须一致
+            task: 接受 shard_range、weather_cache 关键字参数的任务方法
+        """
+        started = time.monotonic()
+        weather_cache = {}
+        results = await shard_coordinator.run(
+            run_id,
+            lambda shard_range: task(*args, shard_range=shard_range, weather_cache=weather_cache, **kwargs)
+        )
+        merged = {"task_type": run_id, "total": 0, "success": 0, "failed": 0, "timeout": 0, "skipped": 0, "failed_users": []}
+        for result in results:
+            for field, value in result.items():
+                if isinstance(value, list):
+                    merged.setdefault(field, []).extend(value)
+                elif isinstance(value, int) and not isinstance(value, bool):
+                    merged[field] = merged.get(field, 0) + value
+        merged["elapsed"] = round(time.monotonic() - started, 3)
+        merged["buckets"] = len(results)
+        merged["node_id"] = shard_coordinator.node_id
+        return merged
+    
+    async def pregenerate_task(
+        self,
+        push_type: str,
+        time_str: str,
+        params: dict,
+        shard_range: tuple = None,
+        weather_cache: dict = None
+    ) -> dict:
+        """在推送时间之前预生成内容并暂存"""
+        slot = self._slot_key(time_str, upcoming=True)
+        if settings.SHARDING_ENABLED and shard_range is None:
+            return await self._run_sharded(f"pregenerate:{push_type}:{slot}", self.pregenerate_task, push_type, time_str, params)
+        
+        logger.info(f"开始预生成推送：{push_type} {slot} {shard_range or ''}")
+        items = await self._collect_push_items(push_type, params, shard_range=shard_range, weather_cache=weather_cache)
+        summary = await self.fanout.run(
+            push_type,
+            items,
+            partial(self._stage_item, push_type, slot),
+            key=self._item_user_id
+        )
+        return summary.to_dict()
     
-    def health_tip_task(self):
+    async def deliver_task(self, push_type: str, time_str: str, params: dict) -> dict:
+        """到达推送时间时投递已暂存的内容，未能预生成的用户实时补推"""
+        slot = self._slot_key(time_str, upcoming=False)
+        # 各实例都会投递，同一条暂存内容的重复投递被推送历史的幂等键唯一索引拒绝
+        delivered = await push_service.deliver_staged(push_type, slot)
+        if settings.QUEUE_ENABLED:
+            result = await self.enqueue_push_task(push_type, params, slot, exclude=delivered)
+        elif settings.SHARDING_ENABLED:
+            result = await self._run_sharded(
+                f"push:{push_type}:{slot}", self.run_push_task, push_type, params, exclude=delivered, slot=slot
+            )
+        else:
+            result = await self.run_push_task(push_type, params, exclude=delivered, slot=slot)
+        result["delivered_from_staging"] = len(delivered)
+        return result
+    
+    async def scheduled_push_task(self, push_type: str, time_str: str, params: dict) -> dict:
+        """定时推送：按推送时段生成幂等键，重复运行时已推送的用户会被跳过"""
+        slot = self._slot_key(time_str, upcoming=False)
+        if settings.QUEUE_ENABLED:
+            return await self.enqueue_push_task(push_type, params, slot)
+        if settings.SHARDING_ENABLED:
+            return await self._run_sharded(f"push:{push_type}:{slot}", self.run_push_task, push_type, params, slot=slot)
+        return await self.run_push_task(push_type, params, slot=slot)
+    
+    async def rest_reminder_task(self, time_type: str) -> dict:
+        """作息提醒任务"""
+        return await self.run_push_task("rest", {"time_type": time_type})
+    
+    async def meal_reminder_task(self, meal_type: str) -> dict:
+        """饮食提醒任务"""
+        return await self.run_push_task("meal", {"meal_type": meal_type})
+    
+    async def weather_reminder_task(self) -> dict:
+        """天气提醒任务：每个城市只爬取一次，再分发给该城市的所有用户"""
+        return await self.run_push_task("weather", {})
+    
+    async def health_tip_task(self) -> dict:
         """养生妙招任务"""
-        logger.info("开始执行养生妙招任务")
-        users = self._get_all_users()
+        return await self.run_push_task("health_tip", {})
+    
+    def _dispatch_projection(self) -> dict:
+        """分散投递读取的档案字段：各推送类型用到的字段及推送时间表"""
+        projection = {"push_schedule": 1}
+        for push_type in {spec["push_type"] for spec in SLOTS.values()}:
+            projection.update(self._profile_projection(push_type))
+        return projection
+    
+    async def _dispatch_items(self, spec: dict, slot: str, profiles: list) -> list:
+        """生成一个时段本分钟的 (用户档案, 推送参数)，天气推送的城市天气在同一时段内只爬取一次"""
+        if spec["push_type"] != "weather":
+            return [(profile, spec["params"]) for profile in profiles]
         
-        for user_id in users:
-            try:
-                result = push_service.push_health_tip(user_id)
-                logger.info(f"用户{user_id}养生妙招推送结果: {result.get('status')}")
-            except Exception as e:
-                logger.error(f"用户{user_id}养生妙招推送失败: {e}")
+        profiles = [profile for profile in profiles if profile.get("location")]
+        for stale in [key for key in self._dispatch_weather if key != slot]:
+            del self._dispatch_weather[stale]
+        weather_by_city = self._dispatch_weather.setdefault(slot, {})
+        cities = {self._city_key(profile["location"]) for profile in profiles} - set(weather_by_city)
+        if cities:
+            weather_by_city.update(await weather_crawler.crawl_cities(list(cities)))
+        return [
+            (profile, {**spec["params"], "weather_info": weather_by_city.get(self._city_key(profile["location"]))})
+            for profile in profiles
+        ]
     
-    def start(self):
-        """启动定时任务"""
-        # 作息提醒任务
-        for time_str in settings.REST_TIMES:
-            hour, minute = time_str.split(":")
-            time_type_map = {"07:00": "morning", "13:00": "noon", "23:00": "night"}
-            time_type = time_type_map.get(time_str, "morning")
-            
-            self.scheduler.add_job(
-                self.rest_reminder_task,
-                CronTrigger(hour=int(hour), minute=int(minute)),
-                args=[time_type],
-                id=f"rest_reminder_{time_str}",
-                name=f"作息提醒-{time_str}"
+    async def _dispatch_slot(self, spec: dict, slot: str, profiles: list) -> dict:
+        items = await self._dispatch_items(spec, slot, profiles)
+        if settings.QUEUE_ENABLED:
+            async def queued_items():
+                for item in items:
+                    yield item
+            return {"enqueued": await push_job_queue.enqueue(spec["push_type"], slot, queued_items())}
+        summary = await self.fanout.run(
+            spec["push_type"],
+            items,
+            partial(self._push_item, spec["push_type"], slot),
+            key=self._item_user_id
+        )
+        return summary.to_dict()
+    
+    async def _dispatch_range(self, tick: datetime, shard_range: tuple = None, weather_cache: dict = None) -> dict:
+        """
+        推送该分钟到期且 shard_hash 在区间内的用户，汇总各时段的结果
+        
+        天气按时段缓存在 self._dispatch_weather 中，跨分钟复用，不使用分片传入的 weather_cache。
+        """
+        minute = tick.hour * 60 + tick.minute
+        due = {}
+        profiles = profile_repository.iter_due_profiles(
+            minute, self._dispatch_projection(), settings.SCHEDULER_CURSOR_BATCH_SIZE, shard_range
+        )
+        async for profile in profiles:
+            for entry in profile.pop("push_schedule", []):
+                if entry["minute"] == minute and entry["slot"] in SLOTS:
+                    # 时段日期取抖动前的计划时间，抖动跨过零点的用户仍归入前一天的时段
+                    base = tick - timedelta(minutes=jitter_offset(profile["user_id"], entry["slot"]))
+                    slot = f"{base:%Y-%m-%d}T{SLOTS[entry['slot']]['time']}"
+                    due.setdefault((entry["slot"], slot), []).append(profile)
+        
+        keys = list(due)
+        results = await asyncio.gather(*(
+            self._dispatch_slot(SLOTS[slot_id], slot, due[(slot_id, slot)]) for slot_id, slot in keys
+        ))
+        merged = {"total": 0, "success": 0, "failed": 0, "timeout": 0, "skipped": 0, "enqueued": 0, "failed_users": []}
+        for result in results:
+            for field in ("total", "success", "failed", "timeout", "skipped", "enqueued"):
+                merged[field] += result.get(field, 0)
+            merged["failed_users"].extend(result.get("failed_users", []))
+        if keys:
+            logger.info(
+                f"{tick:%H:%M} 分散投递{shard_range or ''}：{', '.join(f'{slot} {len(due[(slot_id, slot)])}人' for slot_id, slot in keys)}"
             )
-            logger.info(f"已添加作息提醒任务：{time_str}")
-        
-        # 饮食提醒任务
-        meal_time_map = {
-            "07:30": "breakfast",
-            "12:00": "lunch",
-            "18:00": "dinner"
-        }
-        for time_str in settings.MEAL_TIMES:
-            hour, minute = time_str.split(":")
-            meal_type = meal_time_map.get(time_str, "lunch")
-            
+        return merged
+    
+    async def dispatch_minute(self, tick: datetime) -> dict:
+        """
+        分散投递：推送该分钟到期的用户
+        
+        到期用户由档案 push_schedule.minute 索引查询。推送时段标识为计划推送日期加时段的配置时间，
+        与整点推送的幂等键格式相同，用户当天修改推送时间后不会重复推送。开启分片时各实例按哈希区间分摊。
+        
+        Returns:
+            本分钟各时段推送结果的汇总
+        """
+        if settings.SHARDING_ENABLED:
+            return await self._run_sharded(f"dispatch:{tick:%Y-%m-%dT%H:%M}", self._dispatch_range, tick)
+        return await self._dispatch_range(tick)
+    
+    async def retention_task(self) -> dict:
+        """推送历史归档任务"""
+        try:
+            return await push_retention.run()
+        except Exception as e:
+            logger.error(f"推送历史归档失败: {e}")
+            return {"error": str(e)}
+    
+    async def start(self):
+        """启动定时任务"""
+        if settings.SHARDING_ENABLED:
+            # 分片按 shard_hash 读取档案，先为历史档案补写哈希
+            backfilled = await profile_repository.backfill_shard_hash()
+            if backfilled:
+                logger.info(f"已为{backfilled}个档案补写shard_hash")
+            await shard_coordinator.register()
+        
+        if settings.DISPATCH_ENABLED:
+            # 分散投递按档案中的推送时间表逐分钟推送，替代各时段的整点任务
+            updated = await profile_repository.backfill_push_schedule(SCHEDULE_SIGNATURE, schedule_fields)
+            if updated:
+                logger.info(f"已为{updated}个档案重新计算推送时间表")
+            if settings.PREGENERATE_ENABLED:
+                logger.warning("分散投递已开启，预生成不再生效")
+            self.dispatcher.start(self.dispatch_minute, settings.DISPATCH_CATCHUP_MINUTES)
+        else:
+            for spec in slot_specs():
+                hour, minute = spec["time"].split(":")
+                
+                if settings.PREGENERATE_ENABLED:
+                    # 在推送时间前 lead_minutes 分钟预生成，推送时间只做投递
+                    pre_hour, pre_minute = divmod(
+                        (int(hour) * 60 + int(minute) - settings.PREGENERATE_LEAD_MINUTES) % (24 * 60), 60
+                    )
+                    self.scheduler.add_job(
+                        self.pregenerate_task,
+                        CronTrigger(hour=pre_hour, minute=pre_minute),
+                        args=[spec["push_type"], spec["time"], spec["params"]],
+                        id=f"pregenerate_{spec['job_id']}",
+                        name=f"预生成-{spec['name']}"
+                    )
+                    self.scheduler.add_job(
+                        self.deliver_task,
+                        CronTrigger(hour=int(hour), minute=int(minute)),
+                        args=[spec["push_type"], spec["time"], spec["params"]],
+                        id=spec["job_id"],
+                        name=spec["name"]
+                    )
+                else:
+                    self.scheduler.add_job(
+                        self.scheduled_push_task,
+                        CronTrigger(hour=int(hour), minute=int(minute)),
+                        args=[spec["push_type"], spec["time"], spec["params"]],
+                        id=spec["job_id"],
+                        name=spec["name"]
+                    )
+                logger.info(f"已添加{spec['name']}任务：{spec['time']}")
+        
+        if settings.RETENTION_ENABLED:
+            # 多实例部署时各实例都会执行，归档以记录 _id 去重，重复执行无副作用
+            hour, minute = settings.RETENTION_RUN_TIME.split(":")
             self.scheduler.add_job(
-                self.meal_reminder_task,
+                self.retention_task,
                 CronTrigger(hour=int(hour), minute=int(minute)),
-                args=[meal_type],
-                id=f"meal_reminder_{time_str}",
-                name=f"饮食提醒-{time_str}"
+                id="push_history_retention",
+                name="推送历史归档"
             )
-            logger.info(f"已添加饮食提醒任务：{time_str}")
-        
-        # 天气提醒任务
-        weather_hour, weather_minute = settings.WEATHER_TIME.split(":")
-        self.scheduler.add_job(
-            self.weather_reminder_task,
-            CronTrigger(hour=int(weather_hour), minute=int(weather_minute)),
-            id="weather_reminder",
-            name="天气提醒"
-        )
-        logger.info(f"已添加天气提醒任务：{settings.WEATHER_TIME}")
-        
-        # 养生妙招任务
-        health_hour, health_minute = settings.HEALTH_TIP_TIME.split(":")
-        self.scheduler.add_job(
-            self.health_tip_task,
-            CronTrigger(hour=int(health_hour), minute=int(health_minute)),
-            id="health_tip",
-            name="养生妙招"
-        )
-        logger.info(f"已添加养生妙招任务：{settings.HEALTH_TIP_TIME}")
+            logger.info(f"已添加推送历史归档任务：{settings.RETENTION_RUN_TIME}")
         
-        # 启动调度器
+        # 启动调度器及推送历史定时刷新
         self.scheduler.start()
+        push_history_writer.start()
+        if settings.QUEUE_ENABLED:
+            push_job_queue.start()
+            if not settings.DISPATCH_ENABLED:
+                await self._catch_up_missed_slots()
         logger.info("定时任务调度器已启动")
     
-    def shutdown(self):
-        """关闭调度器"""
+    async def _catch_up_missed_slots(self):
+        """
+        补跑进程停止期间错过的推送时段
+        
+        调度器任务只保存在内存中，重启前错过的时段不会自动触发。对最近 catchup_minutes 分钟内的时段重新入队，
+        已入队或已推送的用户由任务ID和幂等键去重。
+        """
+        now = datetime.now(self.scheduler.timezone).replace(tzinfo=None)
+        for spec in slot_specs():
+            slot = self._slot_key(spec["time"], upcoming=False)
+            if now - datetime.strptime(slot, "%Y-%m-%dT%H:%M") > timedelta(minutes=settings.QUEUE_CATCHUP_MINUTES):
+                continue
+            try:
+                if settings.PREGENERATE_ENABLED:
+                    result = await self.deliver_task(spec["push_type"], spec["time"], spec["params"])
+                else:
+                    result = await self.enqueue_push_task(spec["push_type"], spec["params"], slot)
+                logger.info(f"补跑{spec['name']}：{result}")
+            except Exception as e:
+                logger.error(f"补跑{spec['name']}失败: {e}")
+    
+    async def shutdown(self):
+        """关闭调度器，并将缓冲中的推送历史写入数据库"""
         self.scheduler.shutdown()
+        await self.dispatcher.close()
+        self.fanout.shutdown()
+        if settings.QUEUE_ENABLED:
+            await push_job_queue.close()
+        if settings.SHARDING_ENABLED:
+            await shard_coordinator.unregister()
+        await push_history_writer.close()
         logger.info("定时任务调度器已关闭")
 
 
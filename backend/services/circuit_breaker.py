@@ -0,0 +1,121 @@
+"""大模型调用熔断"""
+import logging
+import time
+from collections import deque
+from backend.config.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitBreaker:
+    """
+    按错误率熔断
+
+    closed：正常放行，统计最近 window 秒内的调用结果，调用数达到 min_calls 且错误率达到 failure_rate 时熔断。
+    open：直接拒绝调用，持续 open_seconds 秒后进入 half_open。
+    half_open：放行最多 half_open_probes 个探测调用，全部成功则恢复 closed，任一失败或被限流则重新熔断。
+    未发出请求或被调用方取消的探测调用通过 release 归还名额；超过 probe_timeout 秒仍未全部返回时同样重新熔断。
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self):
+        self.enabled = settings.DASHSCOPE_BREAKER_ENABLED
+        self.window = settings.DASHSCOPE_BREAKER_WINDOW
+        self.min_calls = settings.DASHSCOPE_BREAKER_MIN_CALLS
+        self.failure_rate = settings.DASHSCOPE_BREAKER_FAILURE_RATE
+        self.open_seconds = settings.DASHSCOPE_BREAKER_OPEN_SECONDS
+        self.half_open_probes = settings.DASHSCOPE_BREAKER_HALF_OPEN_PROBES
+        self.probe_timeout = settings.DASHSCOPE_BREAKER_PROBE_TIMEOUT
+        self.state = self.CLOSED
+        self.rejected = 0
+        self.opened = 0
+        self._outcomes = deque()
+        self._opened_at = 0.0
+        self._half_opened_at = 0.0
+        self._probes_started = 0
+        self._probes_succeeded = 0
+
+    def _trim(self, now: float):
+        while self._outcomes and self._outcomes[0][0] < now - self.window:
+            self._outcomes.popleft()
+
+    def _open(self, reason: str):
+        self.state = self.OPEN
+        self.opened += 1
+        self._opened_at = time.monotonic()
+        logger.warning(f"大模型调用熔断（{reason}），{self.open_seconds}秒后尝试恢复")
+
+    def allow(self) -> bool:
+        """当前是否放行调用"""
+        if not self.enabled:
+            return True
+        if self.state == self.OPEN:
+            if time.monotonic() - self._opened_at < self.open_seconds:
+                self.rejected += 1
+                return False
+            self.state = self.HALF_OPEN
+            self._half_opened_at = time.monotonic()
+            self._probes_started = 0
+            self._probes_succeeded = 0
+        if self.state == self.HALF_OPEN:
+            if self._probes_started >= self.half_open_probes:
+                if time.monotonic() - self._half_opened_at >= self.probe_timeout:
+                    self._open("探测调用超时")
+                self.rejected += 1
+                return False
+            self._probes_started += 1
+        return True
+
+    def record_success(self):
+        if not self.enabled:
+            return
+        if self.state == self.HALF_OPEN:
+            self._probes_succeeded += 1
+            if self._probes_succeeded >= self.half_open_probes:
+                self.state = self.CLOSED
+                self._outcomes.clear()
+                logger.info("大模型调用已恢复，熔断关闭")
+            return
+        now = time.monotonic()
+        self._outcomes.append((now, True))
+        self._trim(now)
+
+    def record_throttled(self):
+        """调用被限流（429）：不计入错误率，探测调用被限流则重新熔断"""
+        if self.enabled and self.state == self.HALF_OPEN:
+            self._open("探测调用被限流")
+
+    def release(self):
+        """放行后未得到调用结果（等待限流时出错、被调用方取消），归还探测名额"""
+        if self.enabled and self.state == self.HALF_OPEN and self._probes_started > self._probes_succeeded:
+            self._probes_started -= 1
+
+    def record_failure(self):
+        if not self.enabled:
+            return
+        if self.state == self.HALF_OPEN:
+            self._open("探测调用失败")
+            return
+        if self.state == self.OPEN:
+            return
+        now = time.monotonic()
+        self._outcomes.append((now, False))
+        self._trim(now)
+        failures = sum(1 for _, ok in self._outcomes if not ok)
+        if len(self._outcomes) >= self.min_calls and failures / len(self._outcomes) >= self.failure_rate:
+            self._open(f"最近{len(self._outcomes)}次调用失败{failures}次")
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "state": self.state,
+            "opened": self.opened,
+            "rejected": self.rejected,
+        }
+
+
+# 全局大模型熔断实例
+llm_circuit_breaker = CircuitBreaker()
@@ -0,0 +1,228 @@
+"""推送历史与健康档案导出
+
+通过分批游标读取文档，每批编码为 NDJSON 或 CSV 后立即输出，可选gzip压缩，内存占用与导出条数无关。
+CSV 与批量导入使用相同的列格式：嵌套字段以“.”连接列名，字符串列表以“;”分隔，其余列表和对象为JSON。
+推送历史同时读取 push_history 与归档集合，按 (push_time, _id) 合并，归档记录带 archived 标记。
+
+用法:
+    python -m backend.services.data_export push_history --user-id u001 -o history.ndjson
+    python -m backend.services.data_export profiles --start 2026-01-01 --format csv --gzip -o profiles.csv.gz
+"""
+import argparse
+import asyncio
+import csv
+import io
+import logging
+import sys
+import zlib
+from datetime import datetime
+from backend.config.config import settings
+from backend.core.mongodb import async_mongodb
+from backend.core.responses import dumps
+from backend.models.health_profile import BasicInfo, HealthInfo, OtherInfo
+from backend.repositories.profile_repository import profile_repository
+from backend.repositories.push_repository import push_history_repository, push_archive_repository
+
+logger = logging.getLogger(__name__)
+
+EXPORT_FORMATS = ("ndjson", "csv")
+
+PUSH_HISTORY_COLUMNS = ["_id", "user_id", "push_type", "content", "push_time", "is_read", "archived"]
+PROFILE_COLUMNS = (
+    ["user_id"]
+    + [
+        f"{section}.{name}"
+        for section, model in (("basic_info", BasicInfo), ("health_info", HealthInfo), ("other_info", OtherInfo))
+        for name in model.model_fields
+    ]
+    + ["persona_style", "location", "created_at", "updated_at"]
+)
+
+# 数据集 -> (CSV列, 时间范围过滤使用的字段)
+DATASETS = {
+    "push_history": (PUSH_HISTORY_COLUMNS, "push_time"),
+    "profiles": (PROFILE_COLUMNS, "created_at"),
+}
+
+
+def _local_naive(value: datetime) -> datetime:
+    # 文档中的时间按服务器本地时间保存
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone().replace(tzinfo=None)
+    return value
+
+
+def _csv_value(value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, list) and all(isinstance(item, str) and ";" not in item for item in value):
+        return ";".join(value)
+    if isinstance(value, (list, dict)):
+        return dumps(value).decode()
+    return str(value)
+
+
+def _csv_row(document: dict, columns: list) -> list:
+    row = []
+    for column in columns:
+        value = document
+        for part in column.split("."):
+            value = value.get(part) if isinstance(value, dict) else None
+        row.append(_csv_value(value))
+    return row
+
+
+async def _next_record(records):
+    try:
+        return await records.__anext__()
+    except StopAsyncIteration:
+        return None
+
+
+async def merge_records(first, second):
+    """按 (push_time, _id) 正序合并两个有序的推送记录流，_id 相同的记录只保留 first 中的"""
+    left, right = await _next_record(first), await _next_record(second)
+    while left is not None or right is not None:
+        if right is None or (left is not None and (left["push_time"], left["_id"]) <= (right["push_time"], right["_id"])):
+            if right is not None and left["_id"] == right["_id"]:
+                right = await _next_record(second)
+            yield left
+            left = await _next_record(first)
+        else:
+            yield right
+            right = await _next_record(second)
+
+
+async def encode_ndjson(documents, batch_size: int):
+    """每 batch_size 个文档编码为一段 NDJSON"""
+    lines = []
+    async for document in documents:
+        lines.append(dumps(document))
+        if len(lines) >= batch_size:
+            yield b"\n".join(lines) + b"\n"
+            lines = []
+    if lines:
+        yield b"\n".join(lines) + b"\n"
+
+
+async def encode_csv(documents, columns: list, batch_size: int):
+    """每 batch_size 个文档编码为一段 CSV，首段带BOM和列名，便于用Excel打开"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    buffer.write("\ufeff")
+    writer.writerow(columns)
+    rows = 0
+    async for document in documents:
+        writer.writerow(_csv_row(document, columns))
+        rows += 1
+        if rows >= batch_size:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+            rows = 0
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+async def gzip_chunks(chunks):
+    """以gzip格式流式压缩"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    async for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+class DataExporter:
+    """按用户或时间范围导出推送历史、健康档案"""
+
+    def __init__(self):
+        self.batch_size = settings.EXPORT_BATCH_SIZE
+
+    def documents(self, dataset: str, user_id: str = None, start: datetime = None, end: datetime = None):
+        """
+        按条件流式读取文档
+
+        Args:
+            dataset: push_history 或 profiles
+            user_id: 只导出该用户
+            start, end: 时间范围 [start, end)，推送历史按推送时间，档案按创建时间
+        """
+        _, time_field = DATASETS[dataset]
+        query = {}
+        if user_id:
+            query["user_id"] = user_id
+        time_range = {}
+        if start:
+            time_range["$gte"] = _local_naive(start)
+        if end:
+            time_range["$lt"] = _local_naive(end)
+        if time_range:
+            query[time_field] = time_range
+
+        if dataset == "push_history":
+            # 归档中断时同一条记录可能同时存在于两处，合并时去重
+            return merge_records(
+                push_history_repository.iter_records(query, self.batch_size),
+                push_archive_repository.iter_records(query, self.batch_size)
+            )
+        # 只导出与导入格式一致的列，不带 push_schedule、version 等内部字段
+        projection = {"_id": 0, **{column: 1 for column in PROFILE_COLUMNS}}
+        return profile_repository.iter_profiles(query, projection, self.batch_size)
+
+    def stream(self, dataset: str, export_format: str = "ndjson", compress: bool = False, **filters):
+        """
+        导出内容的字节流
+
+        Args:
+            dataset: push_history 或 profiles
+            export_format: ndjson 或 csv
+            compress: 是否gzip压缩
+            filters: user_id、start、end，见 documents
+        """
+        columns, _ = DATASETS[dataset]
+        documents = self.documents(dataset, **filters)
+        if export_format == "csv":
+            chunks = encode_csv(documents, columns, self.batch_size)
+        else:
+            chunks = encode_ndjson(documents, self.batch_size)
+        return gzip_chunks(chunks) if compress else chunks
+
+
+# 全局数据导出实例
+data_exporter = DataExporter()
+
+
+async def _main(args) -> int:
+    chunks = data_exporter.stream(
+        args.dataset, args.format, args.gzip,
+        user_id=args.user_id, start=args.start, end=args.end
+    )
+    output = open(args.output, "wb") if args.output else sys.stdout.buffer
+    written = 0
+    try:
+        async for chunk in chunks:
+            output.write(chunk)
+            written += len(chunk)
+    finally:
+        if args.output:
+            output.close()
+        async_mongodb.close()
+    logger.info(f"导出{args.dataset}完成，共{written}字节")
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="导出推送历史或健康档案")
+    parser.add_argument("dataset", choices=list(DATASETS), help="导出的数据")
+    parser.add_argument("--user-id", help="只导出该用户")
+    parser.add_argument("--start", type=datetime.fromisoformat, help="开始时间（含），如 2026-01-01")
+    parser.add_argument("--end", type=datetime.fromisoformat, help="结束时间（不含）")
+    parser.add_argument("--format", choices=EXPORT_FORMATS, default="ndjson", help="输出格式")
+    parser.add_argument("--gzip", action="store_true", help="gzip压缩输出")
+    parser.add_argument("-o", "--output", help="输出文件，默认输出到标准输出")
+    raise SystemExit(asyncio.run(_main(parser.parse_args())))
@@ -0,0 +1,82 @@
+"""大模型不可用时的兜底推送内容"""
+import logging
+from datetime import date
+from backend.utils.persona_styles import PERSONA_STYLES
+
+logger = logging.getLogger(__name__)
+
+# 各推送类型的兜底正文，键为推送参数（作息时间、餐次），养生妙招按日期轮换
+FALLBACK_TEMPLATES = {
+    "rest": {
+        "morning": "早上好，新的一天开始了。起床后先喝一杯温水，舒展一下身体，规律的作息是健康的基础。",
+        "noon": "午饭后适当休息一会儿，午睡15到30分钟就好，能让下午更有精神。",
+        "night": "夜深了，该放下手机准备睡觉了。早睡早起，充足的睡眠能帮助身体修复。",
+    },
+    "meal": {
+        "breakfast": "早餐时间到啦。一份有主食、蛋白质和蔬果的早餐，能为一上午提供充足的能量。",
+        "lunch": "午餐时间到了。荤素搭配、细嚼慢咽，七八分饱最合适。",
+        "dinner": "晚餐时间到了。晚餐宜清淡、少油少盐，不要吃得太晚太饱。",
+    },
+    "weather": {
+        "default": "出门前留意天气变化，注意适时增减衣物，多喝水，照顾好自己。",
+    },
+    "health_tip": {
+        "default": [
+            "久坐一小时记得起身活动五分钟，伸展肩颈和腰背。",
+            "每天饮水1500到1700毫升，少量多次，不要等口渴了才喝。",
+            "饭后散步二十分钟，有助于消化和稳定血糖。",
+            "睡前用温水泡脚十分钟，可以促进血液循环、帮助入睡。",
+            "用眼一段时间后远眺片刻，让眼睛得到放松。",
+            "每周进行至少150分钟中等强度的运动，如快走、游泳、骑车。",
+            "多吃深色蔬菜和新鲜水果，保证膳食纤维和维生素的摄入。",
+        ],
+    },
+}
+
+
+class FallbackLibrary:
+    """
+    按人物风格预先生成的兜底推送内容
+
+    由 PERSONA_STYLES 中各风格的称呼和结束语，与各推送类型的兜底正文组合而成，
+    启动时一次性生成，熔断期间直接取用，不依赖大模型。
+    """
+
+    def __init__(self):
+        self.served = 0
+        self._messages = {}
+        for style_name, style in PERSONA_STYLES.items():
+            for push_type, variants in FALLBACK_TEMPLATES.items():
+                for variant, bodies in variants.items():
+                    if isinstance(bodies, str):
+                        bodies = [bodies]
+                    self._messages[(style_name, push_type, variant)] = [
+                        f"{style['greeting']}{body}{style['closing']}" for body in bodies
+                    ]
+
+    def render(self, persona_style: str, push_type: str, **params) -> str:
+        """
+        获取兜底内容
+
+        Args:
+            persona_style: 用户的人物风格，未设置或不存在时使用专业顾问
+            push_type: 推送类型 rest/meal/weather/health_tip
+            params: 推送参数，time_type 或 meal_type 用于选择正文
+        """
+        if persona_style not in PERSONA_STYLES:
+            persona_style = "专业顾问"
+        variant = params.get("time_type") or params.get("meal_type") or "default"
+        messages = (
+            self._messages.get((persona_style, push_type, variant))
+            or next(
+                candidates for (style_name, candidate_type, _), candidates in self._messages.items()
+                if style_name == persona_style and candidate_type == push_type
+            )
+        )
+        self.served += 1
+        # 同一天内同一风格的内容保持一致，按日期轮换
+        return messages[date.today().toordinal() % len(messages)]
+
+
+# 全局兜底内容实例
+fallback_library = FallbackLibrary()
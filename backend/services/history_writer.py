@@ -0,0 +1,144 @@
+"""推送历史批量写入"""
+import asyncio
+import logging
+from collections import deque
+from pymongo.errors import BulkWriteError
+from backend.repositories.push_repository import push_history_repository, push_claim_repository
+from backend.config.config import settings
+
+logger = logging.getLogger(__name__)
+
+# 重复键错误码：文档已写入，无需重试
+DUPLICATE_KEY_ERROR = 11000
+
+
+class PushHistoryWriter:
+    """
+    推送历史写缓冲
+
+    记录先进入内存缓冲，达到批量大小或定时刷新时以无序 insert_many 批量写入。
+    写入失败的文档在下次刷新时重试，超过重试次数后放入 failed_documents 供人工处理。
+    带幂等键的记录写入成功（或已存在）后才将幂等键标记为完成；最终写入失败的记录其幂等键保持占用，
+    超过 claim_timeout 后可被接管，该时段的推送可以重新执行。
+    """
+
+    def __init__(self):
+        self.batch_size = settings.HISTORY_WRITER_BATCH_SIZE
+        self.flush_interval = settings.HISTORY_WRITER_FLUSH_INTERVAL
+        self.max_retries = settings.HISTORY_WRITER_MAX_RETRIES
+        self._buffer = []
+        self._retry_buffer = []
+        self.failed_documents = deque(maxlen=10000)
+        self._lock: asyncio.Lock = None
+        self._flush_task: asyncio.Task = None
+
+    def _get_lock(self) -> asyncio.Lock:
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        return self._lock
+
+    async def add(self, record: dict):
+        """加入一条推送记录，缓冲达到批量大小时立即刷新"""
+        self._buffer.append(record)
+        if len(self._buffer) >= self.batch_size:
+            await self.flush()
+
+    async def flush(self) -> dict:
+        """
+        将缓冲中的记录批量写入推送历史
+
+        Returns:
+            本次写入结果：inserted 成功条数，retrying 待重试条数，failed 放弃条数
+        """
+        async with self._get_lock():
+            batch = self._retry_buffer + self._buffer
+            self._retry_buffer, self._buffer = [], []
+            if not batch:
+                return {"inserted": 0, "retrying": 0, "failed": 0}
+
+            inserted, failed = 0, []
+            for start in range(0, len(batch), self.batch_size):
+                chunk = batch[start:start + self.batch_size]
+                chunk_inserted, chunk_failed = await self._insert_chunk(chunk)
+                inserted += chunk_inserted
+                failed.extend(chunk_failed)
+            await self._complete_claims(batch, failed)
+
+            given_up = 0
+            for record in failed:
+                record["_write_attempts"] = record.get("_write_attempts", 0) + 1
+                if record["_write_attempts"] > self.max_retries:
+                    self.failed_documents.append(record)
+                    given_up += 1
+                else:
+                    self._retry_buffer.append(record)
+
+            result = {"inserted": inserted, "retrying": len(self._retry_buffer), "failed": given_up}
+            if failed:
+                logger.warning(f"批量写入推送历史部分失败: {result}")
+            else:
+                logger.info(f"批量写入推送历史{inserted}条")
+            return result
+
+    async def _complete_claims(self, batch: list, failed: list):
+        """将已写入的记录对应的幂等键标记为完成"""
+        failed_ids = {id(record) for record in failed}
+        keys = [
+            record["idempotency_key"]
+            for record in batch
+            if record.get("idempotency_key") and id(record) not in failed_ids
+        ]
+        try:
+            await push_claim_repository.complete_keys(keys)
+        except Exception as e:
+            # 幂等键保持占用，超时后被接管时推送历史的唯一索引会拒绝重复写入
+            logger.error(f"标记幂等键完成失败: {e}")
+
+    async def _insert_chunk(self, chunk: list) -> tuple:
+        """写入一批记录，返回 (成功条数, 需要重试的记录)"""
+        documents = [
+            {key: value for key, value in record.items() if key != "_write_attempts"}
+            for record in chunk
+        ]
+        try:
+            return await push_history_repository.insert_many(documents), []
+        except BulkWriteError as e:
+            write_errors = e.details.get("writeErrors", [])
+            retry = [
+                chunk[error["index"]]
+                for error in write_errors
+                if error.get("code") != DUPLICATE_KEY_ERROR
+            ]
+            return e.details.get("nInserted", 0), retry
+        except Exception as e:
+            logger.error(f"批量写入推送历史失败: {e}")
+            return 0, chunk
+
+    async def _flush_periodically(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"定时刷新推送历史失败: {e}")
+
+    def start(self):
+        """启动定时刷新，需在事件循环中调用"""
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.ensure_future(self._flush_periodically())
+
+    async def close(self) -> dict:
+        """停止定时刷新并写入剩余记录"""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        result = await self.flush()
+        if self._retry_buffer:
+            logger.error(f"关闭时仍有{len(self._retry_buffer)}条推送历史写入失败")
+            self.failed_documents.extend(self._retry_buffer)
+            self._retry_buffer = []
+        return result
+
+
+# 全局推送历史写缓冲实例
+push_history_writer = PushHistoryWriter()
@@ -0,0 +1,128 @@
+"""大模型响应缓存"""
+import hashlib
+import json
+import logging
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from backend.core.mongodb import get_async_mongodb
+from backend.config.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class LLMResponseCache:
+    """
+    以请求指纹为键的大模型响应缓存
+
+    进程内为按条数淘汰的LRU，可选开启基于MongoDB的共享层，使多个进程共享命中。
+    每种推送类型有各自的过期时间，过期时间为0表示该类型不缓存。
+    """
+
+    def __init__(self):
+        self.enabled = settings.LLM_CACHE_ENABLED
+        self.max_entries = settings.LLM_CACHE_MAX_ENTRIES
+        self.ttls = settings.LLM_CACHE_TTL
+        self.shared = settings.LLM_CACHE_SHARED
+        self._entries = OrderedDict()
+        self.local_hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        # 未命中时实际调用的平均耗时，用于估算命中节省的时间
+        self._llm_calls = 0
+        self._llm_seconds = 0.0
+
+    @staticmethod
+    def make_key(model: str, messages: list, temperature: float, max_tokens: int) -> str:
+        """对请求参数做规范化后计算指纹，消息内容中的空白差异不影响命中"""
+        normalized = {
+            "model": model,
+            "messages": [
+                {"role": message["role"], "content": " ".join(message["content"].split())}
+                for message in messages
+            ],
+            "temperature": float(temperature),
+            "max_tokens": int(max_tokens),
+        }
+        raw = json.dumps(normalized, ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def ttl_for(self, push_type: str) -> int:
+        """推送类型对应的缓存时间（秒），未配置或未启用时为0"""
+        if not self.enabled or not push_type:
+            return 0
+        return self.ttls.get(push_type, 0)
+
+    @property
+    def _collection(self):
+        return get_async_mongodb().get_collection(settings.COLLECTION_LLM_CACHE)
+
+    async def get(self, key: str):
+        """读取缓存，未命中返回None"""
+        entry = self._entries.get(key)
+        if entry is not None:
+            content, expires_at = entry
+            if expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                self.local_hits += 1
+                return content
+            del self._entries[key]
+
+        if self.shared:
+            try:
+                document = await self._collection.find_one(
+                    {"_id": key, "expires_at": {"$gt": datetime.now()}}
+                )
+                if document:
+                    remaining = (document["expires_at"] - datetime.now()).total_seconds()
+                    self._set_local(key, document["content"], remaining)
+                    self.shared_hits += 1
+                    return document["content"]
+            except Exception as e:
+                logger.warning(f"读取共享缓存失败: {e}")
+
+        self.misses += 1
+        return None
+
+    def _set_local(self, key: str, content: str, ttl: float):
+        self._entries[key] = (content, time.monotonic() + ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def set(self, key: str, content: str, ttl: int):
+        """写入缓存"""
+        self._set_local(key, content, ttl)
+        if self.shared:
+            try:
+                await self._collection.update_one(
+                    {"_id": key},
+                    {"$set": {"content": content, "expires_at": datetime.now() + timedelta(seconds=ttl)}},
+                    upsert=True
+                )
+            except Exception as e:
+                logger.warning(f"写入共享缓存失败: {e}")
+
+    def record_call(self, seconds: float):
+        """记录一次实际的大模型调用耗时"""
+        self._llm_calls += 1
+        self._llm_seconds += seconds
+
+    def stats(self) -> dict:
+        """命中统计，以及按平均调用耗时估算的节省时间"""
+        hits = self.local_hits + self.shared_hits
+        lookups = hits + self.misses
+        avg_latency = self._llm_seconds / self._llm_calls if self._llm_calls else 0.0
+        return {
+            "entries": len(self._entries),
+            "local_hits": self.local_hits,
+            "shared_hits": self.shared_hits,
+            "misses": self.misses,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "saved_llm_calls": hits,
+            "saved_seconds": round(hits * avg_latency, 3),
+        }
+
+
+# 全局大模型响应缓存实例
+llm_cache = LLMResponseCache()
@@ -1,10 +1,58 @@
 """阿里云百炼大模型服务"""
+import asyncio
+import importlib.util
+import json
+import random
+import time
 import requests
+import httpx
 import logging
 from backend.config.config import settings
+from backend.services.llm_cache import llm_cache
+from backend.services.rate_governor import rate_governor
+from backend.services.circuit_breaker import llm_circuit_breaker
 
 logger = logging.getLogger(__name__)
 
+# 可重试的HTTP状态码：限流与服务端临时错误
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# 各推送类型的提示词实际用到的档案字段，修改 _build_*_messages 时需同步更新
+PROMPT_PROFILE_FIELDS = {
+    "rest": [
+        "basic_info.nickname", "basic_info.age",
+        "health_info.lifestyle_habits",
+    ],
+    "meal": [
+        "basic_info.nickname", "basic_info.age", "basic_info.gender",
+        "basic_info.height", "basic_info.weight", "basic_info.blood_type",
+        "health_info.lifestyle_habits", "health_info.allergies", "health_info.medical_history",
+        "health_info.adverse_reactions", "health_info.family_history",
+        "other_info.other_notes",
+    ],
+    "weather": [
+        "basic_info.nickname", "basic_info.age", "basic_info.gender",
+        "health_info.lifestyle_habits", "health_info.allergies", "health_info.medical_history",
+        "health_info.family_history",
+        "other_info.other_notes",
+    ],
+    "health_tip": [
+        "basic_info.nickname", "basic_info.age", "basic_info.gender",
+        "basic_info.height", "basic_info.weight", "basic_info.blood_type",
+        "health_info.lifestyle_habits", "health_info.allergies", "health_info.medical_history",
+        "health_info.adverse_reactions", "health_info.family_history", "health_info.surgery_history",
+        "other_info.other_notes",
+    ],
+}
+
+
+class LLMServiceError(Exception):
+    """大模型调用重试后仍失败，调用方不应将其作为推送内容保存"""
+
+
+class LLMUnavailableError(LLMServiceError):
+    """熔断期间拒绝调用，调用方可改用兜底内容"""
+
 
 class LLMService:
     """大模型调用服务"""
@@ -13,6 +61,25 @@ class LLMService:
         self.api_url = settings.DASHSCOPE_URL
         self.api_key = settings.DASHSCOPE_API_KEY
         self.model = settings.DASHSCOPE_MODEL
+        self.timeout = settings.DASHSCOPE_TIMEOUT
+        self.max_retries = settings.DASHSCOPE_MAX_RETRIES
+        self.session = requests.Session()
+        self._async_client: httpx.AsyncClient = None
+        self._inflight = {}
+    
+    def _headers(self) -> dict:
+        return {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        }
+    
+    def _payload(self, messages: list, temperature: float, max_tokens: int) -> dict:
+        return {
+            "model": self.model,
+            "messages": messages,
+            "temperature": temperature,
+            "max_tokens": max_tokens
+        }
     
     def chat(self, messages: list, temperature: float = 2, max_tokens: int = 2000) -> str:
         """
@@ -26,24 +93,12 @@ class LLMService:
         Returns:
             生成的文本内容
         """
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json"
-        }
-        
-        payload = {
-            "model": self.model,
-            "messages": messages,
-            "temperature": temperature,
-            "max_tokens": max_tokens
-        }
-        
         try:
-            response = requests.post(
+            response = self.session.post(
                 f"{self.api_url}/chat/completions",
-                headers=headers,
-                json=payload,
-                timeout=30
+                headers=self._headers(),
+                json=self._payload(messages, temperature, max_tokens),
+                timeout=self.timeout
             )
             response.raise_for_status()
             
@@ -55,9 +110,251 @@ class LLMService:
             logger.error(f"调用大模型失败: {e}")
             return f"抱歉，生成内容时出现错误：{str(e)}"
     
-    def generate_rest_reminder(self, user_profile: dict, persona_prompt: str, time_type: str) -> str:
+    def _get_async_client(self) -> httpx.AsyncClient:
+        """获取复用连接池的异步HTTP客户端，首次调用时创建"""
+        if self._async_client is None or self._async_client.is_closed:
+            pool_size = settings.DASHSCOPE_POOL_SIZE
+            # 仅在安装了h2时启用HTTP/2
+            http2 = settings.DASHSCOPE_HTTP2 and importlib.util.find_spec("h2") is not None
+            self._async_client = httpx.AsyncClient(
+                base_url=self.api_url,
+                headers=self._headers(),
+                timeout=self.timeout,
+                http2=http2,
+                limits=httpx.Limits(
+                    max_connections=pool_size,
+                    max_keepalive_connections=pool_size,
+                    keepalive_expiry=settings.DASHSCOPE_KEEPALIVE_EXPIRY
+                )
+            )
+        return self._async_client
+    
+    def _backoff_delay(self, attempt: int, response: httpx.Response = None) -> float:
+        """计算第attempt次重试的等待时间：优先遵循Retry-After，否则使用带全抖动的指数退避"""
+        if response is not None:
+            retry_after = response.headers.get("Retry-After")
+            if retry_after and retry_after.isdigit():
+                return float(retry_after)
+        cap = min(settings.DASHSCOPE_RETRY_BACKOFF_MAX, settings.DASHSCOPE_RETRY_BACKOFF * (2 ** attempt))
+        return random.uniform(0, cap)
+    
+    @staticmethod
+    async def _admit(estimated_tokens: int):
         """
-        生成作息提醒
+        经过熔断器和限流器放行一次请求
+        
+        Raises:
+            LLMUnavailableError: 熔断期间直接拒绝
+        """
+        if not llm_circuit_breaker.allow():
+            raise LLMUnavailableError("大模型服务暂不可用（已熔断）")
+        try:
+            await rate_governor.acquire(estimated_tokens)
+        except BaseException:
+            # 请求未发出（如等待限流时被取消），归还熔断器的探测名额
+            llm_circuit_breaker.release()
+            raise
+    
+    @staticmethod
+    def _record_outcome(status_code: int = None, cancelled: bool = False):
+        """将请求结果反馈给熔断器"""
+        # 网络错误和5xx计入熔断错误率，429由限流器处理；调用方取消（如推送超时、客户端断开）不代表服务状态
+        if cancelled:
+            llm_circuit_breaker.release()
+        elif status_code is None or status_code >= 500:
+            llm_circuit_breaker.record_failure()
+        elif status_code == 429:
+            llm_circuit_breaker.record_throttled()
+        else:
+            llm_circuit_breaker.record_success()
+    
+    async def _send(self, client: httpx.AsyncClient, payload: dict) -> httpx.Response:
+        """经过熔断器和限流器发送一次请求，并将结果反馈给二者"""
+        estimated_tokens = rate_governor.estimate_tokens(payload)
+        await self._admit(estimated_tokens)
+        started = time.monotonic()
+        response = None
+        cancelled = False
+        try:
+            response = await client.post("/chat/completions", json=payload)
+            return response
+        except asyncio.CancelledError:
+            cancelled = True
+            raise
+        finally:
+            self._record_outcome(response.status_code if response is not None else None, cancelled)
+            used_tokens, retry_after = None, None
+            if response is not None:
+                if response.status_code == 200:
+                    try:
+                        used_tokens = response.json().get("usage", {}).get("total_tokens")
+                    except ValueError:
+                        pass
+                retry_after = response.headers.get("Retry-After")
+                retry_after = float(retry_after) if retry_after and retry_after.isdigit() else None
+            await rate_governor.release(
+                estimated_tokens,
+                time.monotonic() - started,
+                status_code=response.status_code if response is not None else None,
+                used_tokens=used_tokens,
+                retry_after=retry_after
+            )
+    
+    async def _arequest(self, payload: dict) -> str:
+        """发送请求并返回生成内容，对429/5xx及网络错误按退避策略重试，最终失败时抛出异常"""
+        client = self._get_async_client()
+        for attempt in range(self.max_retries + 1):
+            response = None
+            try:
+                response = await self._send(client, payload)
+                if response.status_code not in RETRYABLE_STATUS_CODES or attempt == self.max_retries:
+                    response.raise_for_status()
+                    result = response.json()
+                    return result["choices"][0]["message"]["content"]
+            except httpx.TransportError as e:
+                if attempt == self.max_retries:
+                    raise
+                logger.warning(f"调用大模型网络错误，准备重试: {e}")
+            
+            delay = self._backoff_delay(attempt, response)
+            if response is not None:
+                logger.warning(f"调用大模型返回{response.status_code}，{delay:.2f}秒后第{attempt + 1}次重试")
+            await asyncio.sleep(delay)
+    
+    async def achat(self, messages: list, temperature: float = 2, max_tokens: int = 2000, push_type: str = None) -> str:
+        """
+        异步调用大模型生成回复，复用连接池并对429/5xx等临时错误重试
+        
+        Args:
+            messages: 消息列表，格式 [{"role": "system/user/assistant", "content": "..."}]
+            temperature: 温度参数，控制随机性
+            max_tokens: 最大生成token数
+            push_type: 推送类型，用于选择响应缓存的过期时间；不传则不使用缓存
+            
+        Returns:
+            生成的文本内容
+            
+        Raises:
+            LLMUnavailableError: 熔断期间直接拒绝
+            LLMServiceError: 重试后仍调用失败（如持续限流）
+        """
+        payload = self._payload(messages, temperature, max_tokens)
+        cache_ttl = llm_cache.ttl_for(push_type)
+        cache_key = None
+        
+        inflight = None
+        
+        try:
+            if cache_ttl > 0:
+                cache_key = llm_cache.make_key(self.model, messages, temperature, max_tokens)
+                cached = await llm_cache.get(cache_key)
+                if cached is not None:
+                    return cached
+                
+                # 相同请求正在进行时等待其结果，避免并发未命中重复调用
+                if cache_key in self._inflight:
+                    content = await asyncio.shield(self._inflight[cache_key])
+                    if content is not None:
+                        return content
+                else:
+                    inflight = asyncio.get_running_loop().create_future()
+                    self._inflight[cache_key] = inflight
+            
+            started = time.monotonic()
+            content = await self._arequest(payload)
+            llm_cache.record_call(time.monotonic() - started)
+            
+            # 只缓存成功的响应
+            if cache_key is not None:
+                await llm_cache.set(cache_key, content, cache_ttl)
+            if inflight is not None:
+                inflight.set_result(content)
+            return content
+            
+        except LLMUnavailableError:
+            raise
+        except Exception as e:
+            logger.error(f"调用大模型失败: {e}")
+            raise LLMServiceError(str(e)) from e
+        
+        finally:
+            if inflight is not None:
+                # 失败时等待方各自重新请求
+                if not inflight.done():
+                    inflight.set_result(None)
+                self._inflight.pop(cache_key, None)
+    
+    async def astream(self, messages: list, temperature: float = 2, max_tokens: int = 2000):
+        """
+        以流式方式调用大模型，逐段产出生成的内容
+        
+        内容一旦开始转发便无法重试，因此流式调用不做重试，也不使用响应缓存。
+        
+        Raises:
+            LLMUnavailableError: 熔断期间直接拒绝
+            LLMServiceError: 调用失败
+        """
+        payload = {
+            **self._payload(messages, temperature, max_tokens),
+            "stream": True,
+            "stream_options": {"include_usage": True}
+        }
+        estimated_tokens = rate_governor.estimate_tokens(payload)
+        await self._admit(estimated_tokens)
+        started = time.monotonic()
+        status_code, used_tokens = None, None
+        cancelled = False
+        try:
+            async with self._get_async_client().stream("POST", "/chat/completions", json=payload) as response:
+                status_code = response.status_code
+                if status_code != 200:
+                    await response.aread()
+                    response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[len("data:"):].strip()
+                    if data == "[DONE]":
+                        break
+                    chunk = json.loads(data)
+                    if chunk.get("usage"):
+                        used_tokens = chunk["usage"].get("total_tokens")
+                    for choice in chunk.get("choices", []):
+                        delta = (choice.get("delta") or {}).get("content")
+                        if delta:
+                            yield delta
+        except (asyncio.CancelledError, GeneratorExit):
+            # 客户端断开或调用方提前关闭生成器
+            cancelled = True
+            raise
+        except Exception as e:
+            logger.error(f"流式调用大模型失败: {e}")
+            raise LLMServiceError(str(e)) from e
+        finally:
+            self._record_outcome(status_code, cancelled)
+            await rate_governor.release(
+                estimated_tokens,
+                time.monotonic() - started,
+                status_code=status_code,
+                used_tokens=used_tokens
+            )
+    
+    async def warm_up(self):
+        """预先建立到大模型服务的连接，响应内容和状态码无关紧要"""
+        if not self.api_url:
+            return
+        await self._get_async_client().get("/models")
+    
+    async def aclose(self):
+        """关闭异步HTTP客户端连接池"""
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
+        self.session.close()
+    
+    def _build_rest_reminder_messages(self, user_profile: dict, persona_prompt: str, time_type: str) -> list:
+        """
+        构建作息提醒消息
         
         Args:
             user_profile: 用户健康档案
@@ -86,11 +383,11 @@ class LLMService:
 """}
         ]
         
-        return self.chat(messages, temperature=0.8, max_tokens=200)
+        return messages
     
-    def generate_meal_reminder(self, user_profile: dict, persona_prompt: str, meal_type: str) -> str:
+    def _build_meal_reminder_messages(self, user_profile: dict, persona_prompt: str, meal_type: str) -> list:
         """
-        生成饮食提醒
+        构建饮食提醒消息
         
         Args:
             user_profile: 用户健康档案
@@ -145,11 +442,11 @@ class LLMService:
 """}
         ]
         
-        return self.chat(messages, temperature=0.7, max_tokens=300)
+        return messages
     
-    def generate_weather_reminder(self, user_profile: dict, persona_prompt: str, weather_info: dict) -> str:
+    def _build_weather_reminder_messages(self, user_profile: dict, persona_prompt: str, weather_info: dict) -> list:
         """
-        生成天气推送
+        构建天气推送消息
         
         Args:
             user_profile: 用户健康档案
@@ -186,11 +483,11 @@ class LLMService:
 """}
         ]
         
-        return self.chat(messages, temperature=0.7, max_tokens=200)
+        return messages
     
-    def generate_health_tip(self, user_profile: dict, persona_prompt: str) -> str:
+    def _build_health_tip_messages(self, user_profile: dict, persona_prompt: str) -> list:
         """
-        生成养生妙招
+        构建养生妙招消息
         
         Args:
             user_profile: 用户健康档案
@@ -230,7 +527,94 @@ class LLMService:
 """}
         ]
         
+        return messages
+
+    def generate_rest_reminder(self, user_profile: dict, persona_prompt: str, time_type: str) -> str:
+        """
+        生成作息提醒
+        
+        Args:
+            user_profile: 用户健康档案
+            persona_prompt: 人物风格提示词
+            time_type: 时间类型：morning/noon/night
+        """
+        messages = self._build_rest_reminder_messages(user_profile, persona_prompt, time_type)
+        return self.chat(messages, temperature=0.8, max_tokens=200)
+    
+    async def agenerate_rest_reminder(self, user_profile: dict, persona_prompt: str, time_type: str) -> str:
+        """异步生成作息提醒"""
+        messages = self._build_rest_reminder_messages(user_profile, persona_prompt, time_type)
+        return await self.achat(messages, temperature=0.8, max_tokens=200, push_type="rest")
+    
+    def generate_meal_reminder(self, user_profile: dict, persona_prompt: str, meal_type: str) -> str:
+        """
+        生成饮食提醒
+        
+        Args:
+            user_profile: 用户健康档案
+            persona_prompt: 人物风格提示词
+            meal_type: 餐次类型：breakfast/lunch/dinner
+        """
+        messages = self._build_meal_reminder_messages(user_profile, persona_prompt, meal_type)
+        return self.chat(messages, temperature=0.7, max_tokens=300)
+    
+    async def agenerate_meal_reminder(self, user_profile: dict, persona_prompt: str, meal_type: str) -> str:
+        """异步生成饮食提醒"""
+        messages = self._build_meal_reminder_messages(user_profile, persona_prompt, meal_type)
+        return await self.achat(messages, temperature=0.7, max_tokens=300, push_type="meal")
+    
+    def generate_weather_reminder(self, user_profile: dict, persona_prompt: str, weather_info: dict) -> str:
+        """
+        生成天气推送
+        
+        Args:
+            user_profile: 用户健康档案
+            persona_prompt: 人物风格提示词
+            weather_info: 天气信息
+        """
+        messages = self._build_weather_reminder_messages(user_profile, persona_prompt, weather_info)
+        return self.chat(messages, temperature=0.7, max_tokens=200)
+    
+    async def agenerate_weather_reminder(self, user_profile: dict, persona_prompt: str, weather_info: dict) -> str:
+        """异步生成天气推送"""
+        messages = self._build_weather_reminder_messages(user_profile, persona_prompt, weather_info)
+        return await self.achat(messages, temperature=0.7, max_tokens=200, push_type="weather")
+    
+    def generate_health_tip(self, user_profile: dict, persona_prompt: str) -> str:
+        """
+        生成养生妙招
+        
+        Args:
+            user_profile: 用户健康档案
+            persona_prompt: 人物风格提示词
+        """
+        messages = self._build_health_tip_messages(user_profile, persona_prompt)
         return self.chat(messages, temperature=0.8, max_tokens=300)
+    
+    async def agenerate_health_tip(self, user_profile: dict, persona_prompt: str) -> str:
+        """异步生成养生妙招"""
+        messages = self._build_health_tip_messages(user_profile, persona_prompt)
+        return await self.achat(messages, temperature=0.8, max_tokens=300, push_type="health_tip")
+    
+    def astream_push(self, push_type: str, user_profile: dict, persona_prompt: str, **params):
+        """
+        流式生成推送内容，提示词和生成参数与对应的 agenerate_* 一致
+        
+        Args:
+            push_type: 推送类型 rest/meal/weather/health_tip
+            params: time_type、meal_type 或 weather_info
+        """
+        if push_type == "rest":
+            messages = self._build_rest_reminder_messages(user_profile, persona_prompt, params["time_type"])
+            return self.astream(messages, temperature=0.8, max_tokens=200)
+        if push_type == "meal":
+            messages = self._build_meal_reminder_messages(user_profile, persona_prompt, params["meal_type"])
+            return self.astream(messages, temperature=0.7, max_tokens=300)
+        if push_type == "weather":
+            messages = self._build_weather_reminder_messages(user_profile, persona_prompt, params["weather_info"])
+            return self.astream(messages, temperature=0.7, max_tokens=200)
+        messages = self._build_health_tip_messages(user_profile, persona_prompt)
+        return self.astream(messages, temperature=0.8, max_tokens=300)
 
 
 # 全局LLM服务实例
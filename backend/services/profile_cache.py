@@ -0,0 +1,100 @@
+"""健康档案读缓存"""
+import copy
+import logging
+import time
+from collections import OrderedDict
+from backend.repositories.profile_repository import profile_repository
+from backend.config.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def profile_etag(profile: dict) -> str:
+    """由档案文档ID和版本号生成ETag，删除后重建的档案文档ID不同，不会与旧档案混淆"""
+    return f'"{profile["_id"]}-{profile.get("version", 0)}"'
+
+
+class ProfileCache:
+    """
+    健康档案的读穿透缓存
+
+    进程内为带过期时间、按条数淘汰的LRU。档案每次修改版本号加一，修改和删除档案的接口调用 invalidate
+    使本进程的缓存失效；多实例部署时开启 shared，命中本地缓存后只按 user_id 查询版本号校验，
+    其他实例修改过的档案会重新读取。距上次校验不足 verify_interval 秒的命中不再查询，
+    其他实例的修改最多延迟这么久可见。
+    """
+
+    def __init__(self):
+        self.enabled = settings.PROFILE_CACHE_ENABLED
+        self.max_entries = settings.PROFILE_CACHE_MAX_ENTRIES
+        self.ttl = settings.PROFILE_CACHE_TTL
+        self.shared = settings.PROFILE_CACHE_SHARED
+        self.verify_interval = settings.PROFILE_CACHE_VERIFY_INTERVAL
+        self._entries = OrderedDict()
+        # 每次失效加一，读取数据库期间发生过失效时不缓存读到的档案，避免旧档案覆盖失效
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+
+    async def _is_current(self, user_id: str, entry: list, now: float) -> bool:
+        profile, _, verified_at = entry
+        if not self.shared or now - verified_at < self.verify_interval:
+            return True
+        try:
+            current = await profile_repository.get(user_id, {"_id": 0, "version": 1})
+        except Exception as e:
+            logger.warning(f"校验档案版本失败: {e}")
+            return False
+        if current is None or current.get("version", 0) != profile.get("version", 0):
+            return False
+        entry[2] = now
+        return True
+
+    async def get(self, user_id: str) -> dict:
+        """获取档案，未命中时从数据库读取并缓存，档案不存在时返回None；返回深拷贝，可直接修改"""
+        if not self.enabled:
+            return await profile_repository.get(user_id)
+
+        entry = self._entries.get(user_id)
+        if entry is not None:
+            now = time.monotonic()
+            if entry[1] > now and await self._is_current(user_id, entry, now):
+                self._entries.move_to_end(user_id)
+                self.hits += 1
+                return copy.deepcopy(entry[0])
+            self._entries.pop(user_id, None)
+            self.stale += 1
+
+        self.misses += 1
+        generation = self._generation
+        profile = await profile_repository.get(user_id)
+        if profile is None:
+            return None
+        if generation == self._generation:
+            now = time.monotonic()
+            # [档案, 过期时间, 上次校验版本号的时间]
+            self._entries[user_id] = [profile, now + self.ttl, now]
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return copy.deepcopy(profile)
+
+    def invalidate(self, user_id: str):
+        """档案修改或删除后使缓存失效"""
+        self._generation += 1
+        self._entries.pop(user_id, None)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "stale": self.stale,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+# 全局健康档案缓存实例
+profile_cache = ProfileCache()
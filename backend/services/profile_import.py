@@ -0,0 +1,245 @@
+"""健康档案批量导入
+
+逐行读取 NDJSON 或 CSV，按 HealthProfileCreate 校验后分批以无序 bulk_write 写入，内存占用只与批量大小有关。
+
+NDJSON 每行一个与 POST /api/health-profile 请求体相同的对象。CSV 首行为列名，列名以“.”表示嵌套字段，
+如 user_id, basic_info.nickname, health_info.allergies；列表字段以“;”分隔多项，以 [ 或 { 开头的值按JSON解析。
+
+用法:
+    python -m backend.services.profile_import profiles.ndjson
+    python -m backend.services.profile_import profiles.csv --insert-only
+"""
+import argparse
+import asyncio
+import codecs
+import csv
+import json
+import logging
+from pathlib import Path
+from typing import get_origin
+from pydantic import ValidationError
+from backend.config.config import settings
+from backend.core.mongodb import async_mongodb
+from backend.models.health_profile import HealthProfileCreate, HealthInfo, OtherInfo
+from backend.repositories.profile_repository import profile_repository
+from backend.scheduler.schedule import schedule_fields
+from backend.services.profile_cache import profile_cache
+
+logger = logging.getLogger(__name__)
+
+IMPORT_FORMATS = ("ndjson", "csv")
+
+# CSV 中以“;”分隔的列表字段
+LIST_FIELDS = {
+    name
+    for model in (HealthInfo, OtherInfo)
+    for name, field in model.model_fields.items()
+    if get_origin(field.annotation) is list
+}
+
+
+async def iter_lines(chunks):
+    """将字节块流按行切分，UTF-8 多字节字符可跨块，文件开头的BOM会被去掉"""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line.rstrip("\r")
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending.rstrip("\r")
+
+
+async def iter_ndjson(lines):
+    """
+    解析 NDJSON
+
+    Yields:
+        (行号, 行数据, 错误信息)，解析失败时行数据为None
+    """
+    line_number = 0
+    async for line in lines:
+        line_number += 1
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield line_number, None, f"JSON格式错误: {e}"
+            continue
+        if not isinstance(row, dict):
+            yield line_number, None, "每行必须是一个JSON对象"
+            continue
+        yield line_number, row, None
+
+
+def _csv_row_to_profile(row: dict) -> dict:
+    """将列名带“.”的CSV行转为嵌套的档案结构，空值视为未填写"""
+    profile = {"health_info": {}, "other_info": {}}
+    for column, value in row.items():
+        value = (value or "").strip()
+        if not value:
+            continue
+        section, _, field = column.strip().partition(".")
+        if not field:
+            profile[section] = value
+            continue
+        if value[0] in "[{":
+            value = json.loads(value)
+        elif field in LIST_FIELDS:
+            value = [item.strip() for item in value.split(";") if item.strip()]
+        profile.setdefault(section, {})[field] = value
+    return profile
+
+
+async def iter_csv(lines):
+    """
+    解析 CSV，引号内的换行会与下一行合并为同一条记录
+
+    Yields:
+        (行号, 行数据, 错误信息)，行号为记录首行所在行，解析失败时行数据为None
+    """
+    header = None
+    record, record_line = "", 0
+    line_number = 0
+    async for line in lines:
+        line_number += 1
+        if not record:
+            record_line = line_number
+            record = line
+        else:
+            record += "\n" + line
+        # 引号未闭合，记录还没有结束
+        if record.count('"') % 2:
+            continue
+        text, record = record, ""
+        if not text.strip():
+            continue
+        values = next(csv.reader([text]))
+        if header is None:
+            header = values
+            continue
+        try:
+            yield record_line, _csv_row_to_profile(dict(zip(header, values))), None
+        except ValueError as e:
+            yield record_line, None, f"JSON格式错误: {e}"
+    if record:
+        yield record_line, None, "引号未闭合"
+
+
+def _validation_messages(error: ValidationError) -> list:
+    return [f"{'.'.join(str(part) for part in item['loc'])}: {item['msg']}" for item in error.errors()]
+
+
+class ProfileImporter:
+    """
+    健康档案批量导入
+
+    每批档案以一次无序 bulk_write 写入，同一批中 user_id 重复时先写入当前批次；
+    overwrite 为True时更新已存在的档案，否则跳过。写入后使这些用户的档案缓存失效。
+    """
+
+    def __init__(self):
+        self.batch_size = settings.PROFILE_IMPORT_BATCH_SIZE
+        self.max_errors = settings.PROFILE_IMPORT_MAX_ERRORS
+
+    def _add_error(self, report: dict, line: int, user_id: str, errors: list):
+        report["failed"] += 1
+        if len(report["errors"]) < self.max_errors:
+            report["errors"].append({"line": line, "user_id": user_id, "errors": errors})
+        else:
+            report["errors_truncated"] = True
+
+    async def _write(self, batch: list, overwrite: bool, report: dict):
+        result = await profile_repository.upsert_many([profile for _, profile in batch], overwrite)
+        for _, profile in batch:
+            profile_cache.invalidate(profile["user_id"])
+        report["inserted"] += len(result["inserted"])
+        report["updated" if overwrite else "skipped"] += result["matched"]
+        for index, message in result["errors"].items():
+            line, profile = batch[index]
+            self._add_error(report, line, profile["user_id"], [message])
+
+    async def run(self, rows, overwrite: bool = True) -> dict:
+        """
+        导入档案
+
+        Args:
+            rows: iter_ndjson 或 iter_csv 产生的 (行号, 行数据, 错误信息)
+            overwrite: user_id 已存在时是否更新档案
+
+        Returns:
+            导入报告：total 总行数，inserted 新建，updated 更新，skipped 已存在而跳过，failed 失败，
+            errors 失败行的行号、user_id 和原因（最多 max_errors 条）
+        """
+        report = {
+            "total": 0, "inserted": 0, "updated": 0, "skipped": 0, "failed": 0,
+            "errors": [], "errors_truncated": False,
+        }
+        batch, batch_users = [], set()
+        async for line, row, error in rows:
+            report["total"] += 1
+            user_id = row.get("user_id") if row else None
+            if error:
+                self._add_error(report, line, user_id, [error])
+                continue
+            try:
+                profile = HealthProfileCreate(**row)
+            except ValidationError as e:
+                self._add_error(report, line, user_id, _validation_messages(e))
+                continue
+
+            if profile.user_id in batch_users or len(batch) >= self.batch_size:
+                await self._write(batch, overwrite, report)
+                batch, batch_users = [], set()
+            # 推送时间表只在新建档案时写入，已存在的档案保留原时间表
+            batch.append((line, {**profile.dict(), **schedule_fields(profile.user_id)}))
+            batch_users.add(profile.user_id)
+
+        if batch:
+            await self._write(batch, overwrite, report)
+        logger.info(
+            f"导入健康档案：共{report['total']}行，新建{report['inserted']}，更新{report['updated']}，"
+            f"跳过{report['skipped']}，失败{report['failed']}"
+        )
+        return report
+
+
+# 全局健康档案导入实例
+profile_importer = ProfileImporter()
+
+
+def parse_rows(import_format: str, chunks):
+    """按格式将字节块流解析为导入行"""
+    lines = iter_lines(chunks)
+    return iter_csv(lines) if import_format == "csv" else iter_ndjson(lines)
+
+
+async def _read_file(path: Path, chunk_size: int = 1 << 16):
+    with open(path, "rb") as f:
+        while chunk := f.read(chunk_size):
+            yield chunk
+
+
+async def _main(args) -> int:
+    path = Path(args.path)
+    import_format = args.format or ("csv" if path.suffix.lower() == ".csv" else "ndjson")
+    try:
+        report = await profile_importer.run(parse_rows(import_format, _read_file(path)), not args.insert_only)
+    finally:
+        async_mongodb.close()
+    for error in report["errors"]:
+        print(f"第{error['line']}行 {error['user_id'] or ''}: {'; '.join(error['errors'])}")
+    print(json.dumps({key: value for key, value in report.items() if key != "errors"}, ensure_ascii=False))
+    return 1 if report["failed"] else 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="批量导入健康档案")
+    parser.add_argument("path", help="NDJSON 或 CSV 文件")
+    parser.add_argument("--format", choices=IMPORT_FORMATS, help="文件格式，默认按扩展名判断")
+    parser.add_argument("--insert-only", action="store_true", help="只新建档案，已存在的用户跳过")
+    raise SystemExit(asyncio.run(_main(parser.parse_args())))
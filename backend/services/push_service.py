@@ -1,30 +1,58 @@
 """健康推送服务"""
 import logging
 from datetime import datetime
-from backend.core.mongodb import get_mongodb
+from pymongo.errors import BulkWriteError
 from backend.config.config import settings
-from backend.services.llm_service import llm_service
+from backend.services.llm_service import llm_service, LLMServiceError, LLMUnavailableError
+from backend.services.fallback_content import fallback_library
+from backend.services.history_writer import push_history_writer, DUPLICATE_KEY_ERROR
+from backend.services.profile_cache import profile_cache
+from backend.services.retention import push_retention
+from backend.repositories.push_repository import (
+    push_history_repository, push_archive_repository, push_staging_repository, push_claim_repository,
+    push_unread_repository, encode_history_cursor, decode_history_cursor
+)
 from backend.utils.weather_crawler import weather_crawler
 from backend.utils.persona_styles import get_persona_prompt
 
 logger = logging.getLogger(__name__)
 
+PUSH_TYPE_NAMES = {
+    "rest": "作息提醒",
+    "meal": "饮食提醒",
+    "weather": "天气提醒",
+    "health_tip": "养生妙招",
+}
+
+
+def make_idempotency_key(user_id: str, push_type: str, slot: str) -> str:
+    """定时推送的幂等键：同一用户、同一推送类型、同一时段只推送一次"""
+    return f"{user_id}:{push_type}:{slot}"
+
 
 class PushService:
     """健康推送服务类"""
     
-    def __init__(self):
-        self.db = get_mongodb()
-    
-    def _get_user_profile(self, user_id: str) -> dict:
+    async def _get_user_profile(self, user_id: str) -> dict:
         """获取用户健康档案"""
-        collection = self.db.get_collection(settings.COLLECTION_HEALTH_PROFILE)
-        profile = collection.find_one({"user_id": user_id})
+        profile = await profile_cache.get(user_id)
         return profile if profile else {}
     
-    def _save_push_history(self, user_id: str, push_type: str, content: str):
-        """保存推送历史"""
-        collection = self.db.get_collection(settings.COLLECTION_PUSH_HISTORY)
+    async def _save_push_history(
+        self,
+        user_id: str,
+        push_type: str,
+        content: str,
+        buffered: bool = False,
+        idempotency_key: str = None
+    ):
+        """
+        保存推送历史
+        
+        Args:
+            buffered: 为True时写入批量缓冲，由写缓冲统一批量落库；手动推送直接写入以便立即可查
+            idempotency_key: 定时推送的幂等键，推送历史对其有唯一索引
+        """
         push_record = {
             "user_id": user_id,
             "push_type": push_type,
@@ -32,20 +60,98 @@ class PushService:
             "push_time": datetime.now(),
             "is_read": False
         }
-        collection.insert_one(push_record)
-        logger.info(f"保存推送历史：用户{user_id}，类型{push_type}")
+        if idempotency_key:
+            push_record["idempotency_key"] = idempotency_key
+        if buffered:
+            await push_history_writer.add(push_record)
+        else:
+            await push_history_repository.insert(push_record)
+        logger.debug(f"保存推送历史：用户{user_id}，类型{push_type}")
+    
+    async def _llm_content(self, push_type: str, profile: dict, generation, **params) -> str:
+        """等待大模型生成内容；熔断期间改用该用户人物风格的兜底内容"""
+        try:
+            return await generation
+        except LLMUnavailableError:
+            return fallback_library.render(profile.get("persona_style"), push_type, **params)
+    
+    async def _generate_rest_reminder(self, profile: dict, persona_prompt: str, time_type: str) -> dict:
+        content = await self._llm_content(
+            "rest", profile,
+            llm_service.agenerate_rest_reminder(profile, persona_prompt, time_type),
+            time_type=time_type
+        )
+        return {"content": content}
+    
+    async def _generate_meal_reminder(self, profile: dict, persona_prompt: str, meal_type: str) -> dict:
+        content = await self._llm_content(
+            "meal", profile,
+            llm_service.agenerate_meal_reminder(profile, persona_prompt, meal_type),
+            meal_type=meal_type
+        )
+        return {"content": content}
+    
+    async def _generate_weather_reminder(self, profile: dict, persona_prompt: str, weather_info: dict = None) -> dict:
+        # 获取用户所在地区
+        location = profile.get("location")
+        if not location:
+            return {"error": "用户未设置所在地区"}
+        
+        if weather_info is None:
+            province = location.get("province", "浙江")
+            city = location.get("city", "杭州")
+            
+            # 爬取天气信息
+            weather_info = await weather_crawler.acrawl_weather(province, city)
+        
+        # 检查是否爬取失败
+        if "error" in weather_info:
+            return {"error": weather_info["error"]}
+        
+        # 生成推送内容
+        content = await self._llm_content(
+            "weather", profile,
+            llm_service.agenerate_weather_reminder(profile, persona_prompt, weather_info)
+        )
+        
+        # 合并天气信息和建议
+        return {"content": self._weather_header(weather_info) + content, "weather_info": weather_info}
+    
+    @staticmethod
+    def _weather_header(weather_info: dict) -> str:
+        """天气推送正文前的今日天气摘要"""
+        return f"【今日天气】\n{weather_info['city']} {weather_info['weather']} {weather_info['temperature']}\n{weather_info['wind']}\n\n"
+    
+    async def _generate_health_tip(self, profile: dict, persona_prompt: str) -> dict:
+        content = await self._llm_content(
+            "health_tip", profile,
+            llm_service.agenerate_health_tip(profile, persona_prompt)
+        )
+        return {"content": content}
     
-    def push_rest_reminder(self, user_id: str, time_type: str) -> dict:
+    async def generate_push(self, push_type: str, user_id: str, profile: dict = None, **params) -> dict:
         """
-        推送作息提醒
+        生成推送内容（不保存推送历史）
         
         Args:
+            push_type: 推送类型 rest/meal/weather/health_tip
             user_id: 用户ID
-            time_type: 时间类型 morning/noon/night
+            profile: 已读取的用户档案，定时任务批量读取后传入；不传则按user_id查询
+            params: 对应推送类型的参数，如 time_type、meal_type、weather_info
+            
+        Returns:
+            成功时包含 status=success 和 content，失败时包含 status=error 和 message
         """
+        generators = {
+            "rest": self._generate_rest_reminder,
+            "meal": self._generate_meal_reminder,
+            "weather": self._generate_weather_reminder,
+            "health_tip": self._generate_health_tip,
+        }
         try:
             # 获取用户档案
-            profile = self._get_user_profile(user_id)
+            if profile is None:
+                profile = await self._get_user_profile(user_id)
             if not profile:
                 return {"status": "error", "message": "用户档案不存在"}
             
@@ -53,164 +159,344 @@ class PushService:
             persona_style = profile.get("persona_style", "专业顾问")
             persona_prompt = get_persona_prompt(persona_style)
             
-            # 生成提醒内容
-            content = llm_service.generate_rest_reminder(profile, persona_prompt, time_type)
-            
-            # 保存推送历史
-            self._save_push_history(user_id, "rest", content)
-            
-            return {
-                "status": "success",
-                "content": content,
-                "push_time": datetime.now().isoformat()
-            }
+            result = await generators[push_type](profile, persona_prompt, **params)
+            if "error" in result:
+                return {"status": "error", "message": result["error"]}
+            return {"status": "success", **result}
             
         except Exception as e:
-            logger.error(f"推送作息提醒失败: {e}")
+            logger.error(f"生成{PUSH_TYPE_NAMES.get(push_type, push_type)}失败: {e}")
             return {"status": "error", "message": str(e)}
     
-    def push_meal_reminder(self, user_id: str, meal_type: str) -> dict:
+    async def push(
+        self,
+        push_type: str,
+        user_id: str,
+        profile: dict = None,
+        *,
+        buffered: bool = False,
+        slot: str = None,
+        **params
+    ) -> dict:
         """
-        推送饮食提醒
+        生成推送内容并保存推送历史
         
         Args:
-            user_id: 用户ID
-            meal_type: 餐次类型 breakfast/lunch/dinner
+            buffered: 是否通过批量写缓冲保存推送历史，定时任务使用
+            slot: 定时推送时段；传入时先占用幂等键，同一时段重复运行不会再次调用大模型
         """
+        idempotency_key = None
+        if slot:
+            idempotency_key = make_idempotency_key(user_id, push_type, slot)
+            claimed = await push_claim_repository.claim(
+                idempotency_key, user_id, push_type, slot, settings.IDEMPOTENCY_CLAIM_TIMEOUT
+            )
+            if not claimed:
+                return {"status": "skipped", "message": "该时段已推送"}
+        
+        result = await self.generate_push(push_type, user_id, profile, **params)
+        if result["status"] != "success":
+            if idempotency_key:
+                await push_claim_repository.release(idempotency_key)
+            return result
+        
         try:
-            profile = self._get_user_profile(user_id)
-            if not profile:
-                return {"status": "error", "message": "用户档案不存在"}
-            
-            persona_style = profile.get("persona_style", "专业顾问")
-            persona_prompt = get_persona_prompt(persona_style)
-            
-            content = llm_service.generate_meal_reminder(profile, persona_prompt, meal_type)
-            self._save_push_history(user_id, "meal", content)
-            
-            return {
-                "status": "success",
-                "content": content,
-                "push_time": datetime.now().isoformat()
-            }
-            
+            await self._save_push_history(
+                user_id, push_type, result["content"],
+                buffered=buffered, idempotency_key=idempotency_key
+            )
+            # 批量缓冲的记录由写缓冲在写入成功后标记幂等键完成
+            if idempotency_key and not buffered:
+                await push_claim_repository.complete(idempotency_key)
         except Exception as e:
-            logger.error(f"推送饮食提醒失败: {e}")
+            logger.error(f"推送{PUSH_TYPE_NAMES.get(push_type, push_type)}失败: {e}")
             return {"status": "error", "message": str(e)}
+        
+        result["push_time"] = datetime.now().isoformat()
+        return result
     
-    def push_weather_reminder(self, user_id: str) -> dict:
-        """推送天气提醒"""
-        try:
-            profile = self._get_user_profile(user_id)
-            if not profile:
-                return {"status": "error", "message": "用户档案不存在"}
-            
-            # 获取用户所在地区
+    async def push_rest_reminder(self, user_id: str, time_type: str) -> dict:
+        """
+        推送作息提醒
+        
+        Args:
+            user_id: 用户ID
+            time_type: 时间类型 morning/noon/night
+        """
+        return await self.push("rest", user_id, time_type=time_type)
+    
+    async def push_meal_reminder(self, user_id: str, meal_type: str) -> dict:
+        """
+        推送饮食提醒
+        
+        Args:
+            user_id: 用户ID
+            meal_type: 餐次类型 breakfast/lunch/dinner
+        """
+        return await self.push("meal", user_id, meal_type=meal_type)
+    
+    async def push_weather_reminder(self, user_id: str, weather_info: dict = None) -> dict:
+        """
+        推送天气提醒
+        
+        Args:
+            user_id: 用户ID
+            weather_info: 已爬取的天气信息，定时任务按城市批量爬取后传入；不传则实时爬取
+        """
+        return await self.push("weather", user_id, weather_info=weather_info)
+    
+    async def push_health_tip(self, user_id: str) -> dict:
+        """推送养生妙招"""
+        return await self.push("health_tip", user_id)
+    
+    async def stream_push(self, push_type: str, user_id: str, **params):
+        """
+        流式生成推送内容，生成结束后保存推送历史
+        
+        逐个产出 (事件, 数据)：delta 为一段新生成的内容；done 为完整结果；error 为失败原因，之后不再产出。
+        熔断期间以兜底内容作为唯一一段 delta。
+        
+        Args:
+            push_type: 推送类型 rest/meal/weather/health_tip
+            user_id: 用户ID
+            params: time_type 或 meal_type
+        """
+        profile = await self._get_user_profile(user_id)
+        if not profile:
+            yield "error", {"status": "error", "message": "用户档案不存在"}
+            return
+        persona_prompt = get_persona_prompt(profile.get("persona_style", "专业顾问"))
+        
+        parts = []
+        if push_type == "weather":
             location = profile.get("location")
             if not location:
-                return {"status": "error", "message": "用户未设置所在地区"}
-            
-            province = location.get("province", "浙江")
-            city = location.get("city", "杭州")
-            
-            # 爬取天气信息
-            weather_info = weather_crawler.crawl_weather(province, city)
-            
-            # 检查是否爬取失败
+                yield "error", {"status": "error", "message": "用户未设置所在地区"}
+                return
+            weather_info = await weather_crawler.acrawl_weather(
+                location.get("province", "浙江"), location.get("city", "杭州")
+            )
             if "error" in weather_info:
-                return {"status": "error", "message": weather_info["error"]}
-            
-            # 获取人物风格
-            persona_style = profile.get("persona_style", "专业顾问")
-            persona_prompt = get_persona_prompt(persona_style)
-            
-            # 生成推送内容
-            content = llm_service.generate_weather_reminder(profile, persona_prompt, weather_info)
-            
-            # 合并天气信息和建议
-            full_content = f"【今日天气】\n{weather_info['city']} {weather_info['weather']} {weather_info['temperature']}\n{weather_info['wind']}\n\n{content}"
-            
-            self._save_push_history(user_id, "weather", full_content)
-            
-            return {
-                "status": "success",
-                "content": full_content,
-                "weather_info": weather_info,
-                "push_time": datetime.now().isoformat()
-            }
-            
+                yield "error", {"status": "error", "message": weather_info["error"]}
+                return
+            params["weather_info"] = weather_info
+            parts.append(self._weather_header(weather_info))
+            yield "delta", parts[0]
+        
+        try:
+            async for delta in llm_service.astream_push(push_type, profile, persona_prompt, **params):
+                parts.append(delta)
+                yield "delta", delta
+        except LLMUnavailableError:
+            content = fallback_library.render(profile.get("persona_style"), push_type, **params)
+            parts.append(content)
+            yield "delta", content
+        except LLMServiceError as e:
+            yield "error", {"status": "error", "message": str(e)}
+            return
+        
+        content = "".join(parts)
+        try:
+            await self._save_push_history(user_id, push_type, content)
         except Exception as e:
-            logger.error(f"推送天气提醒失败: {e}")
-            return {"status": "error", "message": str(e)}
+            logger.error(f"推送{PUSH_TYPE_NAMES.get(push_type, push_type)}失败: {e}")
+            yield "error", {"status": "error", "message": str(e)}
+            return
+        yield "done", {"status": "success", "content": content, "push_time": datetime.now().isoformat()}
     
-    def push_health_tip(self, user_id: str) -> dict:
-        """推送养生妙招"""
-        try:
-            profile = self._get_user_profile(user_id)
-            if not profile:
-                return {"status": "error", "message": "用户档案不存在"}
-            
-            persona_style = profile.get("persona_style", "专业顾问")
-            persona_prompt = get_persona_prompt(persona_style)
-            
-            content = llm_service.generate_health_tip(profile, persona_prompt)
-            self._save_push_history(user_id, "health_tip", content)
-            
-            return {
-                "status": "success",
-                "content": content,
-                "push_time": datetime.now().isoformat()
-            }
+    async def stage_push(self, push_type: str, slot: str, user_id: str, profile: dict = None, **params) -> dict:
+        """
+        提前生成推送内容并写入暂存集合，等到推送时间再投递
+        
+        Args:
+            push_type: 推送类型
+            slot: 推送时段，如 2025-01-01T07:00
+            user_id: 用户ID
+            profile: 已读取的用户档案
+            params: 对应推送类型的参数
+        """
+        # 预生成使用单独的幂等键，重复运行的预生成任务不会重复调用大模型
+        claim_key = f"{make_idempotency_key(user_id, push_type, slot)}:staged"
+        claimed = await push_claim_repository.claim(
+            claim_key, user_id, push_type, slot, settings.IDEMPOTENCY_CLAIM_TIMEOUT
+        )
+        if not claimed:
+            return {"status": "skipped", "message": "该时段已预生成"}
+        
+        result = await self.generate_push(push_type, user_id, profile, **params)
+        if result["status"] != "success":
+            await push_claim_repository.release(claim_key)
+            return result
+        
+        await push_staging_repository.stage(user_id, push_type, slot, result["content"])
+        await push_claim_repository.complete(claim_key)
+        return {"status": "success"}
+    
+    async def deliver_staged(self, push_type: str, slot: str) -> set:
+        """
+        将指定时段已暂存的推送批量写入推送历史
+        
+        Args:
+            push_type: 推送类型
+            slot: 推送时段
             
-        except Exception as e:
-            logger.error(f"推送养生妙招失败: {e}")
-            return {"status": "error", "message": str(e)}
+        Returns:
+            已投递的用户ID集合
+        """
+        delivered = set()
+        
+        async for batch in push_staging_repository.iter_batches(push_type, slot, settings.PREGENERATE_BATCH_SIZE):
+            push_time = datetime.now()
+            records = [
+                {
+                    "user_id": staged["user_id"],
+                    "push_type": push_type,
+                    "content": staged["content"],
+                    "push_time": push_time,
+                    "is_read": False,
+                    "idempotency_key": make_idempotency_key(staged["user_id"], push_type, slot)
+                }
+                for staged in batch
+            ]
+            try:
+                await push_history_repository.insert_many(records)
+            except BulkWriteError as e:
+                # 重复键说明该时段已投递过（如重复运行），其余错误继续抛出
+                if any(error.get("code") != DUPLICATE_KEY_ERROR for error in e.details.get("writeErrors", [])):
+                    raise
+            await push_claim_repository.complete_many([
+                {"_id": record["idempotency_key"], "user_id": record["user_id"], "push_type": push_type, "slot": slot}
+                for record in records
+            ])
+            await push_staging_repository.delete_many([staged["_id"] for staged in batch])
+            delivered.update(staged["user_id"] for staged in batch)
+        
+        logger.info(f"投递暂存推送：类型{push_type}，时段{slot}，共{len(delivered)}条")
+        return delivered
+    
+    @staticmethod
+    def _history_key(record: dict) -> tuple:
+        return record["push_time"], record["_id"]
+    
+    def _merge_history(self, history: list, archived: list, limit: int, reverse: bool) -> list:
+        """
+        合并热数据与归档记录
+        
+        归档时先写入归档再删除热数据，中断或并发执行时同一条记录可能同时存在于两处，按 _id 去重并保留热数据中的记录。
+        """
+        hot_ids = {record["_id"] for record in history}
+        merged = history + [record for record in archived if record["_id"] not in hot_ids]
+        return sorted(merged, key=self._history_key, reverse=reverse)[:limit]
+    
+    async def _find_history_page(self, user_id: str, push_type: str, limit: int, before: tuple) -> list:
+        """倒序获取一页记录，热数据不足一页或已越过热数据窗口时合并读取归档"""
+        history = await push_history_repository.find_page(user_id, push_type, limit, before)
+        boundary = push_retention.boundary()
+        # 归档记录都早于窗口起点，本页最早一条仍在窗口内时归档不会有更晚的记录
+        if boundary is None or (len(history) == limit and history[-1]["push_time"] >= boundary):
+            return history
+        archived = await push_archive_repository.find_page(user_id, push_type, limit, before)
+        return self._merge_history(history, archived, limit, reverse=True)
     
-    def get_push_history(self, user_id: str, push_type: str = None, limit: int = 20) -> list:
+    async def _find_history_since(self, user_id: str, push_type: str, limit: int, after: tuple) -> list:
+        """正序获取 after 之后的记录，after 早于热数据窗口时合并读取归档"""
+        history = await push_history_repository.find_since(user_id, push_type, limit, after)
+        boundary = push_retention.boundary()
+        if boundary is None or after[0] >= boundary:
+            return history
+        archived = await push_archive_repository.find_since(user_id, push_type, limit, after)
+        return self._merge_history(history, archived, limit, reverse=False)
+    
+    async def get_push_history(
+        self,
+        user_id: str,
+        push_type: str = None,
+        limit: int = 20,
+        cursor: str = None,
+        since: str = None
+    ) -> dict:
         """
-        获取推送历史
+        获取推送历史，按 (push_time, _id) 游标分页，启用归档时越过热数据窗口的记录从归档读取（带 archived 标记）
         
         Args:
             user_id: 用户ID
             push_type: 推送类型，不指定则获取所有类型
             limit: 返回数量限制
+            cursor: 上一页返回的 next_cursor，获取更早的记录
+            since: 上次返回的 sync_cursor，只获取之后新增的记录
+        
+        Returns:
+            data 按时间倒序的记录；next_cursor 下一页游标，没有更早的记录时为None；
+            sync_cursor 已返回的最新记录的游标，用于下次增量获取；has_more 是否还有未返回的记录
+        
+        Raises:
+            ValueError: 游标格式不正确
+            PyMongoError: 数据库读取失败
         """
-        try:
-            collection = self.db.get_collection(settings.COLLECTION_PUSH_HISTORY)
-            
-            query = {"user_id": user_id}
-            if push_type:
-                query["push_type"] = push_type
-            
-            cursor = collection.find(query).sort("push_time", -1).limit(limit)
-            
-            history = []
-            for record in cursor:
-                record["_id"] = str(record["_id"])
-                history.append(record)
-            
-            return history
-            
-        except Exception as e:
-            logger.error(f"获取推送历史失败: {e}")
-            return []
+        before = decode_history_cursor(cursor) if cursor else None
+        after = decode_history_cursor(since) if since else None
+        result = {"data": [], "next_cursor": None, "sync_cursor": since, "has_more": False}
+        # 多取一条判断是否还有剩余记录；数据库错误直接抛出，不能当作没有新记录返回
+        if after:
+            history = await self._find_history_since(user_id, push_type, limit + 1, after)
+            result["has_more"] = len(history) > limit
+            history = history[:limit][::-1]
+        else:
+            history = await self._find_history_page(user_id, push_type, limit + 1, before)
+            result["has_more"] = len(history) > limit
+            history = history[:limit]
+            if result["has_more"]:
+                result["next_cursor"] = encode_history_cursor(history[-1])
+        
+        if history and (after or not before):
+            result["sync_cursor"] = encode_history_cursor(history[0])
+        result["data"] = history
+        return result
     
-    def mark_as_read(self, user_id: str, push_id: str) -> bool:
+    async def mark_as_read(self, user_id: str, push_id: str) -> bool:
         """标记推送为已读"""
         try:
-            from bson.objectid import ObjectId
-            collection = self.db.get_collection(settings.COLLECTION_PUSH_HISTORY)
-            
-            result = collection.update_one(
-                {"_id": ObjectId(push_id), "user_id": user_id},
-                {"$set": {"is_read": True}}
-            )
-            
-            return result.modified_count > 0
+            return await push_history_repository.mark_read(user_id, push_id)
             
         except Exception as e:
             logger.error(f"标记已读失败: {e}")
             return False
+    
+    async def mark_many_as_read(
+        self,
+        user_id: str,
+        push_ids: list = None,
+        push_type: str = None,
+        before: datetime = None
+    ) -> int:
+        """
+        批量标记推送为已读，返回标记的条数
+        
+        Raises:
+            ValueError: 推送记录ID格式不正确
+        """
+        if before is not None and before.tzinfo is not None:
+            # 推送时间按服务器本地时间保存
+            before = before.astimezone().replace(tzinfo=None)
+        count = await push_history_repository.mark_read_many(user_id, push_ids, push_type, before)
+        logger.info(f"批量标记已读：用户{user_id}，共{count}条")
+        return count
+    
+    async def get_unread_summary(self, user_id: str) -> dict:
+        """
+        获取用户各推送类型的未读数
+        
+        Returns:
+            total 未读总数；by_type {push_type: 未读数}
+        """
+        document = await push_unread_repository.get(user_id)
+        if document and document.get("initialized"):
+            counts = document.get("counts", {})
+        else:
+            # 计数功能上线前已有的推送历史未计入，首次读取时统计一次
+            counts = await push_unread_repository.recount(user_id)
+        by_type = {push_type: max(count, 0) for push_type, count in counts.items()}
+        return {"total": sum(by_type.values()), "by_type": by_type}
 
 
 # 全局推送服务实例
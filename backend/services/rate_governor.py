@@ -0,0 +1,202 @@
+"""大模型调用限流：令牌桶 + AIMD并发控制"""
+import asyncio
+import logging
+import time
+from typing import Optional
+from backend.config.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """
+    令牌桶
+
+    令牌按 rate（每秒）匀速补充，最多积累 capacity 个。取令牌时先扣除，余额不足的部分按补充速度等待，
+    因此并发请求按到达顺序排队。rate 为0表示不限制。
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, amount: float = 1.0):
+        """取出 amount 个令牌，不足时等待"""
+        if self.rate <= 0:
+            return
+        self._refill()
+        # 单次需求超过桶容量时按容量计，避免永远等待
+        self._tokens -= min(amount, self.capacity)
+        if self._tokens < 0:
+            await asyncio.sleep(-self._tokens / self.rate)
+
+    def adjust(self, delta: float):
+        """按实际用量修正已扣除的令牌，delta 为正表示多用，为负表示退还"""
+        if self.rate <= 0:
+            return
+        self._refill()
+        self._tokens = min(self.capacity, self._tokens - delta)
+
+    @property
+    def available(self) -> float:
+        self._refill()
+        return self._tokens
+
+
+class AIMDLimiter:
+    """
+    AIMD并发控制
+
+    每次成功调用并发上限加 1/limit（约每轮加1），遇到限流或耗时超过阈值时乘以 decrease_factor。
+    两次下调之间至少间隔 cooldown 秒，同一波限流只下调一次。
+    """
+
+    def __init__(
+        self,
+        initial: float,
+        minimum: float,
+        maximum: float,
+        decrease_factor: float,
+        latency_threshold: float,
+        cooldown: float
+    ):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.decrease_factor = decrease_factor
+        self.latency_threshold = latency_threshold
+        self.cooldown = cooldown
+        self.inflight = 0
+        self.decreases = 0
+        self._last_decrease = 0.0
+        # 需在事件循环内创建，首次使用时初始化
+        self._condition: Optional[asyncio.Condition] = None
+
+    def _get_condition(self) -> asyncio.Condition:
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        return self._condition
+
+    async def acquire(self):
+        """等待并占用一个并发名额"""
+        condition = self._get_condition()
+        async with condition:
+            await condition.wait_for(lambda: self.inflight < int(self.limit))
+            self.inflight += 1
+
+    async def release(self):
+        condition = self._get_condition()
+        async with condition:
+            self.inflight -= 1
+            condition.notify_all()
+
+    def on_success(self, latency: float):
+        if latency > self.latency_threshold:
+            self.on_overload(f"耗时{latency:.1f}秒")
+        else:
+            self.limit = min(self.maximum, self.limit + 1 / self.limit)
+
+    def on_overload(self, reason: str):
+        now = time.monotonic()
+        if now - self._last_decrease < self.cooldown:
+            return
+        self._last_decrease = now
+        self.decreases += 1
+        self.limit = max(self.minimum, self.limit * self.decrease_factor)
+        logger.warning(f"大模型调用过载（{reason}），并发上限降至{int(self.limit)}")
+
+
+class RateGovernor:
+    """
+    所有大模型调用共用的限流器
+
+    调用前依次通过AIMD并发控制、每秒请求数令牌桶和每分钟token数令牌桶。
+    token数按提示词长度加 max_tokens 预估扣除，返回后按实际用量修正。
+    """
+
+    def __init__(self):
+        self.enabled = settings.DASHSCOPE_RATE_LIMIT_ENABLED
+        rps = settings.DASHSCOPE_REQUESTS_PER_SECOND
+        tpm = settings.DASHSCOPE_TOKENS_PER_MINUTE
+        self.requests = TokenBucket(rps, max(rps, 1))
+        self.tokens = TokenBucket(tpm / 60, tpm)
+        self.concurrency = AIMDLimiter(
+            initial=settings.DASHSCOPE_CONCURRENCY_INITIAL,
+            minimum=settings.DASHSCOPE_CONCURRENCY_MIN,
+            maximum=settings.DASHSCOPE_CONCURRENCY_MAX,
+            decrease_factor=settings.DASHSCOPE_CONCURRENCY_DECREASE_FACTOR,
+            latency_threshold=settings.DASHSCOPE_LATENCY_THRESHOLD,
+            cooldown=settings.DASHSCOPE_CONCURRENCY_COOLDOWN
+        )
+        self._paused_until = 0.0
+        self.throttled = 0
+
+    @staticmethod
+    def estimate_tokens(payload: dict) -> int:
+        """预估一次请求的token数：提示词字符数 + 最大生成token数"""
+        return sum(len(message["content"]) for message in payload["messages"]) + payload["max_tokens"]
+
+    async def acquire(self, estimated_tokens: int):
+        """调用前获取许可，不满足限流条件时等待"""
+        if not self.enabled:
+            return
+        await self.concurrency.acquire()
+        try:
+            pause = self._paused_until - time.monotonic()
+            if pause > 0:
+                await asyncio.sleep(pause)
+            await self.requests.acquire()
+            await self.tokens.acquire(estimated_tokens)
+        except BaseException:
+            await self.concurrency.release()
+            raise
+
+    async def release(
+        self,
+        estimated_tokens: int,
+        latency: float,
+        status_code: int = None,
+        used_tokens: int = None,
+        retry_after: float = None
+    ):
+        """
+        调用结束后释放许可并反馈结果
+
+        Args:
+            status_code: HTTP状态码，网络错误时为None
+            used_tokens: 响应中的实际token用量
+            retry_after: 限流响应的 Retry-After，期间暂停所有调用
+        """
+        if not self.enabled:
+            return
+        if used_tokens is not None:
+            self.tokens.adjust(used_tokens - estimated_tokens)
+        if status_code == 429:
+            self.throttled += 1
+            self.concurrency.on_overload("429")
+            if retry_after:
+                self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+        elif status_code is not None and status_code < 500:
+            self.concurrency.on_success(latency)
+        await self.concurrency.release()
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "concurrency_limit": int(self.concurrency.limit),
+            "inflight": self.concurrency.inflight,
+            "decreases": self.concurrency.decreases,
+            "throttled": self.throttled,
+            "tokens_available": int(self.tokens.available),
+        }
+
+
+# 全局大模型限流实例
+rate_governor = RateGovernor()
@@ -0,0 +1,81 @@
+"""推送历史保留与归档
+
+push_history 只保留最近 hot_days 天的记录。更早的记录按 (push_time, _id) 正序分批移入归档集合：
+先写入归档再从 push_history 删除，中途中断后重新执行不会丢失或重复记录。归档文档使用短字段名、
+内容zlib压缩，并可由TTL索引在 archive_ttl_days 天后自动删除。获取推送历史时翻页越过热数据窗口会合并读取归档。
+
+用法:
+    python -m backend.services.retention
+"""
+import argparse
+import asyncio
+import json
+import logging
+import time
+from datetime import datetime, timedelta
+from backend.config.config import settings
+from backend.core.mongodb import async_mongodb
+from backend.repositories.push_repository import push_history_repository, push_archive_repository
+
+logger = logging.getLogger(__name__)
+
+
+class PushRetention:
+    """推送历史归档"""
+
+    def __init__(self):
+        self.enabled = settings.RETENTION_ENABLED
+        self.hot_days = settings.RETENTION_HOT_DAYS
+        self.batch_size = settings.RETENTION_BATCH_SIZE
+        self.last_run = None
+
+    def boundary(self) -> datetime:
+        """热数据窗口的起点，早于该时间的记录可能已在归档中；未启用归档时返回None"""
+        if not self.enabled:
+            return None
+        return datetime.now() - timedelta(days=self.hot_days)
+
+    async def run(self) -> dict:
+        """
+        将推送时间早于热数据窗口的记录移入归档
+
+        Returns:
+            cutoff 归档的时间界限，archived 本次移入归档的条数，batches 批次数，seconds 耗时
+        """
+        started = time.monotonic()
+        cutoff = datetime.now() - timedelta(days=self.hot_days)
+        report = {"cutoff": cutoff, "archived": 0, "batches": 0}
+        while True:
+            records = await push_history_repository.find_expired(cutoff, self.batch_size)
+            if not records:
+                break
+            await push_archive_repository.insert_many(records)
+            report["archived"] += await push_history_repository.remove_archived(records)
+            report["batches"] += 1
+            if len(records) < self.batch_size:
+                break
+        report["seconds"] = round(time.monotonic() - started, 3)
+        self.last_run = report
+        logger.info(f"推送历史归档完成：早于{cutoff:%Y-%m-%d %H:%M}的{report['archived']}条记录，共{report['batches']}批")
+        return report
+
+
+# 全局推送历史归档实例
+push_retention = PushRetention()
+
+
+async def _main(args) -> int:
+    if not push_retention.enabled:
+        logger.warning("retention.enabled 未开启，归档后的记录不会出现在推送历史接口中")
+    try:
+        report = await push_retention.run()
+    finally:
+        async_mongodb.close()
+    print(json.dumps(report, ensure_ascii=False, default=str))
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="将超出保留期的推送历史移入归档")
+    raise SystemExit(asyncio.run(_main(parser.parse_args())))
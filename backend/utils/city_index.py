@@ -0,0 +1,170 @@
+"""中国天气网城市代码索引
+
+运行时只读取预先生成的 JSON 索引，CSV 更新后需重新生成：
+    python -m backend.utils.city_index
+
+城市代码CSV每个地级市一行，只有少数区县站点；data/districts.csv 补充区县所属的市（目前为直辖市各区县），
+这些区县使用所属城市的城区站点。
+"""
+import argparse
+import csv
+import json
+import logging
+import re
+from pathlib import Path
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+ROOT_DIR = Path(__file__).parent.parent.parent
+DEFAULT_CSV_PATH = ROOT_DIR / "中国天气城市地区编号代码 最新地级市(358).csv"
+DEFAULT_INDEX_PATH = Path(__file__).parent / "data" / "city_codes.json"
+DEFAULT_DISTRICTS_PATH = Path(__file__).parent / "data" / "districts.csv"
+
+# 自治地方名称中出现的民族，单字民族名须带“族”，多字的可省略，如 伊犁哈萨克自治州
+_ETHNIC_GROUPS = (
+    "蒙古|回|藏|维吾尔|苗|彝|壮|布依|朝鲜|满|侗|瑶|白|土家|哈尼|哈萨克|傣|黎|傈僳|佤|畲|拉祜|水|东乡|纳西|景颇|"
+    "柯尔克孜|土|达斡尔|仫佬|羌|布朗|撒拉|毛南|仡佬|锡伯|普米|塔吉克|怒|鄂温克|保安|裕固|独龙|鄂伦春"
+)
+_ETHNIC = rf"(?:(?:{_ETHNIC_GROUPS})族|蒙古|维吾尔|哈萨克|柯尔克孜)"
+# 自治区、自治州、地区、盟等名称去掉民族和后缀，如 湘西土家族苗族自治州 -> 湘西，伊犁哈萨克自治州 -> 伊犁
+_AUTONOMOUS_PATTERN = re.compile(rf"^(.{{2,}}?){_ETHNIC}*(?:自治[区州县旗]|地区|盟)$")
+# 行政区划后缀，按长度优先匹配
+_SUFFIXES = ("特别行政区", "新区", "地区", "省", "市", "盟", "区", "县")
+# 规范化后仍与CSV不一致的名称：简称、旧称
+ALIASES = {
+    "克孜勒苏": "克州",
+    "襄樊": "襄阳",
+    "思茅": "普洱",
+}
+
+
+def normalize_region_name(name: str) -> str:
+    """规范化省、市、区县名称，如 杭州市 -> 杭州，广西壮族自治区 -> 广西"""
+    name = (name or "").strip()
+    match = _AUTONOMOUS_PATTERN.match(name)
+    if match:
+        name = match.group(1)
+    else:
+        for suffix in _SUFFIXES:
+            if name.endswith(suffix) and len(name) - len(suffix) >= 2:
+                name = name[:-len(suffix)]
+                break
+    return ALIASES.get(name, name)
+
+
+class CityIndex:
+    """
+    城市代码查询
+
+    cities 以 “省/市” 为键，names 只收录在全国唯一的城市名；districts 以 “省/区县” 为键，
+    在全国唯一的区县名同时以区县名为键。均已规范化。
+    """
+
+    def __init__(self, cities: dict, names: dict, districts: dict):
+        self.cities = cities
+        self.names = names
+        self.districts = districts
+
+    @classmethod
+    def load(cls, path: Path = DEFAULT_INDEX_PATH) -> "CityIndex":
+        """读取预生成的索引文件"""
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(data["cities"], data["names"], data["districts"])
+
+    def lookup(self, city: str, province: str = None) -> Optional[str]:
+        """
+        查询城市代码，依次按 (省, 市)、(省, 区县)、唯一的市名、唯一的区县名匹配
+
+        Args:
+            city: 城市或区县名称，可带“市”“区”等后缀
+            province: 省份，同名城市需要通过省份区分
+        """
+        city = normalize_region_name(city)
+        if province:
+            key = f"{normalize_region_name(province)}/{city}"
+            code = self.cities.get(key) or self.districts.get(key)
+            if code:
+                return code
+        return self.names.get(city) or self.districts.get(city)
+
+    def __len__(self) -> int:
+        return len(self.cities)
+
+
+def _read_rows(csv_path: Path) -> list:
+    for encoding in ("gbk", "gb18030", "utf-8"):
+        try:
+            with open(csv_path, encoding=encoding, newline="") as f:
+                return list(csv.DictReader(f))
+        except UnicodeDecodeError:
+            continue
+    raise ValueError(f"无法识别 {csv_path} 的编码")
+
+
+def _unique_names(keys) -> dict:
+    """“省/名称” 键中名称在全国唯一的，名称 -> 键"""
+    owners = {}
+    for key in keys:
+        owners.setdefault(key.split("/", 1)[1], []).append(key)
+    return {name: matched[0] for name, matched in owners.items() if len(matched) == 1}
+
+
+def build_index(csv_path: Path = DEFAULT_CSV_PATH, districts_path: Path = DEFAULT_DISTRICTS_PATH) -> dict:
+    """
+    从CSV生成索引数据
+
+    CSV列：站点号,乡镇,县/区,市,省,空气质量城市。同一城市有多行时优先使用“城区”站点。
+    区县补充表列：县/区,市,省，使用所属城市的代码，CSV中已有站点的区县不覆盖。
+    """
+    cities, districts = {}, {}
+    for row in _read_rows(csv_path):
+        code = row["站点号"].strip()
+        city = normalize_region_name(row["市"])
+        province = normalize_region_name(row["省"])
+        district = row["县/区"].strip()
+        if not code or not city:
+            continue
+
+        key = f"{province}/{city}"
+        if key not in cities or district == "城区":
+            cities[key] = code
+        if district and district != "城区":
+            districts[f"{province}/{normalize_region_name(district)}"] = code
+
+    if districts_path and Path(districts_path).exists():
+        with open(districts_path, encoding="utf-8", newline="") as f:
+            for row in csv.DictReader(f):
+                province = normalize_region_name(row["省"])
+                code = cities.get(f"{province}/{normalize_region_name(row['市'])}")
+                if code is None:
+                    logger.warning(f"区县 {row['县/区']} 所属的市 {row['市']} 不在城市代码中")
+                    continue
+                districts.setdefault(f"{province}/{normalize_region_name(row['县/区'])}", code)
+
+    # 同名城市、区县只能通过省份查询；与城市或省份同名的区县（如天津河北区）不按区县名收录
+    names = {city: cities[key] for city, key in _unique_names(cities).items()}
+    provinces = {key.split("/", 1)[0] for key in cities}
+    for district, key in _unique_names(districts).items():
+        if district not in names and district not in provinces:
+            districts[district] = districts[key]
+    return {"source": csv_path.name, "cities": cities, "names": names, "districts": districts}
+
+
+def main(args) -> int:
+    data = build_index(Path(args.csv))
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, separators=(",", ":"), sort_keys=True)
+    districts = sum(1 for key in data["districts"] if "/" in key)
+    print(f"已生成 {output}：{len(data['cities'])} 个城市，{districts} 个区县")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="生成城市代码索引")
+    parser.add_argument("--csv", default=str(DEFAULT_CSV_PATH), help="城市代码CSV文件")
+    parser.add_argument("--output", default=str(DEFAULT_INDEX_PATH), help="索引输出路径")
+    raise SystemExit(main(parser.parse_args()))
@@ -1,10 +1,11 @@
 """天气爬虫工具"""
+import asyncio
 import requests
-from bs4 import BeautifulSoup
+import httpx
 import logging
-import pandas as pd
-import os
-from pathlib import Path
+from backend.config.config import settings
+from backend.utils.city_index import CityIndex
+from backend.utils.weather_parser import parse_forecast, WeatherParseError
 
 logger = logging.getLogger(__name__)
 
@@ -17,49 +18,67 @@ class WeatherCrawler:
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
         }
         
-        # 加载城市代码映射
-        self.city_codes = self._load_city_codes()
+        # 加载城市代码索引
+        self.city_index = self._load_city_index()
+        
+        self._async_client: httpx.AsyncClient = None
+        self._host_semaphores = {}
     
-    def _load_city_codes(self) -> dict:
-        """从CSV文件加载城市代码映射"""
+    def _load_city_index(self) -> CityIndex:
+        """读取预生成的城市代码索引，索引由 python -m backend.utils.city_index 生成"""
         try:
-            # CSV文件路径
-            csv_path = Path(__file__).parent.parent.parent.parent / "中国天气城市地区编号代码 最新地级市(358).csv"
-            
-            # 尝试不同的编码读取CSV
-            for encoding in ['gbk', 'gb18030', 'utf-8']:
-                try:
-                    df = pd.read_csv(csv_path, encoding=encoding)
-                    # 假设列名为: 站点编号,区县,地区/县,市,省,是否省会城市
-                    # 创建城市名到代码的映射
-                    city_codes = {}
-                    for _, row in df.iterrows():
-                        try:
-                            city_code = str(row.iloc[0])  # 第一列是代码
-                            city_name = str(row.iloc[3])  # 第四列是市名
-                            if city_name and city_code:
-                                city_codes[city_name] = city_code
-                        except:
-                            continue
-                    
-                    if city_codes:
-                        logger.info(f"成功加载 {len(city_codes)} 个城市代码")
-                        return city_codes
-                except UnicodeDecodeError:
-                    continue
-            
-            logger.warning("无法读取城市代码CSV文件，使用默认代码")
+            city_index = CityIndex.load()
+            logger.info(f"成功加载 {len(city_index)} 个城市代码")
+            return city_index
         except Exception as e:
-            logger.error(f"加载城市代码文件失败: {e}")
+            logger.error(f"加载城市代码索引失败: {e}")
+            return CityIndex({}, {}, {})
+    
+    def get_city_code(self, city: str, province: str = None) -> str:
+        """获取城市代码，同名城市通过省份区分"""
+        return self.city_index.lookup(city, province)
+    
+    def _build_url(self, city_code: str) -> str:
+        """中国天气网城市天气页地址"""
+        return f"http://www.weather.com.cn/weather/{city_code}.shtml"
+    
+    def _parse_weather(self, html: str, city: str) -> dict:
+        """
+        解析天气页面，提取今日天气及7日预报
         
-        # 返回默认的城市代码映射
+        Args:
+            html: 页面HTML
+            city: 城市
+            
+        Returns:
+            天气信息字典，顶层为今日天气，forecast 为7日预报；解析失败时包含error字段
+        """
+        try:
+            forecast = parse_forecast(html)
+        except WeatherParseError as e:
+            logger.error(f"未找到天气数据: {city} {e}")
+            return {
+                "city": city,
+                "error": f"未能爬取到 {city} 的天气信息，网页结构可能已变化。"
+            }
+        except Exception as parse_error:
+            logger.error(f"解析天气数据失败: {parse_error}")
+            return {
+                "city": city,
+                "error": f"解析 {city} 天气数据时出错。"
+            }
+        
+        weather_info = {"city": city, **forecast[0], "forecast": forecast}
+        logger.info(f"成功爬取 {city} 天气信息: {weather_info['weather']} {weather_info['temperature']}")
+        return weather_info
+    
+    def _city_code_missing(self, city: str) -> dict:
+        logger.error(f"未找到城市 {city} 的代码")
         return {
+            "city": city,
+            "error": f"未找到城市 {city} 的天气代码，请修改城市名称。支持的城市请参考配置。"
         }
     
-    def get_city_code(self, city: str) -> str:
-        """获取城市代码"""
-        return self.city_codes.get(city, None)
-    
     def crawl_weather(self, province: str, city: str) -> dict:
         """
         爬取指定城市的天气信息
@@ -72,18 +91,12 @@ class WeatherCrawler:
             天气信息字典
         """
         try:
-            city_code = self.get_city_code(city)
+            city_code = self.get_city_code(city, province)
             if not city_code:
-                logger.error(f"未找到城市 {city} 的代码")
-                return {
-                    "city": city,
-                    "error": f"未找到城市 {city} 的天气代码，请修改城市名称。支持的城市请参考配置。"
-                }
+                return self._city_code_missing(city)
             
             # 使用中国天气网
-            url = f"http://www.weather.com.cn/weather/{city_code}.shtml"
-            
-            response = requests.get(url, headers=self.headers, timeout=10)
+            response = requests.get(self._build_url(city_code), headers=self.headers, timeout=settings.WEATHER_TIMEOUT)
             response.encoding = 'utf-8'
             
             if response.status_code != 200:
@@ -93,65 +106,64 @@ class WeatherCrawler:
                     "error": f"无法获取 {city} 的天气信息，请稍后重试。"
                 }
             
-            soup = BeautifulSoup(response.text, 'html.parser')
+            return self._parse_weather(response.text, city)
             
-            # 查找天气列表
-            weather_ul = soup.find('ul', class_='t clearfix')
-            if not weather_ul:
-                logger.error(f"未找到天气数据: {city}")
-                return {
-                    "city": city,
-                    "error": f"未能爬取到 {city} 的天气信息，网页结构可能已变化。"
-                }
+        except Exception as e:
+            logger.error(f"爬取天气信息失败: {e}")
+            return {
+                "city": city,
+                "error": f"获取 {city} 天气信息失败: {str(e)}"
+            }
+    
+    def _get_async_client(self) -> httpx.AsyncClient:
+        """获取复用连接池的异步HTTP客户端，首次调用时创建"""
+        if self._async_client is None or self._async_client.is_closed:
+            self._async_client = httpx.AsyncClient(
+                headers=self.headers,
+                timeout=settings.WEATHER_TIMEOUT,
+                limits=httpx.Limits(
+                    max_connections=settings.WEATHER_POOL_SIZE,
+                    max_keepalive_connections=settings.WEATHER_POOL_SIZE
+                )
+            )
+        return self._async_client
+    
+    def _get_host_semaphore(self, host: str) -> asyncio.Semaphore:
+        """每个站点一个信号量，限制对同一站点的并发请求数"""
+        if host not in self._host_semaphores:
+            self._host_semaphores[host] = asyncio.Semaphore(settings.WEATHER_MAX_PER_HOST)
+        return self._host_semaphores[host]
+    
+    async def acrawl_weather(self, province: str, city: str) -> dict:
+        """
+        异步爬取指定城市的天气信息，复用连接池并遵守单站点并发限制
+        
+        Args:
+            province: 省份
+            city: 城市
             
-            # 获取今天的天气（第一个li）
-            today_weather = weather_ul.find('li')
-            if not today_weather:
-                return {
-                    "city": city,
-                    "error": f"未能解析 {city} 的天气数据。"
-                }
+        Returns:
+            天气信息字典
+        """
+        try:
+            city_code = self.get_city_code(city, province)
+            if not city_code:
+                return self._city_code_missing(city)
             
-            # 解析天气信息
-            try:
-                date = today_weather.find('h1').text.strip()
-                weather = today_weather.find('p', class_='wea').text.strip()
-                
-                # 解析温度
-                tem_tag = today_weather.find('p', class_='tem')
-                if tem_tag.find('span'):
-                    temp_high = tem_tag.find('span').text.strip()
-                    temp_low = tem_tag.find('i').text.strip()
-                    temperature = f"{temp_low}~{temp_high}"
-                else:
-                    temperature = tem_tag.find('i').text.strip()
-                
-                # 解析风向
-                wind_spans = today_weather.find('p', class_='win').find('em').find_all('span')
-                wind_dir = '/'.join([span.get('title', '') for span in wind_spans])
-                
-                # 解析风力
-                wind_force = today_weather.find('p', class_='win').find('i').text.strip()
-                wind = f"{wind_dir} {wind_force}"
-                
-                weather_info = {
-                    "city": city,
-                    "date": date,
-                    "temperature": temperature,
-                    "weather": weather,
-                    "wind": wind,
-                }
-                
-                logger.info(f"成功爬取 {city} 天气信息: {weather} {temperature}")
-                return weather_info
-                
-            except Exception as parse_error:
-                logger.error(f"解析天气数据失败: {parse_error}")
+            url = httpx.URL(self._build_url(city_code))
+            async with self._get_host_semaphore(url.host):
+                response = await self._get_async_client().get(url)
+            response.encoding = 'utf-8'
+            
+            if response.status_code != 200:
+                logger.error(f"天气爬取失败，状态码：{response.status_code}")
                 return {
                     "city": city,
-                    "error": f"解析 {city} 天气数据时出错。"
+                    "error": f"无法获取 {city} 的天气信息，请稍后重试。"
                 }
             
+            return self._parse_weather(response.text, city)
+            
         except Exception as e:
             logger.error(f"爬取天气信息失败: {e}")
             return {
@@ -159,6 +171,27 @@ class WeatherCrawler:
                 "error": f"获取 {city} 天气信息失败: {str(e)}"
             }
     
+    async def crawl_cities(self, locations) -> dict:
+        """
+        并发爬取多个城市的天气，每个城市只请求一次
+        
+        Args:
+            locations: (省份, 城市) 元组的可迭代对象
+            
+        Returns:
+            以 (省份, 城市) 为键的天气信息字典
+        """
+        locations = list(dict.fromkeys(locations))
+        results = await asyncio.gather(
+            *(self.acrawl_weather(province, city) for province, city in locations)
+        )
+        return dict(zip(locations, results))
+    
+    async def aclose(self):
+        """关闭异步HTTP客户端连接池"""
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
 
 
 # 全局天气爬虫实例
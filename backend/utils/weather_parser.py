@@ -0,0 +1,89 @@
+"""中国天气网7日天气页面解析"""
+from bs4 import BeautifulSoup
+from lxml import html as lxml_html
+
+# 7日天气列表的起始标签，页面中只出现一次
+FORECAST_LIST_TAG = '<ul class="t clearfix">'
+
+
+class WeatherParseError(Exception):
+    """页面中没有可解析的天气列表"""
+
+
+def _format_temperature(high: str, low: str) -> str:
+    # 傍晚之后当天只剩最低温度
+    return f"{low}~{high}" if high else low
+
+
+def parse_forecast(html: str) -> list:
+    """
+    解析7日天气列表，只对天气列表片段建树
+
+    先按起始标签在原始文本中截取 <ul class="t clearfix">...</ul>，再用lxml解析该片段；
+    找不到起始标签时（如属性顺序变化）退回对整页建树后按XPath查找。
+
+    Returns:
+        每天的天气 [{date, weather, temperature, wind}, ...]，第一项为今天
+
+    Raises:
+        WeatherParseError: 页面中没有天气列表
+    """
+    start = html.find(FORECAST_LIST_TAG)
+    if start >= 0:
+        end = html.find("</ul>", start)
+        if end < 0:
+            raise WeatherParseError("天气列表不完整")
+        forecast_list = lxml_html.fragment_fromstring(html[start:end + len("</ul>")])
+    else:
+        lists = lxml_html.document_fromstring(html).xpath(
+            '//ul[contains(concat(" ", normalize-space(@class), " "), " t ")'
+            ' and contains(concat(" ", normalize-space(@class), " "), " clearfix ")]'
+        )
+        if not lists:
+            raise WeatherParseError("未找到天气列表")
+        forecast_list = lists[0]
+
+    days = []
+    for day in forecast_list.xpath("./li"):
+        high = day.xpath('string(./p[@class="tem"]/span)').strip()
+        low = day.xpath('string(./p[@class="tem"]/i)').strip()
+        wind_dir = "/".join(day.xpath('./p[@class="win"]/em/span/@title'))
+        wind_force = day.xpath('string(./p[@class="win"]/i)').strip()
+        days.append({
+            "date": day.xpath("string(./h1)").strip(),
+            "weather": day.xpath('string(./p[@class="wea"])').strip(),
+            "temperature": _format_temperature(high, low),
+            "wind": f"{wind_dir} {wind_force}",
+        })
+    if not days:
+        raise WeatherParseError("天气列表为空")
+    return days
+
+
+def parse_forecast_soup(html: str) -> list:
+    """
+    使用BeautifulSoup对整页建树解析7日天气列表，结果与 parse_forecast 相同
+
+    原有的解析方式，保留用于性能对比和结果校验。
+    """
+    weather_ul = BeautifulSoup(html, "html.parser").find("ul", class_="t clearfix")
+    if not weather_ul:
+        raise WeatherParseError("未找到天气列表")
+
+    days = []
+    for day in weather_ul.find_all("li", recursive=False):
+        tem_tag = day.find("p", class_="tem")
+        high_tag = tem_tag.find("span")
+        win_tag = day.find("p", class_="win")
+        wind_dir = "/".join(span.get("title", "") for span in win_tag.find("em").find_all("span"))
+        days.append({
+            "date": day.find("h1").text.strip(),
+            "weather": day.find("p", class_="wea").text.strip(),
+            "temperature": _format_temperature(
+                high_tag.text.strip() if high_tag else "", tem_tag.find("i").text.strip()
+            ),
+            "wind": f"{wind_dir} {win_tag.find('i').text.strip()}",
+        })
+    if not days:
+        raise WeatherParseError("天气列表为空")
+    return days
@@ -1,6 +1,6 @@
 import { View, Button, ScrollView } from '@tarojs/components'
 import Taro from '@tarojs/taro'
-import { useState, useEffect } from 'react'
+import { useState, useEffect, useRef } from 'react'
 import { useSelector } from 'react-redux'
 import { RootState } from '../../store'
 import { pushHealthTip, getPushHistory } from '../../services/api'
@@ -10,6 +10,8 @@ export default function HealthTipPage() {
   const [loading, setLoading] = useState(false)
   const [latestContent, setLatestContent] = useState('')
   const [history, setHistory] = useState<any[]>([])
+  // 已加载的最新记录游标，之后只获取新增记录
+  const syncCursor = useRef<string | null>(null)
   const userId = useSelector((state: RootState) => state.user.userId)
 
   useEffect(() => {
@@ -18,11 +20,19 @@ export default function HealthTipPage() {
 
   const loadHistory = async () => {
     try {
-      const response: any = await getPushHistory(userId, 'health_tip', 10)
-      if (response.status === 'success') {
-        setHistory(response.data)
-        if (response.data.length > 0) {
-          setLatestContent(response.data[0].content)
+      const since = syncCursor.current
+      const response: any = await getPushHistory(userId, 'health_tip', 10, since ? { since } : {})
+      if (response.status === 'success' && !response.not_modified) {
+        if (since && response.has_more) {
+          // 新增记录超过一页时重新加载
+          syncCursor.current = null
+          return loadHistory()
+        }
+        syncCursor.current = response.sync_cursor
+        const data = since ? [...response.data, ...history].slice(0, 10) : response.data
+        setHistory(data)
+        if (data.length > 0) {
+          setLatestContent(data[0].content)
         }
       }
     } catch (error) {
@@ -1,6 +1,6 @@
 import { View, Button, Picker, ScrollView } from '@tarojs/components'
 import Taro from '@tarojs/taro'
-import { useState, useEffect } from 'react'
+import { useState, useEffect, useRef } from 'react'
 import { useSelector } from 'react-redux'
 import { RootState } from '../../store'
 import { pushWeatherReminder, getPushHistory, setUserLocation, getHealthProfile } from '../../services/api'
@@ -12,6 +12,8 @@ export default function WeatherPage() {
   const [locationSet, setLocationSet] = useState(false)
   const [latestContent, setLatestContent] = useState('')
   const [history, setHistory] = useState<any[]>([])
+  // 已加载的最新记录游标，之后只获取新增记录
+  const syncCursor = useRef<string | null>(null)
   const [loading, setLoading] = useState(false)
 
   const userId = useSelector((state: RootState) => state.user.userId)
@@ -75,11 +77,19 @@ export default function WeatherPage() {
 
   const loadHistory = async () => {
     try {
-      const response: any = await getPushHistory(userId, 'weather', 10)
-      if (response.status === 'success') {
-        setHistory(response.data)
-        if (response.data.length > 0) {
-          setLatestContent(response.data[0].content)
+      const since = syncCursor.current
+      const response: any = await getPushHistory(userId, 'weather', 10, since ? { since } : {})
+      if (response.status === 'success' && !response.not_modified) {
+        if (since && response.has_more) {
+          // 新增记录超过一页时重新加载
+          syncCursor.current = null
+          return loadHistory()
+        }
+        syncCursor.current = response.sync_cursor
+        const data = since ? [...response.data, ...history].slice(0, 10) : response.data
+        setHistory(data)
+        if (data.length > 0) {
+          setLatestContent(data[0].content)
         }
       }
     } catch (error) {
@@ -117,11 +117,32 @@ export const pushHealthTip = (userId: string) => {
 }
 
 // 获取推送历史
-export const getPushHistory = (userId: string, pushType?: string, limit: number = 20) => {
+// cursor: 上一页返回的 next_cursor，获取更早的记录；since: 上次返回的 sync_cursor，只获取新增记录
+export interface PushHistoryOptions {
+  cursor?: string
+  since?: string
+}
+
+export const getPushHistory = async (
+  userId: string,
+  pushType?: string,
+  limit: number = 20,
+  options: PushHistoryOptions = {}
+) => {
   const params = new URLSearchParams()
   if (pushType) params.append('push_type', pushType)
   params.append('limit', limit.toString())
-  return request(`/push/history/${userId}?${params.toString()}`)
+  if (options.cursor) params.append('cursor', options.cursor)
+  if (options.since) params.append('since', options.since)
+  try {
+    return await request(`/push/history/${userId}?${params.toString()}`)
+  } catch (error: any) {
+    // 没有新增记录
+    if (options.since && error.statusCode === 304) {
+      return { status: 'success', data: [], count: 0, sync_cursor: options.since, has_more: false, not_modified: true }
+    }
+    throw error
+  }
 }
 
 // 标记推送为已读
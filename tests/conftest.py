@@ -0,0 +1,13 @@
+"""测试公共夹具"""
+import mongomock_motor
+import pytest
+from backend.core.mongodb import async_mongodb
+
+
+@pytest.fixture
+def mongodb(monkeypatch):
+    """以 mongomock-motor 替换全局异步MongoDB连接，每个测试使用独立的空数据库"""
+    client = mongomock_motor.AsyncMongoMockClient()
+    monkeypatch.setattr(async_mongodb, "client", client)
+    monkeypatch.setattr(async_mongodb, "db", client["test"])
+    return async_mongodb.db
@@ -0,0 +1,54 @@
+"""分片协调测试的调度实例进程
+
+连接 MONGODB_URI / MONGODB_DATABASE 指定的数据库，与其他进程以同一个 run_id 执行 ShardCoordinator.run，
+每个区间把该区间内的用户写入 test_sends 集合，代替实际推送。
+
+用法:
+    python -m tests.shard_worker RUN_ID [--delay 0.05] [--hang]
+"""
+import argparse
+import asyncio
+from backend.config.config import settings
+from backend.core.mongodb import async_mongodb, get_async_mongodb
+from backend.scheduler.coordinator import shard_coordinator
+
+SENDS_COLLECTION = "test_sends"
+
+
+async def _send_range(shard_range: tuple, args) -> dict:
+    if args.hang:
+        # 模拟处理中失联：持有租约后不再返回，由测试结束进程
+        await asyncio.sleep(3600)
+    lo, hi = shard_range
+    db = get_async_mongodb()
+    users = [
+        profile["user_id"]
+        async for profile in db.get_collection(settings.COLLECTION_HEALTH_PROFILE).find(
+            {"shard_hash": {"$gte": lo, "$lt": hi}}, {"user_id": 1}
+        )
+    ]
+    await asyncio.sleep(args.delay)
+    if users:
+        await db.get_collection(SENDS_COLLECTION).insert_many(
+            [{"user_id": user_id, "node": shard_coordinator.node_id, "lo": lo} for user_id in users]
+        )
+    return {"users": len(users)}
+
+
+async def _main(args) -> int:
+    await shard_coordinator.register()
+    try:
+        results = await shard_coordinator.run(args.run_id, lambda shard_range: _send_range(shard_range, args))
+    finally:
+        await shard_coordinator.unregister()
+        async_mongodb.close()
+    print(f"{shard_coordinator.node_id} {len(results)}", flush=True)
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="分片协调测试的调度实例")
+    parser.add_argument("run_id")
+    parser.add_argument("--delay", type=float, default=0.05, help="每个区间的模拟推送耗时（秒）")
+    parser.add_argument("--hang", action="store_true", help="领取第一个区间后挂起，模拟失联的实例")
+    raise SystemExit(asyncio.run(_main(parser.parse_args())))
@@ -0,0 +1,42 @@
+"""应用导入测试
+
+在子进程中导入 backend.app，MongoDB地址指向不可达的端口，检查导入不依赖数据库连接、
+不建立连接，且调度器、大模型、爬虫等模块留待 lifespan 或首个请求加载。
+"""
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+SCRIPT = """
+import json, sys
+import backend.app
+from backend.core.mongodb import mongodb, async_mongodb
+print(json.dumps({
+    "modules": sorted(name for name in sys.modules if name.startswith(("backend.", "apscheduler", "httpx"))),
+    "connected": [mongodb.client is not None, async_mongodb.client is not None],
+}))
+"""
+
+DEFERRED = (
+    "backend.scheduler.tasks",
+    "backend.services.push_service",
+    "backend.services.llm_service",
+    "backend.utils.weather_crawler",
+    "apscheduler",
+    "httpx",
+)
+
+
+def test_import_app_without_database():
+    env = {**os.environ, "MONGODB_URI": "mongodb://127.0.0.1:1/?serverSelectionTimeoutMS=100"}
+    completed = subprocess.run(
+        [sys.executable, "-c", SCRIPT], cwd=ROOT, env=env, capture_output=True, text=True, timeout=60
+    )
+    assert completed.returncode == 0, completed.stderr
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    assert result["connected"] == [False, False]
+    assert [name for name in DEFERRED if name in result["modules"]] == []
@@ -0,0 +1,63 @@
+"""城市代码索引测试"""
+import pytest
+from backend.utils.city_index import CityIndex, build_index, normalize_region_name
+
+
+@pytest.fixture(scope="module")
+def index():
+    return CityIndex.load()
+
+
+@pytest.mark.parametrize("name, expected", [
+    ("杭州市", "杭州"),
+    ("广西壮族自治区", "广西"),
+    ("新疆维吾尔自治区", "新疆"),
+    ("湘西土家族苗族自治州", "湘西"),
+    ("黔东南苗族侗族自治州", "黔东南"),
+    ("海西蒙古族藏族自治州", "海西"),
+    ("伊犁哈萨克自治州", "伊犁"),
+    ("巴音郭楞蒙古自治州", "巴音郭楞"),
+    ("克孜勒苏柯尔克孜自治州", "克州"),
+    ("石柱土家族自治县", "石柱"),
+    ("阿拉善盟", "阿拉善"),
+    ("大兴安岭地区", "大兴安岭"),
+    ("浦东新区", "浦东"),
+    ("香港特别行政区", "香港"),
+])
+def test_normalize_region_name(name, expected):
+    assert normalize_region_name(name) == expected
+
+
+def test_lookup_autonomous_prefectures(index):
+    assert index.lookup("伊犁哈萨克自治州") == index.lookup("伊犁", "新疆")
+    assert index.lookup("伊犁哈萨克自治州") is not None
+    assert index.lookup("黔东南苗族侗族自治州", "贵州省") == index.lookup("黔东南")
+    assert index.lookup("阿拉善盟", "内蒙古自治区") == index.lookup("阿拉善")
+
+
+def test_lookup_districts(index):
+    beijing = index.lookup("北京")
+    assert index.lookup("海淀") == beijing
+    assert index.lookup("海淀区", "北京市") == beijing
+    assert index.lookup("浦东新区") == index.lookup("上海")
+    assert index.lookup("顺德区") == "101280801"
+
+
+def test_lookup_name_collisions(index):
+    # 吉林市与吉林省同名，按市名查询得到吉林市而不是省会长春
+    jilin = index.lookup("吉林市")
+    assert jilin == index.lookup("吉林市", "吉林省") == index.cities["吉林/吉林"]
+    assert index.lookup("长春", "吉林省") != jilin
+    # 朝阳既是辽宁的市也是北京的区：不带省份按市查询，带省份按区县查询
+    assert index.lookup("朝阳") == index.cities["辽宁/朝阳"]
+    assert index.lookup("朝阳区", "北京") == index.lookup("北京")
+    # 天津河北区与河北省同名，只能带省份查询
+    assert index.lookup("河北区") is None
+    assert index.lookup("河北区", "天津") == index.lookup("天津")
+
+
+def test_prebuilt_index_is_current(index):
+    data = build_index()
+    assert data["cities"] == index.cities
+    assert data["names"] == index.names
+    assert data["districts"] == index.districts
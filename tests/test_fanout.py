@@ -0,0 +1,98 @@
+"""推送扇出引擎测试：两级并发上限、单用户超时与失败隔离"""
+import asyncio
+import time
+from backend.scheduler.fanout import FanoutEngine
+
+
+class Tracker:
+    """记录处理函数的同时执行数"""
+
+    def __init__(self):
+        self.active = {}
+        self.peak = {}
+        self.total_active = 0
+        self.total_peak = 0
+
+    def sender(self, task_type: str, delay: float = 0.01, outcomes: dict = None):
+        outcomes = outcomes or {}
+
+        async def send(user_id: str) -> dict:
+            self.active[task_type] = self.active.get(task_type, 0) + 1
+            self.peak[task_type] = max(self.peak.get(task_type, 0), self.active[task_type])
+            self.total_active += 1
+            self.total_peak = max(self.total_peak, self.total_active)
+            try:
+                outcome = outcomes.get(user_id, "success")
+                if outcome == "hang":
+                    await asyncio.sleep(60)
+                await asyncio.sleep(delay)
+                if outcome == "error":
+                    raise RuntimeError("推送失败")
+                return {"status": outcome}
+            finally:
+                self.active[task_type] -= 1
+                self.total_active -= 1
+        return send
+
+
+def users(count: int, prefix: str = "u") -> list:
+    return [f"{prefix}{index}" for index in range(count)]
+
+
+def test_task_concurrency_limit():
+    engine = FanoutEngine(global_concurrency=10, task_concurrency={"rest": 3}, user_timeout=5)
+    tracker = Tracker()
+    summary = asyncio.run(engine.run("rest", users(20), tracker.sender("rest")))
+    engine.shutdown()
+    assert summary.total == summary.success == 20
+    assert tracker.peak["rest"] == 3
+
+
+def test_global_concurrency_shared_by_tasks():
+    engine = FanoutEngine(global_concurrency=4, task_concurrency={"rest": 3, "meal": 3}, user_timeout=5)
+    tracker = Tracker()
+
+    async def scenario():
+        return await asyncio.gather(
+            engine.run("rest", users(15, "r"), tracker.sender("rest")),
+            engine.run("meal", users(15, "m"), tracker.sender("meal")),
+        )
+
+    rest, meal = asyncio.run(scenario())
+    engine.shutdown()
+    assert rest.success == meal.success == 15
+    assert tracker.total_peak == 4
+    assert tracker.peak["rest"] <= 3 and tracker.peak["meal"] <= 3
+
+
+def test_timeout_and_errors_do_not_abort_run():
+    engine = FanoutEngine(global_concurrency=5, task_concurrency={}, user_timeout=0.1)
+    tracker = Tracker()
+    outcomes = {"u3": "hang", "u7": "error", "u8": "skipped", "u9": "failed"}
+    started = time.monotonic()
+    summary = asyncio.run(engine.run("meal", users(12), tracker.sender("meal", outcomes=outcomes)))
+    engine.shutdown()
+    assert summary.total == 12
+    assert summary.timeout == 1
+    assert summary.failed == 2
+    assert summary.skipped == 1
+    assert summary.success == 8
+    assert sorted(summary.failed_users) == ["u3", "u7", "u9"]
+    # 超时的用户只占用自己的名额，不会拖住整次运行
+    assert time.monotonic() - started < 1
+
+
+def test_sync_handler_and_async_items():
+    engine = FanoutEngine(global_concurrency=2, task_concurrency={}, user_timeout=5)
+
+    def send(user_id: str) -> dict:
+        time.sleep(0.01)
+        return {"status": "success"}
+
+    async def items():
+        for user_id in users(6):
+            yield user_id
+
+    summary = asyncio.run(engine.run("health_tip", items(), send))
+    engine.shutdown()
+    assert summary.total == summary.success == 6
@@ -0,0 +1,112 @@
+"""大模型调用与熔断器的交互测试
+
+熔断器处于 half_open 且只放行一个探测调用。检查流式与非流式调用在等待限流时被取消、
+返回429、客户端中途断开时，探测名额被归还或熔断器重新打开，不会卡在 half_open。
+"""
+import asyncio
+import httpx
+import pytest
+from backend.services.circuit_breaker import llm_circuit_breaker
+from backend.services.llm_service import LLMServiceError, llm_service
+from backend.services.rate_governor import rate_governor
+
+MESSAGES = [{"role": "user", "content": "你好"}]
+
+
+@pytest.fixture
+def half_open(monkeypatch):
+    monkeypatch.setattr(llm_circuit_breaker, "enabled", True)
+    monkeypatch.setattr(llm_circuit_breaker, "half_open_probes", 1)
+    monkeypatch.setattr(llm_circuit_breaker, "open_seconds", 0)
+    monkeypatch.setattr(llm_circuit_breaker, "state", llm_circuit_breaker.OPEN)
+    monkeypatch.setattr(llm_circuit_breaker, "_opened_at", 0.0)
+    monkeypatch.setattr(rate_governor, "enabled", False)
+    yield llm_circuit_breaker
+    llm_circuit_breaker._outcomes.clear()
+
+
+def use_transport(monkeypatch, handler):
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler), base_url="http://llm.test")
+    monkeypatch.setattr(llm_service, "_async_client", client)
+    return client
+
+
+async def blocked_acquire(estimated_tokens):
+    await asyncio.sleep(60)
+
+
+def stream_body(*contents) -> bytes:
+    lines = [
+        'data: {"choices": [{"delta": {"content": "%s"}}]}\n\n' % content for content in contents
+    ]
+    return ("".join(lines) + "data: [DONE]\n\n").encode("utf-8")
+
+
+async def consume(stream) -> list:
+    return [chunk async for chunk in stream]
+
+
+def test_stream_cancelled_while_acquiring_releases_probe(half_open, monkeypatch):
+    monkeypatch.setattr(rate_governor, "acquire", blocked_acquire)
+
+    async def scenario():
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(consume(llm_service.astream(MESSAGES)), 0.05)
+
+    asyncio.run(scenario())
+    assert half_open.state == half_open.HALF_OPEN
+    assert half_open.allow()
+
+
+def test_send_cancelled_while_acquiring_releases_probe(half_open, monkeypatch):
+    monkeypatch.setattr(rate_governor, "acquire", blocked_acquire)
+
+    async def scenario():
+        client = use_transport(monkeypatch, lambda request: httpx.Response(200, json={}))
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(llm_service._send(client, llm_service._payload(MESSAGES, 1, 10)), 0.05)
+
+    asyncio.run(scenario())
+    assert half_open.state == half_open.HALF_OPEN
+    assert half_open.allow()
+
+
+def test_stream_throttled_probe_reopens(half_open, monkeypatch):
+    async def scenario():
+        use_transport(monkeypatch, lambda request: httpx.Response(429, text="rate limited"))
+        with pytest.raises(LLMServiceError):
+            await consume(llm_service.astream(MESSAGES))
+
+    asyncio.run(scenario())
+    assert half_open.state == half_open.OPEN
+
+
+def test_send_throttled_probe_reopens(half_open, monkeypatch):
+    async def scenario():
+        client = use_transport(monkeypatch, lambda request: httpx.Response(429))
+        response = await llm_service._send(client, llm_service._payload(MESSAGES, 1, 10))
+        assert response.status_code == 429
+
+    asyncio.run(scenario())
+    assert half_open.state == half_open.OPEN
+
+
+def test_stream_disconnect_is_not_success(half_open, monkeypatch):
+    async def scenario():
+        use_transport(monkeypatch, lambda request: httpx.Response(200, content=stream_body("一", "二", "三")))
+        stream = llm_service.astream(MESSAGES)
+        assert await stream.__anext__() == "一"
+        await stream.aclose()
+
+    asyncio.run(scenario())
+    assert half_open.state == half_open.HALF_OPEN
+    assert half_open.allow()
+
+
+def test_stream_completed_probe_closes(half_open, monkeypatch):
+    async def scenario():
+        use_transport(monkeypatch, lambda request: httpx.Response(200, content=stream_body("一", "二")))
+        return await consume(llm_service.astream(MESSAGES))
+
+    assert asyncio.run(scenario()) == ["一", "二"]
+    assert half_open.state == half_open.CLOSED
@@ -0,0 +1,143 @@
+"""健康档案批量导入测试：逐行错误报告、有效行与无效行混合、重复导入的幂等性"""
+import asyncio
+import json
+from backend.config.config import settings
+from backend.services.profile_import import parse_rows, profile_importer
+
+
+def profile(user_id: str, nickname: str = "小明", **basic_info) -> dict:
+    return {
+        "user_id": user_id,
+        "basic_info": {
+            "nickname": nickname, "birth_date": "1990-01", "age": 36, "gender": "男",
+            "height": 175, "weight": 70, **basic_info,
+        },
+        "health_info": {"allergies": ["青霉素过敏"]},
+        "other_info": {},
+    }
+
+
+def ndjson(*rows) -> bytes:
+    return "\n".join(row if isinstance(row, str) else json.dumps(row, ensure_ascii=False) for row in rows).encode()
+
+
+async def _chunks(data: bytes, size: int):
+    for start in range(0, len(data), size):
+        yield data[start:start + size]
+
+
+def run_import(data: bytes, import_format: str = "ndjson", overwrite: bool = True, chunk_size: int = 1 << 16) -> dict:
+    return asyncio.run(profile_importer.run(parse_rows(import_format, _chunks(data, chunk_size)), overwrite))
+
+
+def stored(mongodb) -> dict:
+    async def load():
+        cursor = mongodb[settings.COLLECTION_HEALTH_PROFILE].find({}, {"_id": 0})
+        return {document["user_id"]: document async for document in cursor}
+    return asyncio.run(load())
+
+
+def errors_by_line(report: dict) -> dict:
+    return {error["line"]: error for error in report["errors"]}
+
+
+def test_ndjson_mixed_rows(mongodb):
+    data = ndjson(
+        profile("u1"),
+        '{"user_id": "u2", "basic_info": ',
+        "",
+        '["u3"]',
+        profile("u4", age=-1),
+        profile("u5"),
+    )
+    report = run_import(data)
+
+    assert report["total"] == 5
+    assert (report["inserted"], report["updated"], report["skipped"], report["failed"]) == (2, 0, 0, 3)
+    errors = errors_by_line(report)
+    assert sorted(errors) == [2, 4, 5]
+    assert errors[2]["user_id"] is None and errors[2]["errors"][0].startswith("JSON格式错误")
+    assert errors[4]["errors"] == ["每行必须是一个JSON对象"]
+    assert errors[5]["user_id"] == "u4"
+    assert [message.split(":")[0] for message in errors[5]["errors"]] == ["basic_info.age"]
+    assert sorted(stored(mongodb)) == ["u1", "u5"]
+
+
+def test_csv_mixed_rows(mongodb):
+    data = "\n".join([
+        "user_id,basic_info.nickname,basic_info.birth_date,basic_info.age,basic_info.gender,"
+        "basic_info.height,basic_info.weight,health_info.allergies,health_info.surgery_history,other_info.other_notes",
+        'c1,小红,1992-05,34,女,162,50,花粉过敏;海鲜过敏,"[{""name"": ""阑尾切除"", ""date"": ""2010""}]",',
+        "c2,小刚,1985-03,41,男,0,80,,,",
+        'c3,小李,1990-01,36,男,170,65,,[oops,',
+        'c4,小王,1990-01,36,男,170,65,,,"第一行',
+        '第二行"',
+        "c5,,1990-01,36,男,170,65,,,",
+        "c6,小张,1990-01,36,男,170,65,,,",
+    ]).encode("utf-8-sig")
+    report = run_import(data, "csv")
+
+    assert report["total"] == 6
+    assert (report["inserted"], report["failed"]) == (3, 3)
+    errors = errors_by_line(report)
+    assert sorted(errors) == [3, 4, 7]
+    assert [message.split(":")[0] for message in errors[3]["errors"]] == ["basic_info.height"]
+    assert errors[4]["errors"][0].startswith("JSON格式错误")
+    assert errors[7]["user_id"] == "c5"
+
+    profiles = stored(mongodb)
+    assert sorted(profiles) == ["c1", "c4", "c6"]
+    assert profiles["c1"]["health_info"]["allergies"] == ["花粉过敏", "海鲜过敏"]
+    assert profiles["c1"]["health_info"]["surgery_history"] == [{"name": "阑尾切除", "date": "2010"}]
+    assert profiles["c4"]["other_info"]["other_notes"] == "第一行\n第二行"
+
+
+def test_reimport_is_idempotent(mongodb):
+    data = ndjson(*(profile(f"u{index}") for index in range(5)))
+    first = run_import(data)
+    assert (first["inserted"], first["updated"], first["failed"]) == (5, 0, 0)
+    before = stored(mongodb)
+
+    second = run_import(data)
+    assert (second["inserted"], second["updated"], second["failed"]) == (0, 5, 0)
+    after = stored(mongodb)
+    assert sorted(after) == sorted(before)
+    for user_id, document in after.items():
+        # 重复导入只更新档案内容，新建时写入的字段保持不变
+        for field in ("basic_info", "health_info", "other_info", "created_at", "shard_hash", "push_schedule"):
+            assert document[field] == before[user_id][field]
+        assert document["version"] == 2
+
+
+def test_insert_only_skips_existing(mongodb):
+    run_import(ndjson(profile("u1"), profile("u2")))
+    report = run_import(ndjson(profile("u1", nickname="改名"), profile("u3")), overwrite=False)
+    assert (report["inserted"], report["updated"], report["skipped"]) == (1, 0, 1)
+    profiles = stored(mongodb)
+    assert profiles["u1"]["basic_info"]["nickname"] == "小明"
+    assert profiles["u1"]["version"] == 1
+    assert sorted(profiles) == ["u1", "u2", "u3"]
+
+
+def test_duplicate_user_in_file_keeps_last_row(mongodb):
+    report = run_import(ndjson(profile("u1", nickname="第一次"), profile("u2"), profile("u1", nickname="第二次")))
+    assert (report["inserted"], report["updated"], report["failed"]) == (2, 1, 0)
+    assert stored(mongodb)["u1"]["basic_info"]["nickname"] == "第二次"
+
+
+def test_small_chunks_and_batches(mongodb, monkeypatch):
+    monkeypatch.setattr(profile_importer, "batch_size", 2)
+    # 每块3字节，多字节字符和BOM都会被切开
+    data = b"\xef\xbb\xbf" + ndjson(*(profile(f"u{index}", nickname="小明同学") for index in range(5)))
+    report = run_import(data, chunk_size=3)
+    assert (report["total"], report["inserted"], report["failed"]) == (5, 5, 0)
+    assert {document["basic_info"]["nickname"] for document in stored(mongodb).values()} == {"小明同学"}
+
+
+def test_error_report_truncated(mongodb, monkeypatch):
+    monkeypatch.setattr(profile_importer, "max_errors", 2)
+    report = run_import(ndjson(*(["not json"] * 4), profile("u1")))
+    assert report["failed"] == 4
+    assert [error["line"] for error in report["errors"]] == [1, 2]
+    assert report["errors_truncated"] is True
+    assert report["inserted"] == 1
@@ -0,0 +1,139 @@
+"""推送历史分页测试
+
+通过 /api/push/history 接口检查：按 next_cursor 逐页读取时记录不重不漏，push_time 相同的记录按 _id 排序且
+跨页不丢失；since 增量获取只返回新增记录，没有新增时返回304，数据库错误时返回500而不是304。
+"""
+import asyncio
+from datetime import datetime, timedelta
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from pymongo.errors import PyMongoError
+from backend.api import push
+from backend.repositories.push_repository import push_history_repository
+from backend.services.retention import push_retention
+
+BASE_TIME = datetime.now().replace(microsecond=0) - timedelta(hours=1)
+
+
+def record(user_id: str, minutes: int, push_type: str = "rest") -> dict:
+    return {
+        "user_id": user_id,
+        "push_type": push_type,
+        "content": f"内容{minutes}",
+        "push_time": BASE_TIME + timedelta(minutes=minutes),
+        "is_read": False,
+    }
+
+
+def insert(records: list) -> list:
+    asyncio.run(push_history_repository.insert_many(records))
+    return records
+
+
+def newest_first(records: list) -> list:
+    return [str(item["_id"]) for item in sorted(records, key=lambda item: (item["push_time"], item["_id"]), reverse=True)]
+
+
+@pytest.fixture
+def client(mongodb):
+    app = FastAPI()
+    app.include_router(push.router, prefix="/api")
+    with TestClient(app) as client:
+        yield client
+
+
+def history(client: TestClient, user_id: str = "u1", **params):
+    return client.get(f"/api/push/history/{user_id}", params=params)
+
+
+def read_all_pages(client: TestClient, limit: int, **params) -> list:
+    pages = []
+    body = history(client, limit=limit, **params).json()
+    pages.append(body)
+    while body["has_more"]:
+        body = history(client, limit=limit, cursor=body["next_cursor"], **params).json()
+        pages.append(body)
+    return pages
+
+
+def ids(body: dict) -> list:
+    return [item["_id"] for item in body["data"]]
+
+
+def test_cursor_round_trip_with_equal_push_time(client):
+    # 第2~5条推送时间相同，每页2条时相同时间的记录跨越两页
+    records = insert(
+        [record("u1", 0), record("u1", 1)]
+        + [record("u1", 5, push_type) for push_type in ("rest", "meal", "weather", "health_tip")]
+        + [record("u1", 9), record("u2", 5)]
+    )
+    expected = newest_first([item for item in records if item["user_id"] == "u1"])
+
+    pages = read_all_pages(client, limit=2)
+    assert [len(page["data"]) for page in pages] == [2, 2, 2, 1]
+    assert [item_id for page in pages for item_id in ids(page)] == expected
+    assert pages[-1]["next_cursor"] is None
+    # 只有第一页给出增量同步游标，翻页不会把它推回旧记录
+    assert pages[0]["sync_cursor"] and all(page["sync_cursor"] is None for page in pages[1:])
+
+    meal = read_all_pages(client, limit=1, push_type="meal")
+    assert [item_id for page in meal for item_id in ids(page)] == newest_first(
+        [item for item in records if item["user_id"] == "u1" and item["push_type"] == "meal"]
+    )
+
+
+def test_since_returns_only_new_records(client):
+    insert([record("u1", minutes) for minutes in range(3)])
+    first = history(client, limit=10).json()
+    sync_cursor = first["sync_cursor"]
+
+    unchanged = history(client, since=sync_cursor)
+    assert unchanged.status_code == 304
+    assert unchanged.content == b""
+
+    # 与已返回的最新记录同一时间、_id 更大的记录也算新增
+    added = insert([record("u1", 2, "meal"), record("u1", 4), record("u1", 6), record("u2", 7)])
+    delta = history(client, since=sync_cursor, limit=2)
+    body = delta.json()
+    assert delta.status_code == 200
+    assert ids(body) == newest_first(added[:2])
+    assert body["has_more"] is True
+    assert body["next_cursor"] is None
+
+    rest = history(client, since=body["sync_cursor"], limit=2).json()
+    assert ids(rest) == newest_first(added[2:3])
+    assert rest["has_more"] is False
+    assert history(client, since=rest["sync_cursor"]).status_code == 304
+
+
+def test_cursor_continues_into_archive(client, monkeypatch):
+    monkeypatch.setattr(push_retention, "enabled", True)
+    monkeypatch.setattr(push_retention, "hot_days", 30)
+    # 超出保留期的5条移入归档，其中两条推送时间相同
+    old = [record("u1", minutes - 60 * 24 * 60) for minutes in (0, 0, 1, 2, 3)]
+    records = insert(old + [record("u1", minutes) for minutes in range(3)])
+    asyncio.run(push_retention.run())
+
+    pages = read_all_pages(client, limit=3)
+    assert [item_id for page in pages for item_id in ids(page)] == newest_first(records)
+    assert [item.get("archived", False) for page in pages for item in page["data"]] == [False] * 3 + [True] * 5
+
+
+def test_invalid_requests(client):
+    insert([record("u1", 0)])
+    sync_cursor = history(client).json()["sync_cursor"]
+    assert history(client, cursor="not-a-cursor").status_code == 400
+    assert history(client, since="bm90fGEtY3Vyc29y").status_code == 400
+    assert history(client, cursor=sync_cursor, since=sync_cursor).status_code == 400
+
+
+def test_database_error_is_not_reported_as_unchanged(client, monkeypatch):
+    insert([record("u1", 0)])
+    sync_cursor = history(client).json()["sync_cursor"]
+
+    async def failing_find_since(*args, **kwargs):
+        raise PyMongoError("连接中断")
+
+    monkeypatch.setattr(push_history_repository, "find_since", failing_find_since)
+    assert history(client, since=sync_cursor).status_code == 500
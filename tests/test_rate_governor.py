@@ -0,0 +1,150 @@
+"""大模型限流测试：令牌桶与AIMD并发控制
+
+以假时钟替换 rate_governor 模块的 time，asyncio.sleep 只记录等待时长，时间只在测试显式推进时前进，结果与实际耗时无关。
+"""
+import asyncio
+import pytest
+from backend.services import rate_governor as rate_governor_module
+from backend.services.rate_governor import AIMDLimiter, RateGovernor, TokenBucket
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    real_sleep = asyncio.sleep
+
+    async def sleep(delay, result=None):
+        fake.sleeps.append(round(delay, 6))
+        return await real_sleep(0, result)
+
+    monkeypatch.setattr(rate_governor_module, "time", fake)
+    monkeypatch.setattr(asyncio, "sleep", sleep)
+    return fake
+
+
+def limiter(**overrides) -> AIMDLimiter:
+    options = dict(initial=4, minimum=1, maximum=6, decrease_factor=0.5, latency_threshold=10, cooldown=5)
+    options.update(overrides)
+    return AIMDLimiter(**options)
+
+
+def test_bucket_starts_full_then_waits_for_refill(clock):
+    bucket = TokenBucket(rate=2, capacity=4)
+
+    async def scenario():
+        await bucket.acquire(4)
+        assert clock.sleeps == []
+        await bucket.acquire(1)
+
+    asyncio.run(scenario())
+    assert clock.sleeps == [0.5]
+
+
+def test_bucket_queues_concurrent_requests_in_order(clock):
+    bucket = TokenBucket(rate=1, capacity=1)
+
+    async def scenario():
+        await bucket.acquire(1)
+        await asyncio.gather(bucket.acquire(1), bucket.acquire(1), bucket.acquire(1))
+
+    asyncio.run(scenario())
+    assert clock.sleeps == [1.0, 2.0, 3.0]
+
+
+def test_bucket_refill_capped_and_adjusted(clock):
+    bucket = TokenBucket(rate=10, capacity=100)
+    asyncio.run(bucket.acquire(100))
+    assert bucket.available == 0
+    clock.advance(3)
+    assert bucket.available == 30
+    clock.advance(60)
+    assert bucket.available == 100
+    # 单次需求超过容量时按容量扣除，等待一个容量的补充时间
+    asyncio.run(bucket.acquire(250))
+    assert bucket.available == 0
+    asyncio.run(bucket.acquire(10))
+    assert clock.sleeps == [1.0]
+    # 实际用量少于预估时退还，多于预估时补扣
+    bucket.adjust(-40)
+    assert bucket.available == 30
+    bucket.adjust(50)
+    assert bucket.available == -20
+
+
+def test_bucket_rate_zero_is_unlimited(clock):
+    bucket = TokenBucket(rate=0, capacity=0)
+    asyncio.run(bucket.acquire(10 ** 6))
+    assert clock.sleeps == []
+
+
+def test_aimd_additive_increase_capped(clock):
+    aimd = limiter(initial=4, maximum=5)
+    aimd.on_success(latency=1)
+    assert aimd.limit == pytest.approx(4.25)
+    for _ in range(20):
+        aimd.on_success(latency=1)
+    assert aimd.limit == 5
+
+
+def test_aimd_multiplicative_decrease_with_cooldown(clock):
+    aimd = limiter(initial=4, minimum=1, cooldown=5)
+    aimd.on_overload("429")
+    assert aimd.limit == 2
+    # 冷却期内的同一波限流不再下调
+    clock.advance(1)
+    aimd.on_overload("429")
+    assert aimd.limit == 2
+    clock.advance(5)
+    aimd.on_success(latency=30)
+    assert aimd.limit == 1
+    clock.advance(5)
+    aimd.on_overload("429")
+    assert aimd.limit == 1
+    assert aimd.decreases == 3
+
+
+def test_aimd_blocks_at_limit_until_release(clock):
+    aimd = limiter(initial=2)
+
+    async def scenario():
+        await aimd.acquire()
+        await aimd.acquire()
+        waiting = asyncio.ensure_future(aimd.acquire())
+        await asyncio.sleep(0)
+        assert not waiting.done()
+        await aimd.release()
+        await waiting
+        assert aimd.inflight == 2
+
+    asyncio.run(scenario())
+
+
+def test_governor_pauses_after_retry_after(clock, monkeypatch):
+    governor = RateGovernor()
+    monkeypatch.setattr(governor, "enabled", True)
+    monkeypatch.setattr(governor, "requests", TokenBucket(rate=0, capacity=0))
+    monkeypatch.setattr(governor, "tokens", TokenBucket(rate=100, capacity=1000))
+    monkeypatch.setattr(governor, "concurrency", limiter(initial=4, cooldown=0))
+
+    async def scenario():
+        await governor.acquire(600)
+        await governor.release(600, latency=1, status_code=429, used_tokens=200, retry_after=3)
+        assert governor.concurrency.limit == 2
+        assert governor.tokens.available == 800
+        await governor.acquire(100)
+
+    asyncio.run(scenario())
+    assert clock.sleeps == [3.0]
+    assert governor.throttled == 1
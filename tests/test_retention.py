@@ -0,0 +1,93 @@
+"""推送历史归档测试
+
+检查归档写入后、删除前中断再重新执行时，记录只归档一次、未读计数与推送历史一致。
+"""
+import asyncio
+from datetime import datetime, timedelta
+import pytest
+from backend.config.config import settings
+from backend.repositories.push_repository import push_history_repository, push_unread_repository
+from backend.services.retention import push_retention
+
+USERS = ("u1", "u2")
+PUSH_TYPES = ("rest", "meal")
+
+
+@pytest.fixture
+def history(mongodb, monkeypatch):
+    monkeypatch.setattr(push_retention, "hot_days", 30)
+    monkeypatch.setattr(push_retention, "batch_size", 7)
+    old = datetime.now() - timedelta(days=60)
+
+    async def seed():
+        await push_history_repository.insert_many([
+            {
+                "user_id": USERS[index % 2],
+                "push_type": PUSH_TYPES[index % 3 % 2],
+                "content": f"内容{index}",
+                # 前20条超出保留期，后5条在热数据窗口内
+                "push_time": old + timedelta(minutes=index) if index < 20 else datetime.now(),
+                "is_read": index % 4 == 0,
+            }
+            for index in range(25)
+        ])
+
+    asyncio.run(seed())
+    return mongodb
+
+
+async def unread_counts(user_id: str) -> dict:
+    document = await push_unread_repository.get(user_id)
+    return {push_type: count for push_type, count in document["counts"].items() if count}
+
+
+async def recount(user_id: str) -> dict:
+    return {push_type: count for push_type, count in (await push_unread_repository.recount(user_id)).items() if count}
+
+
+def test_retry_after_crash_before_delete(history, monkeypatch):
+    remove_archived = push_history_repository.remove_archived
+    calls = []
+
+    async def crash_once(records):
+        calls.append(len(records))
+        if len(calls) == 2:
+            raise RuntimeError("进程中断")
+        return await remove_archived(records)
+
+    monkeypatch.setattr(push_history_repository, "remove_archived", crash_once)
+
+    async def scenario():
+        with pytest.raises(RuntimeError):
+            await push_retention.run()
+        report = await push_retention.run()
+        hot = history[settings.COLLECTION_PUSH_HISTORY]
+        archive = history[settings.COLLECTION_PUSH_ARCHIVE]
+        assert await hot.count_documents({}) == 5
+        assert await archive.count_documents({}) == 20
+        assert report["archived"] == 13
+        for user_id in USERS:
+            assert await unread_counts(user_id) == await recount(user_id)
+
+    asyncio.run(scenario())
+
+
+def test_marked_read_during_archive_is_not_decremented_twice(history, monkeypatch):
+    find_expired = push_history_repository.find_expired
+
+    async def mark_after_read(cutoff, limit):
+        records = await find_expired(cutoff, limit)
+        # 读取一批后、删除前用户标记全部已读
+        for user_id in USERS:
+            await push_history_repository.mark_read_many(user_id)
+        return records
+
+    monkeypatch.setattr(push_history_repository, "find_expired", mark_after_read)
+
+    async def scenario():
+        await push_retention.run()
+        assert await history[settings.COLLECTION_PUSH_HISTORY].count_documents({}) == 5
+        for user_id in USERS:
+            assert await unread_counts(user_id) == {}
+
+    asyncio.run(scenario())
@@ -0,0 +1,243 @@
+"""分片协调测试
+
+多个调度实例以相同 run_id 分摊一次推送，检查每个用户只推送一次、各实例都分到区间，
+处理失败的区间被释放后由其他实例完成，以及失联实例持有的区间在租约过期后被其他实例接管。
+
+同进程测试让多个 ShardCoordinator 共用 mongomock-motor 数据库，总会执行；
+多进程测试连接 MONGODB_TEST_URI（默认 mongodb://localhost:27017），连接不上时尝试用 pymongo_inmemory
+启动临时 mongod，都不可用时跳过。
+"""
+import asyncio
+import os
+import signal
+import subprocess
+import sys
+import time
+import uuid
+from collections import Counter
+from pathlib import Path
+import pytest
+from pymongo import MongoClient
+from pymongo.errors import PyMongoError
+from backend.config.config import settings
+from backend.repositories.profile_repository import user_shard_hash
+from backend.scheduler.coordinator import ShardCoordinator
+
+ROOT = Path(__file__).resolve().parent.parent
+MONGODB_TEST_URI = os.environ.get("MONGODB_TEST_URI", "mongodb://localhost:27017")
+USERS = 500
+BUCKETS = 16
+LEASE_SECONDS = 2
+
+
+def _profiles() -> list:
+    return [{"user_id": f"user{index}", "shard_hash": user_shard_hash(f"user{index}")} for index in range(USERS)]
+
+
+# ---------- 同进程：多个协调实例共用一个数据库 ----------
+
+def _coordinator(name: str, lease_seconds: float = 0.3) -> ShardCoordinator:
+    coordinator = ShardCoordinator()
+    coordinator.node_id = name
+    coordinator.buckets = BUCKETS
+    coordinator.lease_seconds = lease_seconds
+    coordinator.heartbeat_interval = 0.02
+    return coordinator
+
+
+@pytest.fixture
+def profiles(mongodb):
+    asyncio.run(mongodb[settings.COLLECTION_HEALTH_PROFILE].insert_many(_profiles()))
+    return mongodb
+
+
+def _sender(db, coordinator: ShardCoordinator, sends: list, fail_buckets: set = None, hang: asyncio.Event = None):
+    async def send_range(shard_range: tuple) -> dict:
+        if hang is not None:
+            hang.set()
+            await asyncio.sleep(3600)
+        if fail_buckets is not None and shard_range[0] in fail_buckets:
+            fail_buckets.discard(shard_range[0])
+            raise RuntimeError("推送失败")
+        lo, hi = shard_range
+        cursor = db[settings.COLLECTION_HEALTH_PROFILE].find({"shard_hash": {"$gte": lo, "$lt": hi}}, {"user_id": 1})
+        users = [profile["user_id"] async for profile in cursor]
+        await asyncio.sleep(0.005)
+        sends.extend((user_id, coordinator.node_id) for user_id in users)
+        return {"users": len(users)}
+    return send_range
+
+
+async def _leases(db, run_id: str) -> list:
+    return await db[settings.COLLECTION_SCHEDULER_LEASES].find({"run_id": run_id}).to_list(length=None)
+
+
+def _assert_each_user_once(sends: list):
+    counts = Counter(user_id for user_id, _ in sends)
+    assert len(counts) == USERS
+    assert set(counts.values()) == {1}
+
+
+def test_nodes_share_buckets_in_process(profiles):
+    run_id = "push:rest:2026-01-01T07:00"
+    nodes = [_coordinator(f"node{index}") for index in range(3)]
+    sends = []
+
+    async def scenario():
+        results = await asyncio.gather(*(node.run(run_id, _sender(profiles, node, sends)) for node in nodes))
+        assert sum(len(result) for result in results) == BUCKETS
+        return await _leases(profiles, run_id)
+
+    leases = asyncio.run(scenario())
+    _assert_each_user_once(sends)
+    assert len(leases) == BUCKETS
+    assert all(lease["status"] == "done" for lease in leases)
+    assert len({owner for _, owner in sends}) >= 2
+
+
+def test_failed_bucket_released_to_other_node(profiles):
+    run_id = "push:weather:2026-01-01T06:30"
+    failing, healthy = _coordinator("failing"), _coordinator("healthy")
+    sends = []
+
+    async def scenario():
+        with pytest.raises(RuntimeError):
+            await failing.run(run_id, _sender(profiles, failing, sends, fail_buckets={0}))
+        await healthy.run(run_id, _sender(profiles, healthy, sends))
+        return await _leases(profiles, run_id)
+
+    leases = asyncio.run(scenario())
+    _assert_each_user_once(sends)
+    first = next(lease for lease in leases if lease["bucket"] == 0)
+    assert first["status"] == "done"
+    assert first["owner"] == "healthy"
+    assert first["attempts"] == 2
+
+
+def test_dead_node_buckets_taken_over_in_process(profiles):
+    run_id = "push:meal:2026-01-01T12:00"
+    dead = _coordinator("dead")
+    survivors = [_coordinator("node1"), _coordinator("node2")]
+    sends = []
+
+    async def scenario():
+        holding = asyncio.Event()
+        task = asyncio.ensure_future(dead.run(run_id, _sender(profiles, dead, sends, hang=holding)))
+        await holding.wait()
+        # 模拟进程被杀：任务取消后租约既不完成也不释放，只能等待过期
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        held = await profiles[settings.COLLECTION_SCHEDULER_LEASES].find_one({"run_id": run_id, "owner": "dead"})
+        started = time.monotonic()
+        await asyncio.gather(*(node.run(run_id, _sender(profiles, node, sends)) for node in survivors))
+        taken_over = await profiles[settings.COLLECTION_SCHEDULER_LEASES].find_one({"_id": held["_id"]})
+        return held, taken_over, time.monotonic() - started
+
+    held, taken_over, elapsed = asyncio.run(scenario())
+    _assert_each_user_once(sends)
+    assert held["status"] == "running"
+    assert taken_over["status"] == "done"
+    assert taken_over["owner"] in {"node1", "node2"}
+    assert taken_over["attempts"] == 2
+    # 失联实例的租约过期前不会被接管
+    assert elapsed >= 0.2
+
+
+# ---------- 多进程：各实例进程连接同一个 mongod ----------
+
+@pytest.fixture(scope="module")
+def mongod_uri():
+    client = MongoClient(MONGODB_TEST_URI, serverSelectionTimeoutMS=1000)
+    try:
+        client.admin.command("ping")
+        yield MONGODB_TEST_URI
+        return
+    except PyMongoError:
+        pass
+    finally:
+        client.close()
+    try:
+        from pymongo_inmemory import Mongod
+        from pymongo_inmemory.context import Context
+        mongod = Mongod(Context())
+        mongod.start()
+    except Exception as e:
+        pytest.skip(f"无法连接 {MONGODB_TEST_URI}，pymongo_inmemory 也无法启动 mongod: {e}")
+    try:
+        yield mongod.connection_string
+    finally:
+        mongod.stop()
+
+
+@pytest.fixture
+def database(mongod_uri):
+    client = MongoClient(mongod_uri)
+    name = f"shard_test_{uuid.uuid4().hex[:8]}"
+    db = client[name]
+    db["health_profiles"].insert_many(_profiles())
+    yield db
+    client.drop_database(name)
+    client.close()
+
+
+def _start_worker(uri: str, db, run_id: str, *flags) -> subprocess.Popen:
+    env = {
+        **os.environ,
+        "MONGODB_URI": uri,
+        "MONGODB_DATABASE": db.name,
+        "COLLECTION_HEALTH_PROFILE": "health_profiles",
+        "SHARDING_BUCKETS": str(BUCKETS),
+        "SHARDING_LEASE_SECONDS": str(LEASE_SECONDS),
+        "SHARDING_HEARTBEAT_INTERVAL": "0.2",
+    }
+    return subprocess.Popen(
+        [sys.executable, "-m", "tests.shard_worker", run_id, *flags],
+        cwd=ROOT, env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
+    )
+
+
+def _wait(workers: list, timeout: float = 60):
+    for worker in workers:
+        _, stderr = worker.communicate(timeout=timeout)
+        assert worker.returncode == 0, stderr
+
+
+def _assert_sent_once(db):
+    sends = Counter(send["user_id"] for send in db["test_sends"].find({}, {"user_id": 1}))
+    assert len(sends) == USERS
+    assert set(sends.values()) == {1}
+
+
+def test_each_user_pushed_once_across_processes(mongod_uri, database):
+    run_id = "push:rest:2026-01-01T07:00"
+    workers = [_start_worker(mongod_uri, database, run_id) for _ in range(3)]
+    _wait(workers)
+
+    _assert_sent_once(database)
+    leases = list(database["scheduler_leases"].find({"run_id": run_id}))
+    assert len(leases) == BUCKETS
+    assert all(lease["status"] == "done" for lease in leases)
+    # 区间由多个实例分摊
+    assert len({lease["owner"] for lease in leases}) >= 2
+
+
+def test_dead_node_buckets_taken_over(mongod_uri, database):
+    run_id = "push:meal:2026-01-01T12:00"
+    hung = _start_worker(mongod_uri, database, run_id, "--hang")
+    deadline = time.monotonic() + 30
+    lease = None
+    while lease is None and time.monotonic() < deadline:
+        lease = database["scheduler_leases"].find_one({"run_id": run_id, "status": "running"})
+        time.sleep(0.05)
+    assert lease is not None
+    hung.send_signal(signal.SIGKILL)
+    hung.wait()
+
+    workers = [_start_worker(mongod_uri, database, run_id) for _ in range(2)]
+    _wait(workers)
+
+    _assert_sent_once(database)
+    taken_over = database["scheduler_leases"].find_one({"_id": lease["_id"]})
+    assert taken_over["status"] == "done"
+    assert taken_over["owner"] != lease["owner"]
+    assert taken_over["attempts"] >= 2
@@ -0,0 +1,66 @@
+"""未读计数测试"""
+import asyncio
+from datetime import datetime, timedelta
+from backend.config.config import settings
+from backend.repositories.push_repository import push_history_repository, push_unread_repository
+
+
+def record(user_id: str, push_type: str, minutes: int, is_read: bool = False) -> dict:
+    return {
+        "user_id": user_id,
+        "push_type": push_type,
+        "content": "内容",
+        "push_time": datetime(2026, 1, 1) + timedelta(minutes=minutes),
+        "is_read": is_read,
+    }
+
+
+async def counts(user_id: str) -> dict:
+    document = await push_unread_repository.get(user_id)
+    return {push_type: count for push_type, count in document["counts"].items() if count}
+
+
+def test_mark_read_many_decrements_per_type(mongodb):
+    async def scenario():
+        await push_history_repository.insert_many(
+            [record("u1", "rest", minute) for minute in range(5)]
+            + [record("u1", "meal", minute) for minute in range(3)]
+            + [record("u1", "meal", 10, is_read=True), record("u2", "rest", 0)]
+        )
+        assert await counts("u1") == {"rest": 5, "meal": 3}
+
+        marked = await push_history_repository.mark_read_many("u1", before=datetime(2026, 1, 1, 0, 2))
+        assert marked == 4
+        assert await counts("u1") == {"rest": 3, "meal": 1}
+        # 再次标记同一范围不会重复扣减
+        assert await push_history_repository.mark_read_many("u1", before=datetime(2026, 1, 1, 0, 2)) == 0
+        assert await push_history_repository.mark_read_many("u1", push_type="meal") == 1
+        assert await counts("u1") == {"rest": 3}
+        assert await counts("u2") == {"rest": 1}
+        assert await mongodb[settings.COLLECTION_PUSH_HISTORY].count_documents({"read_batch": {"$exists": True}}) == 0
+
+    asyncio.run(scenario())
+
+
+def test_recount_does_not_overwrite_concurrent_increment(mongodb, monkeypatch):
+    get = push_unread_repository.get
+    calls = []
+
+    async def get_then_insert(user_id):
+        document = await get(user_id)
+        calls.append(user_id)
+        if len(calls) == 1:
+            # 统计前读取计数文档后，另一条推送写入历史并增加计数
+            await push_history_repository.insert(record(user_id, "rest", 100))
+        return document
+
+    async def scenario():
+        await mongodb[settings.COLLECTION_PUSH_HISTORY].insert_many([record("u1", "rest", minute) for minute in range(4)])
+        await push_unread_repository.add({("u1", "meal"): 0})
+        monkeypatch.setattr(push_unread_repository, "get", get_then_insert)
+        assert await push_unread_repository.recount("u1") == {"rest": 5}
+        monkeypatch.setattr(push_unread_repository, "get", get)
+        assert await counts("u1") == {"rest": 5}
+        assert len(calls) == 2
+
+    asyncio.run(scenario())
@@ -0,0 +1,55 @@
+"""天气页面解析测试：片段解析与整页BeautifulSoup解析结果一致"""
+from pathlib import Path
+import pytest
+from backend.utils.weather_parser import FORECAST_LIST_TAG, WeatherParseError, parse_forecast, parse_forecast_soup
+
+FIXTURES_DIR = Path(__file__).resolve().parent.parent / "backend" / "benchmarks" / "fixtures"
+FIXTURES = sorted(FIXTURES_DIR.glob("*.html"))
+
+
+def _read(path: Path) -> str:
+    return path.read_text(encoding="utf-8")
+
+
+def _without_forecast(html: str) -> str:
+    start = html.index(FORECAST_LIST_TAG)
+    end = html.index("</ul>", start) + len("</ul>")
+    return html[:start] + html[end:]
+
+
+@pytest.mark.parametrize("path", FIXTURES, ids=lambda path: path.name)
+def test_matches_soup_on_fixtures(path):
+    html = _read(path)
+    days = parse_forecast(html)
+    assert days == parse_forecast_soup(html)
+    assert len(days) == 7
+    assert all(day["date"] and day["weather"] and day["temperature"] for day in days)
+
+
+@pytest.mark.parametrize("path", FIXTURES, ids=lambda path: path.name)
+def test_matches_soup_when_tag_differs(path):
+    # 起始标签多出属性时截取不到片段，退回整页建树
+    html = _read(path).replace(FORECAST_LIST_TAG, '<ul id="forecast" class="t clearfix">')
+    assert FORECAST_LIST_TAG not in html
+    assert parse_forecast(html) == parse_forecast_soup(html)
+
+
+@pytest.mark.parametrize("path", FIXTURES, ids=lambda path: path.name)
+def test_missing_forecast_block(path):
+    html = _without_forecast(_read(path))
+    with pytest.raises(WeatherParseError):
+        parse_forecast_soup(html)
+    with pytest.raises(WeatherParseError):
+        parse_forecast(html)
+
+
+def test_empty_or_truncated_forecast_block():
+    empty = f"<html><body><div>{FORECAST_LIST_TAG}</ul></div></body></html>"
+    for parser in (parse_forecast, parse_forecast_soup):
+        with pytest.raises(WeatherParseError):
+            parser(empty)
+    html = _read(FIXTURES[0])
+    # 页面在天气列表中间被截断
+    truncated = html[:html.index(FORECAST_LIST_TAG) + len(FORECAST_LIST_TAG) + 50]
+    with pytest.raises(WeatherParseError):
+        parse_forecast(truncated)